@@ -14,13 +14,16 @@ import os
 import bpy
 from bpy.app.handlers import persistent # type: ignore
 
+from . import layer_cache
 from . import psd_engine
+from . import psd_scan
 from . import ps_bridge
 from . import ui_ops
 from . import brush_ops
 from . import brush_panels
 from . import panels
 from . import node_ops
+from . import prefetch
 from . import channel_ops
 
 class BPSD_LayerItem(bpy.types.PropertyGroup):
@@ -49,10 +52,7 @@ class BPSD_LayerItem(bpy.types.PropertyGroup):
         props = context.scene.bpsd_props
         if props.is_applying_update: return
         
-        try:
-            bpy.ops.bpsd.update_psd_nodes('EXEC_DEFAULT')
-        except:
-            pass
+        node_ops.queue_node_update(self.layer_id)
 
     # Adjustment Layer Visualization Overrides
     adj_vis_color: bpy.props.FloatVectorProperty(
@@ -110,10 +110,7 @@ class BPSD_LayerItem(bpy.types.PropertyGroup):
 
         self.is_property_dirty = True
 
-        try:
-            bpy.ops.bpsd.update_psd_nodes('EXEC_DEFAULT')
-        except:
-            pass
+        node_ops.queue_node_update(self.layer_id)
 
     def update_opacity(self, context):
         if not context or not context.scene: return
@@ -123,10 +120,7 @@ class BPSD_LayerItem(bpy.types.PropertyGroup):
 
         self.is_property_dirty = True
 
-        try:
-            bpy.ops.bpsd.update_psd_nodes('EXEC_DEFAULT')
-        except:
-            pass
+        node_ops.queue_node_update(self.layer_id)
 
     opacity: bpy.props.FloatProperty(default=1.0, min=0.0, max=1.0, update=update_opacity) # type: ignore
 
@@ -185,10 +179,7 @@ class BPSD_LayerItem(bpy.types.PropertyGroup):
         props = context.scene.bpsd_props
         if props.is_applying_update: return
 
-        try:
-            bpy.ops.bpsd.create_psd_nodes('EXEC_DEFAULT')
-        except:
-            pass
+        node_ops.queue_uv_rebuild()
 
     def get_uv_map_items(self, context):
         items = [('', "Default (Group Input)", "Use the UV input from the PSD node group")]
@@ -216,11 +207,34 @@ class BPSD_SceneProperties(bpy.types.PropertyGroup):
     active_is_mask: bpy.props.BoolProperty() # type: ignore
     psd_width: bpy.props.IntProperty() # type: ignore
     psd_height: bpy.props.IntProperty() # type: ignore
+    psd_bit_depth: bpy.props.IntProperty(default=8) # type: ignore
     auto_load_on_select: bpy.props.BoolProperty(
         name="Auto-Load",
         description="Automatically load texture when selecting a layer",
         default=True
     ) # type: ignore
+    proxy_factor: bpy.props.EnumProperty(
+        name="Load Resolution",
+        description=(
+            "Load layers as box-filtered proxies for huge documents. Proxies cut load time and "
+            "memory by the square of the factor but can't be saved until loaded at full resolution"
+        ),
+        items=[
+            ('1', "Full", "Load layers at full resolution"),
+            ('2', "1/2", "Load layers at half resolution"),
+            ('4', "1/4", "Load layers at quarter resolution"),
+            ('8', "1/8", "Load layers at one eighth resolution"),
+        ],
+        default='1'
+    ) # type: ignore
+    lazy_loading: bpy.props.BoolProperty(
+        name="Lazy Loading",
+        description=(
+            "Build the node network with placeholder textures and read layer pixels in the background, "
+            "visible layers first. Selecting a layer reads it right away"
+        ),
+        default=False
+    ) # type: ignore
     auto_purge: bpy.props.BoolProperty(
         name="Auto-Purge",
         description="Automatically remove orphan layers on a sync",
@@ -248,6 +262,71 @@ class BPSD_SceneProperties(bpy.types.PropertyGroup):
         default=True
     ) # type: ignore
 
+    use_baked_preview: bpy.props.BoolProperty(
+        name="Baked Preview",
+        description=(
+            "Preview the composite as one CPU-rendered image instead of the live node network. "
+            "Shader compile time no longer grows with the layer count; the bake refreshes after "
+            "strokes, saves and reloads"
+        ),
+        default=False,
+        update=node_ops.update_baked_preview_callback
+    ) # type: ignore
+
+    use_compact_nodes: bpy.props.BoolProperty(
+        name="Compact Nodes",
+        description=(
+            "Build each layer's blend as one instance of a shared node group instead of a chain "
+            "of math and mix nodes. Keeps large stacks small and quicker to build and compile"
+        ),
+        default=True,
+        update=node_ops.update_node_mode_callback
+    ) # type: ignore
+
+    use_atlas: bpy.props.BoolProperty(
+        name="Atlas Textures",
+        description=(
+            "Pack the trimmed bounds of small layers into a few shared atlas images and sample them "
+            "through per-layer UV transforms. Keeps big PSDs under the shader's texture limit and "
+            "saves GPU memory; painted layers are copied into the atlas shortly after each stroke"
+        ),
+        default=False,
+        update=node_ops.update_node_mode_callback
+    ) # type: ignore
+
+    regenerate_composite: bpy.props.BoolProperty(
+        name="Regenerate Composite",
+        description=(
+            "When Blender writes the PSD itself, render the flattened composite on the CPU "
+            "so the file previews correctly before Photoshop re-saves it. Costs a full "
+            "composite per save on large documents"
+        ),
+        default=True
+    ) # type: ignore
+
+    use_direct_composite: bpy.props.BoolProperty(
+        name="Direct Composite Preview",
+        description=(
+            "Refresh the composite preview by decoding only the PSD's merged image section "
+            "instead of letting Blender re-read the whole file. Falls back to a normal reload "
+            "for documents it can't decode"
+        ),
+        default=True,
+        update=ui_ops.update_composite_preview_callback
+    ) # type: ignore
+
+    composite_preview_scale: bpy.props.EnumProperty(
+        name="Preview Resolution",
+        description="Resolution of the directly decoded composite preview",
+        items=[
+            ('1', "Full", "Full resolution"),
+            ('2', "1/2", "Half resolution; skipped rows are never decoded"),
+            ('4', "1/4", "Quarter resolution; skipped rows are never decoded"),
+        ],
+        default='1',
+        update=ui_ops.update_composite_preview_callback
+    ) # type: ignore
+
     ps_sync_status: bpy.props.StringProperty(
         name="Sync Status",
         default="",
@@ -331,11 +410,100 @@ class BPSDPreferences(bpy.types.AddonPreferences):
         default=True
     ) # type: ignore
 
+    layer_storage: bpy.props.EnumProperty(
+        name="Layer Storage",
+        description="Pixel storage for newly loaded layer images",
+        items=[
+            ('AUTO', "Auto", "Byte images for 8-bit documents, float for deeper ones"),
+            ('BYTE', "Byte", "4 bytes per pixel. Exact for 8-bit PSDs"),
+            ('FLOAT', "Float", "16 bytes per pixel. Avoids banding when painting with soft brushes"),
+        ],
+        default='AUTO'
+    ) # type: ignore
+
+    layer_persistence: bpy.props.EnumProperty(
+        name="Layer Persistence",
+        description="How layer pixels are kept with the .blend between sessions",
+        items=[
+            ('PACK', "Pack", "Pack every layer into the .blend as PNG. Self-contained, but slow to save and large"),
+            ('SIDECAR', "Sidecar Files", "Keep layers as uncompressed files in the cache folder. Fast to write; the .blend depends on them"),
+            ('REGENERATE', "Regenerate", "Keep nothing; layers are re-read from the PSD when the .blend is opened"),
+        ],
+        default='PACK'
+    ) # type: ignore
+
+    use_layer_cache: bpy.props.BoolProperty(
+        name="Layer Cache",
+        description=(
+            "Keep decoded layers on disk so reconnecting or reopening a project only decodes "
+            "layers that changed in the PSD"
+        ),
+        default=True
+    ) # type: ignore
+
+    layer_cache_dir: bpy.props.StringProperty(
+        name="Cache Folder",
+        description="Where decoded layers are kept. Empty uses a folder in Blender's user data",
+        subtype='DIR_PATH',
+        default=""
+    ) # type: ignore
+
+    layer_cache_size: bpy.props.IntProperty(
+        name="Cache Size (MB)",
+        description="Least recently used layers are deleted once the cache grows past this",
+        default=4096,
+        min=64
+    ) # type: ignore
+
+    layer_cache_compress: bpy.props.BoolProperty(
+        name="Compress (lz4)",
+        description="Compress cached layers with lz4. Smaller, but entries can't be memory-mapped",
+        default=False
+    ) # type: ignore
+    prefetch_neighbours: bpy.props.IntProperty(
+        name="Prefetch Neighbours",
+        description=(
+            "After a layer is selected, decode this many layers above and below it (and its mask) "
+            "into the layer cache in the background, so stepping through the stack loads instantly. "
+            "0 turns it off"
+        ),
+        default=2,
+        min=0,
+        max=8
+    ) # type: ignore
+
     def draw(self, context):
         layout = self.layout
 
         layout.prop(self, "show_quick_brushes")
         layout.prop(self, "frequent_brushes")
+        layout.prop(self, "layer_storage")
+        layout.prop(self, "layer_persistence")
+
+        box = layout.box()
+        box.prop(self, "use_layer_cache")
+        col = box.column()
+        col.enabled = self.use_layer_cache
+        col.prop(self, "layer_cache_dir")
+        col.prop(self, "layer_cache_size")
+        row = col.row()
+        row.prop(self, "layer_cache_compress")
+        row.enabled = layer_cache.lz4_available()
+        col.prop(self, "prefetch_neighbours")
+        col.operator("bpsd.clear_layer_cache", icon='TRASH')
+
+
+def build_structure_signature(layer_list):
+    """Everything about the stack that the node network's shape depends on."""
+    sig_parts = []
+    for item in layer_list:
+        part = f"{item.layer_id}:{item.layer_type}:{item.indent}:{item.is_clipping_mask}:{item.has_mask}:{item.clip_base_index}"
+
+        if item.layer_type == 'GROUP':
+            part += f":{item.blend_mode}"
+
+        sig_parts.append(part)
+    return "|".join(sig_parts)
 
 
 class BPSD_OT_connect_psd(bpy.types.Operator):
@@ -343,8 +511,15 @@ class BPSD_OT_connect_psd(bpy.types.Operator):
     bl_label = "Connect"
     bl_description = "Keep the selected file in sync"
 
+    incremental: bpy.props.BoolProperty(
+        default=False,
+        options={'SKIP_SAVE', 'HIDDEN'},
+        description="Only reload textures whose layer data changed since the last sync"
+    ) # type: ignore
+
     def execute(self, context):
         props = context.scene.bpsd_props
+        previous_path = props.active_psd_path
 
         if props.active_psd_image != 'NONE':
             img = bpy.data.images.get(props.active_psd_image)
@@ -354,7 +529,11 @@ class BPSD_OT_connect_psd(bpy.types.Operator):
 
         path = props.active_psd_path
 
-        tree_data,w,h = psd_engine.read_file(path)
+        # Layer ids are only unique within one document.
+        if path != previous_path:
+            props.layer_list.clear()
+
+        tree_data,w,h,depth = psd_engine.read_file(path)
         if not tree_data:
             self.report({'ERROR'}, "Could not read PSD.")
             return {'CANCELLED'}
@@ -363,74 +542,72 @@ class BPSD_OT_connect_psd(bpy.types.Operator):
             if layer['layer_type'] == "UNKNOWN":
                 self.report({'WARNING'}, f"A layer could not be read, this might cause data loss upon save!")
 
+        size_changed = (props.psd_width != w or props.psd_height != h)
         props.psd_width = w
         props.psd_height = h
+        props.psd_bit_depth = depth
         props.ps_disk_conflict = False
 
-        saved_overrides = {}
-        for item in props.layer_list:
-            if item.layer_id > 0 and item.visibility_override != 'PSD':
-                saved_overrides[item.layer_id] = item.visibility_override
-
         saved_active_layer_id = 0
         if props.active_layer_index >= 0 and props.active_layer_index < len(props.layer_list):
             saved_active_layer_id = props.layer_list[props.active_layer_index].layer_id
         saved_active_is_mask = props.active_is_mask
 
-        props.layer_list.clear()
-        
+        was_empty = len(props.layer_list) == 0
+
         props.is_applying_update = True
         try:
-            self.flatten_tree(tree_data, props.layer_list, indent=0)
+            added, removed = self.sync_layer_list(props.layer_list, tree_data)
 
             indent_map = {}
             for i in range(len(props.layer_list) - 1, -1, -1):
                 item = props.layer_list[i]
 
+                clip_base = -1
                 if item.is_clipping_mask:
-                    if item.indent in indent_map:
-                        item.clip_base_index = indent_map[item.indent]
+                    clip_base = indent_map.get(item.indent, -1)
                 else:
                     indent_map[item.indent] = i
 
-            sig_parts = []
-            for item in props.layer_list:
-                part = f"{item.layer_id}:{item.layer_type}:{item.indent}:{item.is_clipping_mask}:{item.has_mask}:{item.clip_base_index}"
-
-                if item.layer_type == 'GROUP':
-                    part += f":{item.blend_mode}"
-
-                sig_parts.append(part)
-            props.structure_signature = "|".join(sig_parts)
+                if item.clip_base_index != clip_base:
+                    item.clip_base_index = clip_base
 
-            for item in props.layer_list:
-                if item.layer_id in saved_overrides:
-                    item.visibility_override = saved_overrides[item.layer_id]
+            props.structure_signature = build_structure_signature(props.layer_list)
         finally:
             props.is_applying_update = False
 
         props.active_layer_index = -1
         props.active_layer_path = ""
         if saved_active_layer_id > 0:
-            for i, item in enumerate(props.layer_list):
-                if item.layer_id == saved_active_layer_id:
-                    props.active_layer_index = i
-                    props.active_layer_path = item.path
-                    props.active_is_mask = saved_active_is_mask
-                    break
+            i, item = ui_ops.find_layer_item(props, saved_active_layer_id)
+            if item:
+                props.active_layer_index = i
+                props.active_layer_path = item.path
+                props.active_is_mask = saved_active_is_mask
 
-        if props.auto_purge:
+        if props.auto_purge and (removed or was_empty):
             bpy.ops.bpsd.clean_orphans('EXEC_DEFAULT')
 
-        bpy.ops.bpsd.reload_all('EXEC_DEFAULT')
+        # Layers whose channel data is unchanged since the last sync keep
+        # their textures; everything else (or everything, on a manual
+        # connect) is re-read.
+        new_fp = psd_scan.scan_fingerprint(path)
+        reload_ids = None
+        if self.incremental and new_fp is not None and not size_changed:
+            old_fp = ui_ops.runtime_state.get_fingerprint(path)
+            if old_fp is not None:
+                _, _, reload_ids = psd_scan.diff(old_fp, new_fp)
+
+        # Placeholders are skipped here. A prefetch still reading the old
+        # disk state is dropped and started over below (or by a node build
+        # that adds placeholders).
+        prefetch.cancel()
+        _, reloaded = ui_ops.reload_layers(context, reload_ids)
 
         if os.path.exists(props.active_psd_path):
             props.last_known_mtime_str = str(os.path.getmtime(props.active_psd_path))
-
-        if props.active_psd_image != 'NONE':
-            main_img = bpy.data.images.get(props.active_psd_image)
-            if main_img:
-                main_img.reload()
+        ui_ops.runtime_state.set_fingerprint(path, new_fp)
+        ui_ops.reload_composite_preview(props)
 
         target_group_name = ui_ops.get_psd_group_name(props.active_psd_path)
         ng = bpy.data.node_groups.get(target_group_name)
@@ -438,12 +615,23 @@ class BPSD_OT_connect_psd(bpy.types.Operator):
             stored_sig = ng.get("bpsd_structure_signature", "")
 
             if stored_sig != props.structure_signature:
-                print("BPSD: Structure changed, regenerating nodes...")
-                bpy.ops.bpsd.create_psd_nodes('EXEC_DEFAULT')
+                if node_ops.patch_psd_nodes(context):
+                    bpy.ops.bpsd.update_psd_nodes('EXEC_DEFAULT')
+                else:
+                    print("BPSD: Structure changed, regenerating nodes...")
+                    bpy.ops.bpsd.create_psd_nodes('EXEC_DEFAULT')
             else:
                 print("BPSD: Structure match, updating node values...")
                 bpy.ops.bpsd.update_psd_nodes('EXEC_DEFAULT')
 
+        # Whatever the toggle says now: placeholders left by an earlier lazy
+        # session (or one turned off mid-run) would otherwise stay blank.
+        if not prefetch.is_running(path):
+            prefetch.start(context.scene)
+
+        if added or removed or reload_ids is not None:
+            print(f"BPSD: Sync +{len(added)} / -{removed} layers, reloaded {reloaded} texture(s)")
+
         self.report({'INFO'}, "Connected!")
         return {'FINISHED'}
 
@@ -452,23 +640,82 @@ class BPSD_OT_connect_psd(bpy.types.Operator):
         props = context.scene.bpsd_props
         return props.active_psd_image != 'NONE' and props.active_psd_image in bpy.data.images
 
-    def flatten_tree(self, nodes, collection, indent):
+    def flatten_tree(self, nodes, flat, indent):
         for node in nodes:
-            item = collection.add()
-            item.name = node['name']
-            item.path = node['path']
-            item.layer_type = node['layer_type']
-            item.layer_id = node.get('layer_id', 0)
-            item.has_mask = node.get('has_mask', False)
-            item.indent = indent
-            item.is_clipping_mask = node['is_clipping_mask']
-            item.is_visible = node['is_visible']
-            item.hidden_by_parent = node.get('hidden_by_parent', False)
-            item.blend_mode = node.get('blend_mode', 'NORMAL').upper()
-            item.opacity = node.get('opacity', 1.0)
+            flat.append((node, indent))
 
             if node['children']:
-                self.flatten_tree(node['children'], collection, indent + 1)
+                self.flatten_tree(node['children'], flat, indent + 1)
+
+    def sync_layer_list(self, collection, tree_data):
+        """Reshape collection into the flattened tree without rebuilding it.
+
+        Items are matched by layer id (index path for id-less layers), moved
+        into place and updated field by field, so Blender-side state such as
+        visibility overrides, UV overrides, channel edits and the dirty latch
+        survives a re-sync. Returns (added layer ids, number removed).
+        """
+        flat = []
+        self.flatten_tree(tree_data, flat, 0)
+
+        def key_of(layer_id, path):
+            return layer_id if layer_id > 0 else path
+
+        current = [key_of(item.layer_id, item.path) for item in collection]
+        added = set()
+
+        for target, (node, indent) in enumerate(flat):
+            key = key_of(node.get('layer_id', 0), node['path'])
+
+            try:
+                src = current.index(key, target)
+            except ValueError:
+                collection.add()
+                src = len(collection) - 1
+                current.append(key)
+                added.add(key)
+
+            if src != target:
+                collection.move(src, target)
+                current.insert(target, current.pop(src))
+
+            self.apply_node(collection[target], node, indent)
+
+        removed = len(collection) - len(flat)
+        for i in range(len(collection) - 1, len(flat) - 1, -1):
+            collection.remove(i)
+
+        return added, removed
+
+    def apply_node(self, item, node, indent):
+        # layer_type goes first: the blend_mode enum only offers PASSTHROUGH
+        # to groups.
+        values = (
+            ('name', node['name']),
+            ('path', node['path']),
+            ('layer_type', node['layer_type']),
+            ('layer_id', node.get('layer_id', 0)),
+            ('has_mask', node.get('has_mask', False)),
+            ('indent', indent),
+            ('is_clipping_mask', node['is_clipping_mask']),
+            ('is_visible', node['is_visible']),
+            ('hidden_by_parent', node.get('hidden_by_parent', False)),
+            ('blend_mode', node.get('blend_mode', 'NORMAL').upper()),
+            ('opacity', node.get('opacity', 1.0)),
+        )
+
+        for attr, value in values:
+            current = getattr(item, attr)
+            if isinstance(value, float):
+                if abs(current - value) <= 1e-6:
+                    continue
+            elif current == value:
+                continue
+            setattr(item, attr, value)
+
+        # Disk values just replaced any unsaved blend / opacity edit.
+        if item.is_property_dirty:
+            item.is_property_dirty = False
 
 
 class BPSD_OT_stop_sync(bpy.types.Operator):
@@ -478,6 +725,7 @@ class BPSD_OT_stop_sync(bpy.types.Operator):
 
     def execute(self, context):
         props = context.scene.bpsd_props
+        ui_ops.runtime_state.set_fingerprint(props.active_psd_path, None)
         props.layer_list.clear()
         props.active_psd_path = ""
         props.active_layer_index = -1
@@ -505,7 +753,7 @@ class BPSD_OT_highlight_psd(bpy.types.Operator):
             self.report({'ERROR'}, "Image not found.")
             return {'CANCELLED'}
 
-        ui_ops.focus_image_editor(context, img)
+        ui_ops.focus_image_editor(context, ui_ops.composite_preview_image(props) or img)
         props.active_layer_index = -1
 
         return {'FINISHED'}
@@ -578,8 +826,8 @@ def auto_sync_check():
 
         if abs(current_mtime - stored_mtime) > 0.01:
             has_unsaved = False
-            for img in bpy.data.images:
-                if img.get("bpsd_managed") and img.get("psd_path") == path and img.is_dirty:
+            for img in ui_ops.managed_images(path):
+                if img.get("bpsd_managed") and img.is_dirty:
                     has_unsaved = True
                     break
 
@@ -589,11 +837,16 @@ def auto_sync_check():
                 props.ps_disk_conflict = True
                 return 1.0
 
+            new_fp = psd_scan.scan_fingerprint(path)
+            if new_fp is None:
+                # Most likely caught Photoshop mid-write; look again next tick.
+                return 1.0
+
             props.last_known_mtime_str = str(current_mtime)
             props.ps_disk_conflict = False
 
             if context.window:
-                bpy.ops.bpsd.connect_psd('EXEC_DEFAULT')
+                apply_disk_changes(context, path, new_fp)
 
     except Exception as e:
         print(f"BPSD Watcher Error: {e}")
@@ -601,6 +854,32 @@ def auto_sync_check():
     return 1.0
 
 
+def apply_disk_changes(context, path, new_fp):
+    """Bring Blender up to date with a PSD that changed on disk.
+
+    Anything touching the layer list - added, removed or reordered layers, or a
+    renamed / re-blended one - goes through connect_psd. A save that only
+    changed pixels reloads just the layers whose channel data moved.
+    """
+    props = context.scene.bpsd_props
+    old_fp = ui_ops.runtime_state.get_fingerprint(path)
+    structure_changed, records_changed, changed_ids = psd_scan.diff(old_fp, new_fp)
+
+    if structure_changed or records_changed:
+        bpy.ops.bpsd.connect_psd('EXEC_DEFAULT', incremental=True)
+        return
+
+    ui_ops.runtime_state.set_fingerprint(path, new_fp)
+
+    if changed_ids:
+        print(f"BPSD: {len(changed_ids)} layer(s) changed on disk, reloading them")
+        ui_ops.reload_layers(context, changed_ids)
+
+    # Even with no layer changes the composite may have moved: adjustment
+    # settings live outside the fingerprinted records.
+    ui_ops.reload_composite_preview(props)
+
+
 def ps_status_check():
     context = bpy.context
     if not context.scene: return 3.0
@@ -619,8 +898,8 @@ def ps_status_check():
             # Check for conflict: Clean -> Dirty transition while Blender has changes
             if current_is_dirty and not props.last_known_ps_dirty_state:
                 blender_is_dirty = False
-                for img in bpy.data.images:
-                    if img.get("bpsd_managed") and img.get("psd_path") == path and img.is_dirty:
+                for img in ui_ops.managed_images(path):
+                    if img.get("bpsd_managed") and img.is_dirty:
                         blender_is_dirty = True
                         break
                 
@@ -651,7 +930,10 @@ classes = (
     ui_ops.BPSD_OT_reload_all,
     ui_ops.BPSD_OT_toggle_visibility,
     ui_ops.BPSD_OT_load_all_layers,
+    ui_ops.BPSD_OT_load_full_res,
+    ui_ops.BPSD_OT_clear_layer_cache,
     ui_ops.BPSD_OT_debug_rw_test,
+    ui_ops.BPSD_OT_debug_packbits,
     ui_ops.BPSD_OT_create_psd,
     ui_ops.BPSD_OT_rename_layer,
     ui_ops.BPSD_OT_toggle_layer_visibility_psd,
@@ -668,6 +950,7 @@ classes = (
     node_ops.BPSD_OT_create_layer_node,
     node_ops.BPSD_OT_create_layer_frame,
     node_ops.BPSD_OT_create_group_nodes,
+    node_ops.BPSD_OT_benchmark_nodes,
     node_ops.BPSD_OT_create_psd_nodes,
     node_ops.BPSD_OT_update_psd_nodes,
     channel_ops.BPSD_OT_edit_channels,
@@ -677,6 +960,8 @@ classes = (
 
 @persistent
 def bpsd_load_post_handler(dummy):
+    prefetch.cancel()
+    ui_ops.runtime_state.clear()
     for scene in bpy.data.scenes:
         if hasattr(scene, 'bpsd_props'):
             props = scene.bpsd_props
@@ -690,6 +975,21 @@ def bpsd_load_post_handler(dummy):
             props.last_known_mtime_str = "0.0"
             props.structure_signature = ""
 
+    # Layers kept outside the .blend come back from their PSDs once the file
+    # has finished loading.
+    if not bpy.app.timers.is_registered(ui_ops.restore_layer_images):
+        bpy.app.timers.register(ui_ops.restore_layer_images, first_interval=0.1)
+
+@persistent
+def bpsd_undo_post_handler(dummy):
+    # Undo swaps in restored image datablocks whose tags may differ from what
+    # the index recorded.
+    ui_ops.runtime_state.invalidate_image_index()
+
+@persistent
+def bpsd_depsgraph_update_handler(scene, depsgraph):
+    ui_ops.note_depsgraph_images(depsgraph)
+
 @persistent
 def bpsd_save_pre_handler(dummy):
     try:
@@ -715,12 +1015,22 @@ def register():
     bpy.app.timers.register(ps_status_check, persistent=True)
     bpy.app.handlers.load_post.append(bpsd_load_post_handler)
     bpy.app.handlers.save_pre.append(bpsd_save_pre_handler)
+    bpy.app.handlers.undo_post.append(bpsd_undo_post_handler)
+    bpy.app.handlers.redo_post.append(bpsd_undo_post_handler)
+    bpy.app.handlers.depsgraph_update_post.append(bpsd_depsgraph_update_handler)
 
 def unregister():
+    prefetch.shutdown()
     if bpsd_load_post_handler in bpy.app.handlers.load_post:
         bpy.app.handlers.load_post.remove(bpsd_load_post_handler)
     if bpsd_save_pre_handler in bpy.app.handlers.save_pre:
         bpy.app.handlers.save_pre.remove(bpsd_save_pre_handler)
+    if bpsd_undo_post_handler in bpy.app.handlers.undo_post:
+        bpy.app.handlers.undo_post.remove(bpsd_undo_post_handler)
+    if bpsd_undo_post_handler in bpy.app.handlers.redo_post:
+        bpy.app.handlers.redo_post.remove(bpsd_undo_post_handler)
+    if bpsd_depsgraph_update_handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(bpsd_depsgraph_update_handler)
         
     del bpy.types.Scene.bpsd_props
 
@@ -0,0 +1,370 @@
+"""Texture atlas for the live node composite.
+
+Every layer normally gets its own canvas-sized texture in the node network.
+Shaders have a hard limit on how many samplers they can bind, which large
+PSDs run into, and a small sticker on a 4k canvas still costs a full 4k
+texture. In atlas mode the opaque bounds of each small layer are trimmed and
+packed into a few shared atlas images; the node network samples the atlas
+through a per-layer UV transform instead. Texture nodes pointing at the same
+image share one sampler, so the sampler count drops to the number of atlases
+plus the layers too big to pack.
+
+Masks are not packed: they are canvas-sized by nature and would just take
+atlas space away from colour layers.
+
+The atlas is kept up to date incrementally. request() queues the layers
+whose pixels changed (paint, reloads) and a short timer re-reads only those.
+A layer whose trimmed bounds still fit its slot is rewritten in place, one
+that grew gets a new slot, and once too much space has been orphaned that
+way the whole atlas is repacked.
+"""
+
+import bpy
+import numpy as np
+
+from . import node_ops
+from . import ui_ops
+
+ATLAS_SIZE = 2048
+ATLAS_PADDING = 2
+ATLAS_DELAY = 0.25
+
+# Layers whose trimmed bounds cover more than this share of the canvas keep
+# their own texture; packing them would save nothing.
+MAX_CANVAS_SHARE = 0.25
+
+# Repack once orphaned slots add up to this share of the used area.
+MAX_WASTED_SHARE = 0.5
+
+# Layer ids to refresh per PSD; None means every layer.
+_pending = {}
+
+
+class SkylinePacker:
+    """Bottom-left skyline rectangle packer for one atlas page."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.skyline = [(0, 0, width)]  # (x, y, width) segments, left to right
+        self.used = 0
+
+    def _fit(self, i, w, h):
+        x = self.skyline[i][0]
+        if x + w > self.width:
+            return None
+
+        y = 0
+        remaining = w
+        j = i
+        while remaining > 0:
+            if j >= len(self.skyline):
+                return None
+            _, seg_y, seg_w = self.skyline[j]
+            y = max(y, seg_y)
+            if y + h > self.height:
+                return None
+            remaining -= seg_w
+            j += 1
+        return y
+
+    def insert(self, w, h):
+        """Place a w x h rect; returns (x, y) or None when the page is full."""
+        best = None
+        for i in range(len(self.skyline)):
+            y = self._fit(i, w, h)
+            if y is None:
+                continue
+            x = self.skyline[i][0]
+            if best is None or (y + h, x) < (best[1] + h, best[0]):
+                best = (x, y, i)
+
+        if best is None:
+            return None
+
+        x, y, i = best
+        self.skyline.insert(i, (x, y + h, w))
+
+        # Cut the segments now under the new one.
+        j = i + 1
+        while j < len(self.skyline):
+            seg_x, seg_y, seg_w = self.skyline[j]
+            overlap = x + w - seg_x
+            if overlap <= 0:
+                break
+            if seg_w <= overlap:
+                del self.skyline[j]
+                continue
+            self.skyline[j] = (seg_x + overlap, seg_y, seg_w - overlap)
+            break
+
+        merged = [self.skyline[0]]
+        for seg in self.skyline[1:]:
+            if seg[1] == merged[-1][1]:
+                merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + seg[2])
+            else:
+                merged.append(seg)
+        self.skyline = merged
+
+        self.used += w * h
+        return x, y
+
+
+def trimmed_bounds(pixels, border=1):
+    """(x0, y0, x1, y1) of the non-transparent pixels plus a transparent
+    border for linear filtering, or None for an empty layer."""
+    alpha = pixels[..., 3] > 0
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(alpha.any(axis=0))
+
+    h, w = alpha.shape
+    return (max(0, int(cols[0]) - border), max(0, int(rows[0]) - border),
+            min(w, int(cols[-1]) + 1 + border), min(h, int(rows[-1]) + 1 + border))
+
+
+def _image_pixels(img):
+    w, h = img.size
+    buf = np.empty(w * h * 4, dtype=np.float32)
+    img.pixels.foreach_get(buf)
+    return buf.reshape((h, w, 4))
+
+
+class Atlas:
+    def __init__(self, psd_path, width, height, size=ATLAS_SIZE):
+        self.psd_path = psd_path
+        self.width = width
+        self.height = height
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        self.packers = []
+        self.pages = []
+        # layer_id -> {"page", "x", "y", "w", "h" (the slot), "bounds"}
+        self.placements = {}
+        # Layers looked at and left out (empty or too big).
+        self.excluded = set()
+        self.wasted = 0
+
+    def page_name(self, page):
+        return f"{ui_ops.get_psd_group_name(self.psd_path)} (Atlas {page})"
+
+    def page_image(self, page, create=False):
+        name = self.page_name(page)
+        img = bpy.data.images.get(name)
+        if img is None and create:
+            props = bpy.context.scene.bpsd_props
+            img = ui_ops.new_layer_image(props, name, self.size, self.size)
+            ui_ops.set_layer_colorspace(img, props)
+            # Deliberately not psd_path: that would put the page in the
+            # layer image index.
+            img["bpsd_atlas"] = self.psd_path
+        return img
+
+    def _fits(self, bounds):
+        bw, bh = bounds[2] - bounds[0], bounds[3] - bounds[1]
+        if bw + ATLAS_PADDING > self.size or bh + ATLAS_PADDING > self.size:
+            return False
+        return bw * bh <= MAX_CANVAS_SHARE * self.width * self.height
+
+    def _allocate(self, w, h):
+        for page, packer in enumerate(self.packers):
+            spot = packer.insert(w + ATLAS_PADDING, h + ATLAS_PADDING)
+            if spot:
+                return page, spot[0], spot[1]
+
+        packer = SkylinePacker(self.size, self.size)
+        self.packers.append(packer)
+        self.pages.append(np.zeros((self.size, self.size, 4), dtype=np.float32))
+        x, y = packer.insert(w + ATLAS_PADDING, h + ATLAS_PADDING)
+        return len(self.packers) - 1, x, y
+
+    def _release(self, layer_id, touched):
+        old = self.placements.pop(layer_id)
+        self.pages[old["page"]][old["y"]:old["y"] + old["h"], old["x"]:old["x"] + old["w"]] = 0.0
+        self.wasted += (old["w"] + ATLAS_PADDING) * (old["h"] + ATLAS_PADDING)
+        touched.add(old["page"])
+
+    def _candidates(self, props):
+        """{layer_id: image} for every layer that could go into the atlas."""
+        found = {}
+        for i, item in enumerate(props.layer_list):
+            if item.layer_type not in ('LAYER', 'SMART') or item.layer_id <= 0:
+                continue
+            img = bpy.data.images.get(f"Temp_LayerID_{item.layer_id}")
+            if img is None:
+                img = ui_ops.find_loaded_image(self.psd_path, i, False, item.layer_id)
+            if img and not ui_ops.is_placeholder(img):
+                found[item.layer_id] = img
+        return found
+
+    def update(self, props, layer_ids=None, missing_only=False):
+        """Re-read layers into the atlas; returns the ids whose mapping moved.
+
+        layer_ids limits the re-read (None: every layer). missing_only skips
+        layers that were already packed or excluded.
+        """
+        candidates = self._candidates(props)
+        touched = set()
+        changed = set()
+
+        for lid in [lid for lid in self.placements if lid not in candidates]:
+            self._release(lid, touched)
+            changed.add(lid)
+        self.excluded &= set(candidates)
+
+        for lid, img in candidates.items():
+            if layer_ids is not None and lid not in layer_ids:
+                continue
+            if missing_only and (lid in self.placements or lid in self.excluded):
+                continue
+
+            pixels = _image_pixels(img)
+            bounds = trimmed_bounds(pixels)
+            old = self.placements.get(lid)
+
+            if bounds is None or tuple(img.size) != (self.width, self.height) or not self._fits(bounds):
+                self.excluded.add(lid)
+                if old:
+                    self._release(lid, touched)
+                    changed.add(lid)
+                continue
+            self.excluded.discard(lid)
+
+            x0, y0, x1, y1 = bounds
+            bw, bh = x1 - x0, y1 - y0
+
+            if old and bw <= old["w"] and bh <= old["h"]:
+                placement = dict(old, bounds=bounds)
+                self.pages[old["page"]][old["y"]:old["y"] + old["h"], old["x"]:old["x"] + old["w"]] = 0.0
+            else:
+                if old:
+                    self._release(lid, touched)
+                page, x, y = self._allocate(bw, bh)
+                placement = {"page": page, "x": x, "y": y, "w": bw, "h": bh, "bounds": bounds}
+
+            page = self.pages[placement["page"]]
+            page[placement["y"]:placement["y"] + bh, placement["x"]:placement["x"] + bw] = pixels[y0:y1, x0:x1]
+            touched.add(placement["page"])
+
+            if old is None or old["page"] != placement["page"] or old["x"] != placement["x"] \
+                    or old["y"] != placement["y"] or old["bounds"] != bounds:
+                changed.add(lid)
+            self.placements[lid] = placement
+
+        used = sum(p.used for p in self.packers)
+        if used and self.wasted > MAX_WASTED_SHARE * used:
+            print(f"BPSD: Repacking atlas ({self.wasted} px orphaned)")
+            moved = set(self.placements) | changed
+            self.reset()
+            return self.update(props) | moved
+
+        for page in touched:
+            img = self.page_image(page, create=True)
+            img.pixels.foreach_set(self.pages[page].ravel())
+            img.update()
+            ui_ops.persist_image(img)
+
+        return changed
+
+    def mapping(self, layer_id):
+        """(atlas image, {Atlas UV input: value}) for a packed layer, else None."""
+        placement = self.placements.get(layer_id)
+        if placement is None:
+            return None
+
+        x0, y0, x1, y1 = placement["bounds"]
+        bw, bh = x1 - x0, y1 - y0
+        values = {
+            "Layer Min": (x0 / self.width, y0 / self.height, 0.0),
+            "Layer Size": (bw / self.width, bh / self.height, 0.0),
+            "Atlas Min": (placement["x"] / self.size, placement["y"] / self.size, 0.0),
+            "Atlas Size": (bw / self.size, bh / self.size, 0.0),
+        }
+        return self.page_image(placement["page"], create=True), values
+
+
+def is_active(props):
+    return props.use_atlas and not props.use_baked_preview and bool(props.active_psd_path)
+
+def get_atlas(props, create=False):
+    atlases = ui_ops.runtime_state.atlases
+    atlas = atlases.get(props.active_psd_path)
+    size = (props.psd_width, props.psd_height)
+
+    if atlas is not None and (atlas.width, atlas.height) == size:
+        return atlas
+    if not create or size[0] <= 0 or size[1] <= 0:
+        return None
+
+    atlas = Atlas(props.active_psd_path, *size)
+    atlases[props.active_psd_path] = atlas
+    return atlas
+
+def refresh(props, layer_ids=None, missing_only=False):
+    """Bring the atlas up to date; returns the ids whose mapping moved."""
+    if not is_active(props):
+        return set()
+    atlas = get_atlas(props, create=True)
+    if atlas is None:
+        return set()
+    return atlas.update(props, layer_ids, missing_only)
+
+def packed_ids(props):
+    if not is_active(props):
+        return set()
+    atlas = get_atlas(props)
+    return set(atlas.placements) if atlas else set()
+
+def layer_mapping(props, layer_id):
+    if not is_active(props):
+        return None
+    atlas = get_atlas(props)
+    return atlas.mapping(layer_id) if atlas else None
+
+
+def request(scene, layer_ids=None):
+    """Queue an atlas refresh of the given layers (None: all) if atlas mode is on."""
+    props = scene.bpsd_props
+    if not is_active(props):
+        return
+
+    psd_path = props.active_psd_path
+    if layer_ids is None or _pending.get(psd_path, set()) is None:
+        _pending[psd_path] = None
+    else:
+        _pending.setdefault(psd_path, set()).update(layer_ids)
+
+    if not bpy.app.timers.is_registered(_flush):
+        bpy.app.timers.register(_flush, first_interval=ATLAS_DELAY)
+
+def _flush():
+    context = bpy.context
+    scene = context.scene
+    if scene is None:
+        _pending.clear()
+        return None
+
+    props = scene.bpsd_props
+    layer_ids = _pending.pop(props.active_psd_path, set())
+    _pending.clear()
+
+    if not is_active(props) or not bpy.data.node_groups.get(ui_ops.get_psd_group_name(props.active_psd_path)):
+        return None
+
+    try:
+        before = packed_ids(props)
+        changed = refresh(props, layer_ids)
+
+        # Layers moving in or out of the atlas change shape; the rest only
+        # need their UV transform pushed.
+        if packed_ids(props) != before:
+            if not node_ops.patch_psd_nodes(context):
+                bpy.ops.bpsd.create_psd_nodes('EXEC_DEFAULT')
+        if changed:
+            node_ops.update_layer_nodes(context, changed)
+    except Exception as e:
+        print(f"BPSD Atlas Error: {e}")
+    return None
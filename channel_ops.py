@@ -36,7 +36,7 @@ class BPSD_OT_edit_channels(bpy.types.Operator):
         
         # Get Source Image
         source_img = ui_ops.find_loaded_image(props.active_psd_path, idx, False, item.layer_id)
-        if not source_img:
+        if not source_img or ui_ops.is_placeholder(source_img):
             # Try to load it automatically
             bpy.ops.bpsd.load_layer('EXEC_DEFAULT', layer_path=item.path, layer_id=item.layer_id)
             source_img = ui_ops.find_loaded_image(props.active_psd_path, idx, False, item.layer_id)
@@ -81,7 +81,7 @@ class BPSD_OT_edit_channels(bpy.types.Operator):
             # Else (Mixed Mode): Keep Source Alpha (already in arr)
         
         temp_img.pixels.foreach_set(arr.ravel())
-        temp_img.pack() 
+        ui_ops.persist_image(temp_img)
         
         # Focus on Temp Image
         ui_ops.focus_image_editor(context, temp_img)
@@ -149,7 +149,9 @@ class BPSD_OT_save_channels(bpy.types.Operator):
             if item.temp_channel_a: source_reshaped[:, 3] = temp_reshaped[:, 3]
         
         source_img.pixels.foreach_set(source_arr.ravel())
-        source_img.pack()
+        # The image no longer matches what was read from disk.
+        source_img.pop("bpsd_pixels_tag", None)
+        ui_ops.persist_image(source_img)
         # source_img.is_dirty = True # Read-only
         
         # Mark property dirty to trigger save pick-up
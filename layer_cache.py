@@ -0,0 +1,236 @@
+"""On-disk cache of decoded layers.
+
+Decoding a layer with photoshopapi is by far the most expensive part of a
+sync, and reopening a .blend, reconnecting or switching proxy resolution
+decodes every layer again even when the PSD has not changed. This cache
+keeps each decoded layer as a plain .npy file, exactly as read_all_layers
+returns it (flat bottom-up RGBA in the document's precision, one grey plane
+for masks), so a hit is a memory-mapped np.load and costs little more than
+the page cache.
+
+Entries are keyed by the PSD path, layer id, colour or mask, target canvas,
+proxy factor and the psd_scan content fingerprint of the layer. Any edit to a
+layer's pixels, bounds or mask changes the fingerprint and misses, so stale
+data is never served; the superseded entry is deleted when the new one is
+written. Layers without an id are not cached.
+
+A fingerprint is taken right before and right after the photoshopapi read,
+and results are only stored when both agree. A save landing in between would
+otherwise file new pixels under the old fingerprint. Both come from
+psd_scan.cached_fingerprint, so while the file's mtime and size stay put a
+lookup costs an os.stat rather than a scan of every channel byte.
+
+Optionally entries are lz4-compressed (when the lz4 module is available).
+Compressed entries can't be memory-mapped but are a fraction of the size for
+layers with lots of empty canvas.
+
+Writes happen on a background thread and the cache is trimmed back under its
+size limit after each batch, least recently used first. A hit refreshes the
+entry's mtime, which is what the LRU order goes by.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from . import psd_engine
+    from . import psd_scan
+except ImportError:
+    import psd_engine
+    import psd_scan
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+RAW_EXT = ".npy"
+LZ4_EXT = ".npy.lz4"
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bpsd-layer-cache")
+_lock = threading.Lock()
+
+
+def lz4_available():
+    return lz4_frame is not None
+
+
+class LayerCache:
+    def __init__(self, root, limit_bytes, compress=False):
+        self.root = root
+        self.limit_bytes = limit_bytes
+        self.compress = compress and lz4_available()
+
+    def psd_dir(self, psd_path):
+        digest = hashlib.sha1(os.path.normcase(os.path.abspath(psd_path)).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:16])
+
+    @staticmethod
+    def _prefix(req):
+        # "g": single-plane masks. Entries from before that ("m") held grey
+        # RGBA and are never hit again; they age out with the LRU.
+        kind = "g" if req['is_mask'] else "c"
+        return f"{req['layer_id']}_{kind}_{req.get('factor', 1)}_{req['width']}x{req['height']}_"
+
+    def _entry(self, psd_path, req, content):
+        return os.path.join(self.psd_dir(psd_path), f"{self._prefix(req)}{content:08x}")
+
+    # --- Read ---
+
+    def _load(self, base):
+        for ext in (RAW_EXT, LZ4_EXT):
+            path = base + ext
+            if not os.path.exists(path):
+                continue
+            try:
+                if ext == RAW_EXT:
+                    pixels = np.load(path, mmap_mode='r')
+                else:
+                    with open(path, "rb") as f:
+                        pixels = np.load(io.BytesIO(lz4_frame.decompress(f.read())))
+                os.utime(path)
+                return pixels
+            except Exception as e:
+                print(f"BPSD Cache: dropping unreadable entry {os.path.basename(path)}: {e}")
+                self._remove(path)
+        return None
+
+    def load(self, psd_path, req, content):
+        """Cached pixels for one request, or None. content is the "content"
+        map of the PSD's current psd_scan fingerprint."""
+        layer_id = req.get('layer_id', 0)
+        if layer_id <= 0 or layer_id not in content:
+            return None
+        return self._load(self._entry(psd_path, req, content[layer_id]))
+
+    def contains(self, psd_path, req, content):
+        layer_id = req.get('layer_id', 0)
+        if layer_id <= 0 or layer_id not in content:
+            return False
+        base = self._entry(psd_path, req, content[layer_id])
+        return any(os.path.exists(base + ext) for ext in (RAW_EXT, LZ4_EXT))
+
+    def read_layers(self, psd_path, requests):
+        """psd_engine.read_all_layers, served from the cache where possible."""
+        before = psd_scan.cached_fingerprint(psd_path)
+        if before is None:
+            return psd_engine.read_all_layers(psd_path, requests)
+        content = before["content"]
+
+        results = {}
+        misses = []
+        for req in requests:
+            pixels = self.load(psd_path, req, content)
+            if pixels is None:
+                misses.append(req)
+            else:
+                results[(req.get('layer_index'), req['is_mask'])] = pixels
+
+        if not misses:
+            return results
+
+        decoded = psd_engine.read_all_layers(psd_path, misses)
+        results.update(decoded)
+
+        after = psd_scan.cached_fingerprint(psd_path)
+        if after is not None and after["content"] == content:
+            self.store(psd_path, [(req, decoded.get((req.get('layer_index'), req['is_mask']))) for req in misses], content)
+
+        print(f"BPSD Cache: {len(requests) - len(misses)} hit, {len(misses)} decoded")
+        return results
+
+    # --- Write ---
+
+    def store(self, psd_path, decoded, content):
+        """Queue (request, pixels) pairs for writing on the background thread.
+
+        content must be a fingerprint taken before the pixels were read and
+        confirmed unchanged after; pairs without pixels or an id are skipped.
+        """
+        store = []
+        for req, pixels in decoded:
+            layer_id = req.get('layer_id', 0)
+            if pixels is not None and layer_id > 0 and layer_id in content:
+                store.append((self._entry(psd_path, req, content[layer_id]), pixels))
+        if store:
+            _writer.submit(self._store_batch, store)
+
+    def _store_batch(self, entries):
+        try:
+            for base, pixels in entries:
+                self._store(base, pixels)
+            self.prune()
+        except Exception as e:
+            print(f"BPSD Cache Write Error: {e}")
+
+    def _store(self, base, pixels):
+        folder, name = os.path.split(base)
+        os.makedirs(folder, exist_ok=True)
+
+        # Older fingerprints of the same layer can never be hit again.
+        prefix = name[:name.rindex("_") + 1]
+        for old in os.listdir(folder):
+            if old.startswith(prefix) and not old.startswith(name):
+                self._remove(os.path.join(folder, old))
+
+        path = base + (LZ4_EXT if self.compress else RAW_EXT)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            if self.compress:
+                buf = io.BytesIO()
+                np.save(buf, np.ascontiguousarray(pixels))
+                f.write(lz4_frame.compress(buf.getbuffer()))
+            else:
+                np.save(f, np.ascontiguousarray(pixels))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # --- Housekeeping ---
+
+    def entries(self):
+        """(mtime, size, path) for every entry."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                if not (name.endswith(RAW_EXT) or name.endswith(LZ4_EXT)):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, st.st_size, path))
+        return found
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def prune(self):
+        """Delete least recently used entries until the cache fits its limit."""
+        with _lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.limit_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def clear(self, psd_path=None):
+        with _lock:
+            for _, _, path in self.entries():
+                if psd_path is None or os.path.dirname(path) == self.psd_dir(psd_path):
+                    self._remove(path)
@@ -1,5 +1,12 @@
+import os
+import time
+
 import bpy
+from . import atlas
+from . import psd_engine
 from . import ui_ops
+from . import preview_bake
+from . import prefetch
 
 BLEND_MODE_MAP = {
     'NORMAL': 'MIX',
@@ -112,15 +119,243 @@ def combine_opacity(nodes, links, opacity_socket, item_opacity, x, y, parent=Non
 
     return mul.outputs[0]
 
+# --- Shared blend groups ---
+# In compact mode every layer's Alpha * Mask * Opacity chain and bottom mix is
+# a single group node instancing a shared "BPSD Layer Blend <MODE>" tree, one
+# per Blender mix mode (blend_type isn't a socket, so the mode can't be an
+# input). The PSD group then holds one node per blend instead of up to eight,
+# builds that much faster through the API, and the shader compiler sees the
+# same few subtrees over and over. Bump LAYER_BLEND_VERSION whenever the
+# contents below change; existing trees are rebuilt in place on next use.
+
+LAYER_BLEND_VERSION = 1
+LAYER_BLEND_PREFIX = "BPSD Layer Blend"
+
+_LAYER_BLEND_INPUTS = (
+    ("Layer Color", 'NodeSocketColor', (1.0, 1.0, 1.0, 1.0)),
+    ("Layer Alpha", 'NodeSocketFloat', 1.0),
+    ("Mask", 'NodeSocketFloat', 1.0),
+    ("Clip Alpha", 'NodeSocketFloat', 1.0),
+    ("Opacity", 'NodeSocketFloat', 1.0),
+    ("Inherited Opacity", 'NodeSocketFloat', 1.0),
+    ("Bottom Color", 'NodeSocketColor', (0.0, 0.0, 0.0, 1.0)),
+    ("Bottom Alpha", 'NodeSocketFloat', 0.0),
+)
+
+def use_compact_nodes():
+    scene = bpy.context.scene if bpy.context else None
+    return bool(scene and scene.bpsd_props.use_compact_nodes)
+
+def layer_blend_group_name(blender_mode):
+    return f"{LAYER_BLEND_PREFIX} {blender_mode}"
+
+def _fill_layer_blend_group(ng, blender_mode):
+    ng.nodes.clear()
+    ng.interface.clear()
+
+    for name, socket_type, default in _LAYER_BLEND_INPUTS:
+        sock = ng.interface.new_socket(name=name, in_out='INPUT', socket_type=socket_type)
+        sock.default_value = default
+        if socket_type == 'NodeSocketFloat':
+            sock.min_value, sock.max_value = 0.0, 1.0
+    for name, socket_type in (("Color", 'NodeSocketColor'), ("Alpha", 'NodeSocketFloat'), ("Factor", 'NodeSocketFloat')):
+        ng.interface.new_socket(name=name, in_out='OUTPUT', socket_type=socket_type)
+
+    nodes, links = ng.nodes, ng.links
+    g_in = nodes.new('NodeGroupInput')
+    g_in.location = (-400, 0)
+    g_out = nodes.new('NodeGroupOutput')
+    g_out.location = (1200, 0)
+
+    prev_socket = g_in.outputs["Layer Alpha"]
+    x = -200
+    for name in ("Mask", "Clip Alpha", "Opacity", "Inherited Opacity"):
+        mul = nodes.new('ShaderNodeMath')
+        mul.operation = 'MULTIPLY'
+        mul.label = f"* {name}"
+        mul.location = (x, 0)
+        links.new(prev_socket, mul.inputs[0])
+        links.new(g_in.outputs[name], mul.inputs[1])
+        prev_socket = mul.outputs[0]
+        x += 200
+    fac_socket = prev_socket
+
+    sub_1 = nodes.new('ShaderNodeMath')
+    sub_1.operation = 'SUBTRACT'
+    sub_1.inputs[0].default_value = 1.0
+    sub_1.label = "1 - Fac"
+    sub_1.location = (x, -200)
+    links.new(fac_socket, sub_1.inputs[1])
+
+    mul_bot = nodes.new('ShaderNodeMath')
+    mul_bot.operation = 'MULTIPLY'
+    mul_bot.label = "Bot * InvFac"
+    mul_bot.location = (x + 200, -200)
+    links.new(g_in.outputs["Bottom Alpha"], mul_bot.inputs[0])
+    links.new(sub_1.outputs[0], mul_bot.inputs[1])
+
+    add_alpha = nodes.new('ShaderNodeMath')
+    add_alpha.operation = 'ADD'
+    add_alpha.label = "Out Alpha"
+    add_alpha.location = (x + 400, -200)
+    links.new(fac_socket, add_alpha.inputs[0])
+    links.new(mul_bot.outputs[0], add_alpha.inputs[1])
+
+    mix_node = nodes.new('ShaderNodeMix')
+    mix_node.data_type = 'RGBA'
+    mix_node.blend_type = blender_mode
+    mix_node.label = f"Mix {blender_mode}"
+    mix_node.location = (x + 400, 100)
+    links.new(fac_socket, mix_node.inputs['Factor'])
+    links.new(g_in.outputs["Bottom Color"], mix_node.inputs['A'])
+    links.new(g_in.outputs["Layer Color"], mix_node.inputs['B'])
+
+    links.new(mix_node.outputs['Result'], g_out.inputs["Color"])
+    links.new(add_alpha.outputs[0], g_out.inputs["Alpha"])
+    links.new(fac_socket, g_out.inputs["Factor"])
+
+def get_layer_blend_group(blender_mode):
+    """The shared blend tree for a Blender mix mode, (re)built if outdated."""
+    name = layer_blend_group_name(blender_mode)
+    ng = bpy.data.node_groups.get(name)
+    if ng and ng.get("bpsd_blend_version") == LAYER_BLEND_VERSION:
+        return ng
+
+    if ng is None:
+        ng = bpy.data.node_groups.new(name=name, type='ShaderNodeTree')
+    _fill_layer_blend_group(ng, blender_mode)
+    ng["bpsd_blend_version"] = LAYER_BLEND_VERSION
+    ng["bpsd_blend_mode"] = blender_mode
+    return ng
+
+ATLAS_UV_VERSION = 1
+ATLAS_UV_GROUP = "BPSD Atlas UV"
+
+def _fill_atlas_uv_group(ng):
+    ng.nodes.clear()
+    ng.interface.clear()
+
+    ng.interface.new_socket(name="UV", in_out='INPUT', socket_type='NodeSocketVector')
+    for name in ("Layer Min", "Layer Size", "Atlas Min", "Atlas Size"):
+        sock = ng.interface.new_socket(name=name, in_out='INPUT', socket_type='NodeSocketVector')
+        sock.default_value = (1.0, 1.0, 0.0) if name.endswith("Size") else (0.0, 0.0, 0.0)
+    ng.interface.new_socket(name="UV", in_out='OUTPUT', socket_type='NodeSocketVector')
+    ng.interface.new_socket(name="Inside", in_out='OUTPUT', socket_type='NodeSocketFloat')
+
+    nodes, links = ng.nodes, ng.links
+    g_in = nodes.new('NodeGroupInput')
+    g_in.location = (-400, 0)
+    g_out = nodes.new('NodeGroupOutput')
+    g_out.location = (800, 0)
+
+    # Position inside the layer's trimmed bounds, 0..1 on both axes.
+    sub = nodes.new('ShaderNodeVectorMath')
+    sub.operation = 'SUBTRACT'
+    sub.location = (-200, 0)
+    links.new(g_in.outputs["UV"], sub.inputs[0])
+    links.new(g_in.outputs["Layer Min"], sub.inputs[1])
+
+    local = nodes.new('ShaderNodeVectorMath')
+    local.operation = 'DIVIDE'
+    local.location = (0, 0)
+    links.new(sub.outputs[0], local.inputs[0])
+    links.new(g_in.outputs["Layer Size"], local.inputs[1])
+
+    to_atlas = nodes.new('ShaderNodeVectorMath')
+    to_atlas.operation = 'MULTIPLY_ADD'
+    to_atlas.location = (200, 100)
+    links.new(local.outputs[0], to_atlas.inputs[0])
+    links.new(g_in.outputs["Atlas Size"], to_atlas.inputs[1])
+    links.new(g_in.outputs["Atlas Min"], to_atlas.inputs[2])
+    links.new(to_atlas.outputs[0], g_out.inputs["UV"])
+
+    # Outside the bounds the atlas holds other layers, so mask those out.
+    sep = nodes.new('ShaderNodeSeparateXYZ')
+    sep.location = (200, -100)
+    links.new(local.outputs[0], sep.inputs[0])
+
+    inside = []
+    for i, axis in enumerate("XY"):
+        cmp = nodes.new('ShaderNodeMath')
+        cmp.operation = 'COMPARE'
+        cmp.label = f"Inside {axis}"
+        cmp.inputs[1].default_value = 0.5
+        cmp.inputs[2].default_value = 0.5
+        cmp.location = (400, -100 - 150 * i)
+        links.new(sep.outputs[axis], cmp.inputs[0])
+        inside.append(cmp.outputs[0])
+
+    both = nodes.new('ShaderNodeMath')
+    both.operation = 'MULTIPLY'
+    both.location = (600, -150)
+    links.new(inside[0], both.inputs[0])
+    links.new(inside[1], both.inputs[1])
+    links.new(both.outputs[0], g_out.inputs["Inside"])
+
+def get_atlas_uv_group():
+    """The shared canvas UV -> atlas UV transform, (re)built if outdated."""
+    ng = bpy.data.node_groups.get(ATLAS_UV_GROUP)
+    if ng and ng.get("bpsd_atlas_uv_version") == ATLAS_UV_VERSION:
+        return ng
+
+    if ng is None:
+        ng = bpy.data.node_groups.new(name=ATLAS_UV_GROUP, type='ShaderNodeTree')
+    _fill_atlas_uv_group(ng)
+    ng["bpsd_atlas_uv_version"] = ATLAS_UV_VERSION
+    return ng
+
+def _compact_mix_logic(nodes, links, blend_mode, eff_opacity,
+                       socket_mask, socket_layer_color, socket_layer_alpha,
+                       socket_bot_color, socket_bot_alpha,
+                       location, parent, socket_clip_alpha, layer_id,
+                       opacity_label, socket_inherited_opacity):
+    has_bottom = socket_bot_color is not None
+    # Without a bottom the mix is never used, so those all share MIX.
+    blender_mode = get_blender_blend_mode(blend_mode) if has_bottom else 'MIX'
+
+    node = nodes.new('ShaderNodeGroup')
+    node.node_tree = get_layer_blend_group(blender_mode)
+    node.label = f"Blend {blender_mode}"
+    node.location = location
+    node["bpsd_blend_label"] = opacity_label
+    node["bpsd_has_bottom"] = has_bottom
+    if layer_id > 0: node["bpsd_layer_id"] = layer_id
+    if parent: node.parent = parent
+
+    inputs = node.inputs
+    inputs["Opacity"].default_value = eff_opacity
+    for name, socket in (("Layer Color", socket_layer_color), ("Layer Alpha", socket_layer_alpha),
+                         ("Mask", socket_mask), ("Clip Alpha", socket_clip_alpha),
+                         ("Inherited Opacity", socket_inherited_opacity),
+                         ("Bottom Color", socket_bot_color), ("Bottom Alpha", socket_bot_alpha)):
+        if socket:
+            links.new(socket, inputs[name])
+
+    fac_socket = node.outputs["Factor"]
+    if not has_bottom:
+        return socket_layer_color, fac_socket, fac_socket
+    return node.outputs["Color"], node.outputs["Alpha"], fac_socket
+
 def inline_mix_logic(nodes, links, blend_mode, opacity, is_visible,
                      socket_mask, socket_layer_color, socket_layer_alpha,
                      socket_bot_color, socket_bot_alpha,
                      location=(0,0), parent=None,
                      socket_clip_alpha=None, layer_id=0,
                      opacity_label="* Opacity",
-                     socket_inherited_opacity=None):
+                     socket_inherited_opacity=None,
+                     compact=None):
     x, y = location
 
+    if compact is None:
+        compact = use_compact_nodes()
+    if compact:
+        eff_opacity = opacity * (1.0 if is_visible else 0.0)
+        return _compact_mix_logic(nodes, links, blend_mode, eff_opacity,
+                                  socket_mask, socket_layer_color, socket_layer_alpha,
+                                  socket_bot_color, socket_bot_alpha,
+                                  location, parent, socket_clip_alpha, layer_id,
+                                  opacity_label, socket_inherited_opacity)
+
     def set_id(node):
         if layer_id > 0: node["bpsd_layer_id"] = layer_id
 
@@ -282,15 +517,50 @@ def _get_socket_from_image(nodes, links, image, label, x, y, parent=None, layer_
     if uv_socket:
         links.new(uv_socket, t_node.inputs['Vector'])
 
-    if label == "Layer Mask" or label == "Group Mask":
-        if t_node.image: t_node.image.colorspace_settings.name = 'Non-Color'
+    is_mask = label == "Layer Mask" or label == "Group Mask"
+    if t_node.image and bpy.context and bpy.context.scene:
+        ui_ops.set_layer_colorspace(t_node.image, bpy.context.scene.bpsd_props, is_mask)
+
+    if is_mask:
         return t_node.outputs['Color'], None
     else:
-        if t_node.image: t_node.image.colorspace_settings.name = 'sRGB'
         return t_node.outputs['Color'], t_node.outputs['Alpha']
 
+def _get_atlas_sockets(nodes, links, mapping, x, y, parent=None, layer_id=0, uv_socket=None):
+    image, values = mapping
+
+    uv_node = nodes.new('ShaderNodeGroup')
+    uv_node.node_tree = get_atlas_uv_group()
+    uv_node.label = "Atlas UV"
+    uv_node.location = (x - 150, y + 150)
+    if parent: uv_node.parent = parent
+    if layer_id > 0: uv_node["bpsd_layer_id"] = layer_id
+    for name, value in values.items():
+        uv_node.inputs[name].default_value = value
+
+    if uv_socket is None:
+        uv_map = nodes.new('ShaderNodeUVMap')
+        uv_map.location = (x - 300, y + 150)
+        if parent: uv_map.parent = parent
+        uv_socket = uv_map.outputs['UV']
+    links.new(uv_socket, uv_node.inputs['UV'])
+
+    c_sock, a_sock = _get_socket_from_image(nodes, links, image, "Atlas Color", x, y, parent, layer_id, uv_node.outputs['UV'])
+
+    gate = nodes.new('ShaderNodeMath')
+    gate.operation = 'MULTIPLY'
+    gate.label = "Atlas Alpha"
+    gate.location = (x + 250, y - 100)
+    if parent: gate.parent = parent
+    if layer_id > 0: gate["bpsd_layer_id"] = layer_id
+    links.new(a_sock, gate.inputs[0])
+    links.new(uv_node.outputs['Inside'], gate.inputs[1])
+
+    return c_sock, gate.outputs[0]
+
 def _get_layer_content(nodes, links, props, item, index, x, y, frame, uv_socket=None):
     col_img = ui_ops.find_loaded_image(props.active_psd_path, index, False, item.layer_id)
+    mapping = atlas.layer_mapping(props, item.layer_id) if item.layer_id > 0 else None
     c_sock, a_sock = None, None
 
     layer_uv_socket = uv_socket
@@ -303,7 +573,9 @@ def _get_layer_content(nodes, links, props, item, index, x, y, frame, uv_socket=
         if item.layer_id > 0: uv_map["bpsd_layer_id"] = item.layer_id
         layer_uv_socket = uv_map.outputs['UV']
 
-    if col_img:
+    if mapping:
+        c_sock, a_sock = _get_atlas_sockets(nodes, links, mapping, x + 50, y, frame, item.layer_id, layer_uv_socket)
+    elif col_img:
         c_sock, a_sock = _get_socket_from_image(nodes, links, col_img, "Layer Color", x + 50, y, frame, item.layer_id, layer_uv_socket)
     elif item.layer_type == 'ADJUSTMENT':
         rgb = nodes.new('ShaderNodeRGB')
@@ -547,6 +819,252 @@ def build_hierarchy_recursive(nodes, links, props, parent_index, bottom_color_so
     return current_col, current_alp, cursor_x
 
 
+# --- Composite units ---
+# The top level of the stack is built as a chain of units, one per base layer
+# plus whatever is clipped to it. Every node of a unit is tagged bpsd_unit with
+# the unit's key, and the unit talks to its neighbours only through reroute
+# ports (bpsd_role in_col / in_alp / out_col / out_alp). A signature per unit
+# (the shape-relevant fields of everything inside it) is stored on the group,
+# so when the layer structure changes only units whose signature moved are
+# torn down and rebuilt, and the chain is relinked through the ports. Adding
+# a layer in Photoshop then builds one unit instead of the whole network.
+
+UNIT_SPACING_Y = -1500
+
+def _unit_key(item):
+    return str(item.layer_id) if item.layer_id > 0 else f"p:{item.path}"
+
+def _top_level_units(layer_list):
+    """Bottom-up [(base_idx, base_item, [(clip_idx, clip_item), ...])]."""
+    reversed_children = list(reversed(get_immediate_children(layer_list, -1)))
+
+    units = []
+    i = 0
+    count = len(reversed_children)
+    while i < count:
+        idx, item = reversed_children[i]
+        clips = []
+        j = i + 1
+        while j < count and reversed_children[j][1].is_clipping_mask:
+            clips.append(reversed_children[j])
+            j += 1
+        units.append((idx, item, clips))
+        i = j
+    return units
+
+def _item_shape(item, packed=()):
+    part = f"{item.layer_id}:{item.layer_type}:{item.indent}:{item.is_clipping_mask}:{item.has_mask}:{item.uv_override}"
+    if item.layer_type == 'GROUP':
+        part += f":{item.blend_mode}"
+    if item.layer_id in packed:
+        part += ":atlas"
+    return part
+
+def _unit_signature(layer_list, base_idx, clips, has_bottom, packed=()):
+    parts = [f"bottom:{has_bottom}"]
+    for idx in [base_idx] + [c_idx for c_idx, _ in clips]:
+        indent = layer_list[idx].indent
+        parts.append(_item_shape(layer_list[idx], packed))
+
+        # Group contents belong to the unit too.
+        j = idx + 1
+        while j < len(layer_list) and layer_list[j].indent > indent:
+            parts.append(_item_shape(layer_list[j], packed))
+            j += 1
+    return "|".join(parts)
+
+def _new_reroute(nodes, role, x, y):
+    node = nodes.new('NodeReroute')
+    node.location = (x, y)
+    node["bpsd_role"] = role
+    return node
+
+def _build_unit(ng, props, base_idx, base_item, clips, has_bottom, x_loc, y_loc, uv_socket):
+    """Build one unit behind its ports; returns the x where it ends."""
+    nodes, links = ng.nodes, ng.links
+    start = len(nodes)
+
+    in_col = in_alp = None
+    if has_bottom:
+        in_col = _new_reroute(nodes, "in_col", x_loc - 100, y_loc)
+        in_alp = _new_reroute(nodes, "in_alp", x_loc - 100, y_loc - 50)
+
+    col, alp, end_x = _process_composite_unit(
+        nodes, links, props, base_item, base_idx, clips,
+        in_col.outputs[0] if in_col else None,
+        in_alp.outputs[0] if in_alp else None,
+        x_loc, y_loc, uv_socket=uv_socket
+    )
+
+    out_col = _new_reroute(nodes, "out_col", end_x, y_loc)
+    out_alp = _new_reroute(nodes, "out_alp", end_x, y_loc - 50)
+    if col: links.new(col, out_col.inputs[0])
+    if alp: links.new(alp, out_alp.inputs[0])
+
+    # Nodes are appended in creation order, and the only removals during a
+    # build are of nodes this unit just made, so everything from start on is
+    # ours.
+    key = _unit_key(base_item)
+    for i in range(start, len(nodes)):
+        nodes[i]["bpsd_unit"] = key
+
+    return end_x + 200
+
+def _unit_ports(ng):
+    ports = {}
+    for node in ng.nodes:
+        role = node.get("bpsd_role")
+        if role:
+            ports.setdefault(node.get("bpsd_unit", ""), {})[role] = node
+    return ports
+
+def _relink_units(ng, keys):
+    links = ng.links
+    ports = _unit_ports(ng)
+
+    prev = None
+    for key in keys:
+        unit = ports.get(key, {})
+        if prev:
+            for src, dst in (("out_col", "in_col"), ("out_alp", "in_alp")):
+                if src in prev and dst in unit:
+                    links.new(prev[src].outputs[0], unit[dst].inputs[0])
+        prev = unit
+
+    final = ports.get("", {})
+    if prev:
+        for src, dst in (("out_col", "final_col"), ("out_alp", "final_alp")):
+            if src in prev and dst in final:
+                links.new(prev[src].outputs[0], final[dst].inputs[0])
+
+def build_units(ng, props, x_loc, y_loc, uv_socket=None):
+    """Build the whole top level as units; returns (color, alpha, end_x)."""
+    units = _top_level_units(props.layer_list)
+    packed = atlas.packed_ids(props)
+    signatures = {}
+    spans = {}
+    keys = []
+
+    cursor_x = x_loc
+    for pos, (idx, item, clips) in enumerate(units):
+        key = _unit_key(item)
+        end_x = _build_unit(ng, props, idx, item, clips, pos > 0, cursor_x, y_loc, uv_socket)
+        signatures[key] = _unit_signature(props.layer_list, idx, clips, pos > 0, packed)
+        spans[key] = [cursor_x, end_x]
+        keys.append(key)
+        cursor_x = end_x
+
+    _relink_units(ng, keys)
+
+    ng["bpsd_unit_signatures"] = signatures
+    ng["bpsd_unit_spans"] = spans
+
+    if not keys:
+        return None, None, cursor_x
+
+    last = _unit_ports(ng)[keys[-1]]
+    return last["out_col"].outputs[0], last["out_alp"].outputs[0], cursor_x
+
+def patch_psd_nodes(context):
+    """Rebuild only the units whose structure changed.
+
+    Returns False when the group cannot be patched (missing, built by an
+    older version or in the other node mode, baked mode, empty stack) and
+    needs a full create instead.
+    """
+    props = context.scene.bpsd_props
+    ng = bpy.data.node_groups.get(ui_ops.get_psd_group_name(props.active_psd_path))
+    if not ng or props.use_baked_preview or "bpsd_unit_signatures" not in ng:
+        return False
+    if bool(ng.get("bpsd_compact", False)) != props.use_compact_nodes:
+        return False
+
+    input_node = next((n for n in ng.nodes if n.type == 'GROUP_INPUT'), None)
+    final = _unit_ports(ng).get("", {})
+    if not input_node or "final_col" not in final or "final_alp" not in final:
+        return False
+
+    units = _top_level_units(props.layer_list)
+    if not units:
+        return False
+
+    old_signatures = ng["bpsd_unit_signatures"].to_dict()
+    spans = ng["bpsd_unit_spans"].to_dict() if "bpsd_unit_spans" in ng else {}
+
+    # New layers need their textures, and their atlas slots, before the
+    # signatures can tell which units changed.
+    bpy.ops.bpsd.load_all_layers('EXEC_DEFAULT', missing_only=True)
+    atlas.refresh(props, missing_only=True)
+    packed = atlas.packed_ids(props)
+
+    signatures = {}
+    for pos, (idx, item, clips) in enumerate(units):
+        signatures[_unit_key(item)] = _unit_signature(props.layer_list, idx, clips, pos > 0, packed)
+
+    stale = {key for key, sig in old_signatures.items() if signatures.get(key) != sig}
+    if stale:
+        for node in [n for n in ng.nodes if n.get("bpsd_unit") in stale]:
+            ng.nodes.remove(node)
+
+    uv_socket = input_node.outputs['UV']
+    keys = []
+    built = 0
+    prev_end = input_node.location.x + 200
+    for pos, (idx, item, clips) in enumerate(units):
+        key = _unit_key(item)
+        keys.append(key)
+
+        if key in old_signatures and key not in stale:
+            prev_end = spans.get(key, [prev_end, prev_end])[1]
+            continue
+
+        # New units go below the chain so they don't land on top of the
+        # neighbours that kept their place.
+        built += 1
+        end_x = _build_unit(ng, props, idx, item, clips, pos > 0,
+                            prev_end, UNIT_SPACING_Y * built, uv_socket)
+        spans[key] = [prev_end, end_x]
+        prev_end = end_x
+
+    _relink_units(ng, keys)
+
+    ng["bpsd_unit_signatures"] = signatures
+    ng["bpsd_unit_spans"] = {key: spans[key] for key in keys if key in spans}
+    ng["bpsd_structure_signature"] = props.structure_signature
+    rebuild_node_index(ng)
+
+    removed = len(stale - set(keys))
+    print(f"BPSD: Patched node network ({built} unit(s) built, {removed} removed)")
+    return True
+
+def build_baked_preview(nodes, links, scene, x_loc, y_loc, uv_socket=None):
+    """Single texture sampling the CPU-baked composite, in place of the stack.
+
+    Per-layer UV overrides have no effect in this mode: everything is baked
+    into one image on the PSD's own UVs.
+    """
+    preview_bake.bake_now(scene)
+    baked = preview_bake.get_baked_image(scene.bpsd_props)
+    if not baked:
+        return None, None, x_loc
+
+    col, alp = _get_socket_from_image(nodes, links, baked, "Baked Preview", x_loc, y_loc, uv_socket=uv_socket)
+    for node in nodes:
+        if node.type == 'TEX_IMAGE' and node.image == baked:
+            node["bpsd_baked_preview"] = True
+    return col, alp, x_loc + 300
+
+def update_baked_preview_callback(self, context):
+    group_name = ui_ops.get_psd_group_name(self.active_psd_path)
+    if bpy.data.node_groups.get(group_name):
+        bpy.ops.bpsd.create_psd_nodes('EXEC_DEFAULT')
+
+def update_node_mode_callback(self, context):
+    group_name = ui_ops.get_psd_group_name(self.active_psd_path)
+    if bpy.data.node_groups.get(group_name) and not self.use_baked_preview:
+        bpy.ops.bpsd.create_psd_nodes('EXEC_DEFAULT')
+
+
 class BPSD_OT_create_psd_nodes(bpy.types.Operator):
     bl_idname = "bpsd.create_psd_nodes"
     bl_label = "Create PSD Node Network"
@@ -560,7 +1078,7 @@ class BPSD_OT_create_psd_nodes(bpy.types.Operator):
             self.report({'ERROR'}, "No PSD loaded.")
             return {'CANCELLED'}
 
-        bpy.ops.bpsd.load_all_layers('EXEC_DEFAULT')
+        bpy.ops.bpsd.load_all_layers('EXEC_DEFAULT', missing_only=True)
 
         group_name = ui_ops.get_psd_group_name(props.active_psd_path)
         ng = bpy.data.node_groups.get(group_name)
@@ -575,6 +1093,8 @@ class BPSD_OT_create_psd_nodes(bpy.types.Operator):
         if ng:
              ng.nodes.clear()
              ng.interface.clear()
+             for key in ("bpsd_unit_signatures", "bpsd_unit_spans"):
+                 if key in ng: del ng[key]
         else:
              ng = bpy.data.node_groups.new(name=group_name, type='ShaderNodeTree')
         ng.interface.new_socket(name="UV", in_out='INPUT', socket_type='NodeSocketVector')
@@ -583,6 +1103,7 @@ class BPSD_OT_create_psd_nodes(bpy.types.Operator):
         ng.interface.new_socket(name="Out Shader", in_out='OUTPUT', socket_type='NodeSocketShader')
 
         ng["bpsd_structure_signature"] = props.structure_signature
+        ng["bpsd_compact"] = props.use_compact_nodes
 
         nodes = ng.nodes
         links = ng.links
@@ -595,12 +1116,11 @@ class BPSD_OT_create_psd_nodes(bpy.types.Operator):
 
         uv_socket = input_node.outputs['UV']
 
-        final_col, final_alp, end_x = build_hierarchy_recursive(
-            nodes, links, props, -1,
-            None, None,
-            -500, 0,
-            uv_socket=uv_socket
-        )
+        if props.use_baked_preview:
+            final_col, final_alp, end_x = build_baked_preview(nodes, links, context.scene, -500, 0, uv_socket)
+        else:
+            atlas.refresh(props)
+            final_col, final_alp, end_x = build_units(ng, props, -500, 0, uv_socket)
 
         if final_col is None:
              start_rgb = nodes.new('ShaderNodeRGB')
@@ -613,11 +1133,20 @@ class BPSD_OT_create_psd_nodes(bpy.types.Operator):
              start_val.location = (0, -200)
              final_alp = start_val.outputs[0]
 
+        # Everything downstream reads the stack through these, so a patch
+        # only ever has to relink the two ports.
+        final_col_port = _new_reroute(nodes, "final_col", end_x - 400, 0)
+        final_alp_port = _new_reroute(nodes, "final_alp", end_x - 400, -50)
+        links.new(final_col, final_col_port.inputs[0])
+        links.new(final_alp, final_alp_port.inputs[0])
+        final_col = final_col_port.outputs[0]
+        final_alp = final_alp_port.outputs[0]
+
         output_node.location = (end_x + 200, 0)
 
         psd_tex = None
         if props.active_psd_image != 'NONE':
-            main_img = bpy.data.images.get(props.active_psd_image)
+            main_img = ui_ops.composite_preview_image(props)
             if main_img:
                 psd_tex = nodes.new('ShaderNodeTexImage')
                 psd_tex.image = main_img
@@ -659,6 +1188,8 @@ class BPSD_OT_create_psd_nodes(bpy.types.Operator):
         links.new(emission.outputs['Emission'], mix_shader.inputs[2])
         links.new(mix_shader.outputs['Shader'], output_node.inputs['Out Shader'])
 
+        rebuild_node_index(ng)
+
         if has_active_material:
             mat = obj.active_material
             if not mat.use_nodes: mat.use_nodes = True
@@ -800,11 +1331,401 @@ class BPSD_OT_create_group_nodes(bpy.types.Operator):
         )
         return {'FINISHED'}
 
+# --- Node benchmark ---
+
+def _build_benchmark_group(props, compact):
+    """Build the stack into a scratch group; returns (group, seconds)."""
+    ng = bpy.data.node_groups.new(name="BPSD Node Benchmark", type='ShaderNodeTree')
+    ng.interface.new_socket(name="UV", in_out='INPUT', socket_type='NodeSocketVector')
+    ng.interface.new_socket(name="Out Shader", in_out='OUTPUT', socket_type='NodeSocketShader')
+
+    input_node = ng.nodes.new('NodeGroupInput')
+    output_node = ng.nodes.new('NodeGroupOutput')
+
+    # Item assignment skips the update callback, which would rebuild the
+    # real network.
+    previous = props.use_compact_nodes
+    props["use_compact_nodes"] = compact
+    try:
+        start = time.perf_counter()
+        col, alp, end_x = build_units(ng, props, 0, 0, input_node.outputs['UV'])
+        if col:
+            emission = ng.nodes.new('ShaderNodeEmission')
+            transparent = ng.nodes.new('ShaderNodeBsdfTransparent')
+            mix_shader = ng.nodes.new('ShaderNodeMixShader')
+            ng.links.new(col, emission.inputs['Color'])
+            ng.links.new(alp, mix_shader.inputs['Fac'])
+            ng.links.new(transparent.outputs['BSDF'], mix_shader.inputs[1])
+            ng.links.new(emission.outputs['Emission'], mix_shader.inputs[2])
+            ng.links.new(mix_shader.outputs['Shader'], output_node.inputs['Out Shader'])
+        elapsed = time.perf_counter() - start
+    finally:
+        props["use_compact_nodes"] = previous
+    return ng, elapsed
+
+def _count_nodes(ng):
+    """(nodes in the group, nodes including each nested tree once)."""
+    seen = {}
+    pending = [ng]
+    while pending:
+        tree = pending.pop()
+        if tree.name in seen:
+            continue
+        seen[tree.name] = len(tree.nodes)
+        pending.extend(n.node_tree for n in tree.nodes if n.type == 'GROUP' and n.node_tree)
+    return len(ng.nodes), sum(seen.values())
+
+def _time_first_render(ng):
+    """Seconds for a tiny Eevee render of a quad using the group.
+
+    A final render compiles every material before it draws, so on a fresh
+    graph this is dominated by shader compilation. There is no direct hook
+    for the viewport's compile time.
+    """
+    scene = bpy.data.scenes.new("BPSD Node Benchmark")
+    engines = {e.identifier for e in scene.render.bl_rna.properties['engine'].enum_items}
+    scene.render.engine = next((e for e in ('BLENDER_EEVEE_NEXT', 'BLENDER_EEVEE') if e in engines), 'BLENDER_EEVEE')
+    scene.render.resolution_x = scene.render.resolution_y = 32
+    scene.render.filepath = os.path.join(bpy.app.tempdir, "bpsd_node_benchmark.png")
+
+    mesh = bpy.data.meshes.new("BPSD Node Benchmark")
+    mesh.from_pydata([(-1, -1, 0), (1, -1, 0), (1, 1, 0), (-1, 1, 0)], [], [(0, 1, 2, 3)])
+    mesh.uv_layers.new()
+
+    mat = bpy.data.materials.new("BPSD Node Benchmark")
+    mat.use_nodes = True
+    group_node = mat.node_tree.nodes.new('ShaderNodeGroup')
+    group_node.node_tree = ng
+    mat_output = next(n for n in mat.node_tree.nodes if n.type == 'OUTPUT_MATERIAL')
+    mat.node_tree.links.new(group_node.outputs['Out Shader'], mat_output.inputs['Surface'])
+    mesh.materials.append(mat)
+
+    obj = bpy.data.objects.new("BPSD Node Benchmark", mesh)
+    cam_data = bpy.data.cameras.new("BPSD Node Benchmark")
+    cam = bpy.data.objects.new("BPSD Node Benchmark Camera", cam_data)
+    cam.location = (0, 0, 3)
+    scene.collection.objects.link(obj)
+    scene.collection.objects.link(cam)
+    scene.camera = cam
+
+    try:
+        start = time.perf_counter()
+        bpy.ops.render.render(scene=scene.name)
+        return time.perf_counter() - start
+    except Exception as e:
+        print(f"BPSD Benchmark Render Error: {e}")
+        return -1.0
+    finally:
+        bpy.data.objects.remove(obj)
+        bpy.data.objects.remove(cam)
+        bpy.data.cameras.remove(cam_data)
+        bpy.data.meshes.remove(mesh)
+        bpy.data.materials.remove(mat)
+        bpy.data.scenes.remove(scene)
+
+class BPSD_OT_benchmark_nodes(bpy.types.Operator):
+    bl_idname = "bpsd.benchmark_nodes"
+    bl_label = "Node Benchmark (Debug)"
+    bl_description = "Build a generated layer stack as flat and as compact nodes and report node count, build time and first render time"
+
+    layer_count: bpy.props.IntProperty(name="Layers", default=200, min=1, max=2000) # type: ignore
+    size: bpy.props.IntProperty(name="Size", default=256, min=16, max=4096) # type: ignore
+    use_active_psd: bpy.props.BoolProperty(name="Use Active PSD", default=False) # type: ignore
+    measure_render: bpy.props.BoolProperty(name="Measure First Render", default=True) # type: ignore
+
+    def execute(self, context):
+        if self.use_active_psd:
+            return self.run(context.scene.bpsd_props)
+
+        path = os.path.join(bpy.app.tempdir, f"bpsd_node_benchmark_{self.layer_count}.psd")
+        if not psd_engine.create_benchmark_psd(path, self.size, self.size, self.layer_count):
+            self.report({'ERROR'}, "Failed to generate benchmark PSD")
+            return {'CANCELLED'}
+
+        # The generated stack is connected in a scratch scene, so the user's
+        # connection, layer list and images are left as they were. Everything
+        # the run adds to bpy.data goes again afterwards.
+        existing = set(bpy.data.images)
+        scratch = bpy.data.scenes.new("BPSD Node Benchmark Stack")
+        try:
+            img = bpy.data.images.load(path, check_existing=True)
+            scratch.bpsd_props.active_psd_image = img.name
+            with context.temp_override(scene=scratch):
+                bpy.ops.bpsd.connect_psd('EXEC_DEFAULT')
+                return self.run(scratch.bpsd_props)
+        finally:
+            for img in [img for img in bpy.data.images if img not in existing]:
+                bpy.data.images.remove(img)
+            bpy.data.scenes.remove(scratch)
+            ui_ops.runtime_state.invalidate_image_index()
+            ui_ops.runtime_state.set_fingerprint(os.path.normpath(path), None)
+            # connect_psd stopped any prefetch running for the real scene.
+            prefetch.start(context.scene)
+
+    def run(self, props):
+        if not props.active_psd_path or len(props.layer_list) == 0:
+            self.report({'ERROR'}, "No PSD loaded.")
+            return {'CANCELLED'}
+
+        bpy.ops.bpsd.load_all_layers('EXEC_DEFAULT', missing_only=True)
+
+        lines = []
+        for compact in (False, True):
+            ng, build_time = _build_benchmark_group(props, compact)
+            try:
+                own, total = _count_nodes(ng)
+                render_time = _time_first_render(ng) if self.measure_render else -1.0
+            finally:
+                bpy.data.node_groups.remove(ng)
+
+            line = (f"{'Compact' if compact else 'Flat'}: {own} nodes ({total} with shared groups), "
+                    f"build {build_time * 1000:.0f} ms")
+            if render_time >= 0:
+                line += f", first render {render_time * 1000:.0f} ms"
+            lines.append(line)
+
+        print(f"BPSD Node Benchmark ({len(props.layer_list)} layers)")
+        for line in lines:
+            print(f"  {line}")
+        self.report({'INFO'}, " | ".join(lines))
+        return {'FINISHED'}
+
+# --- Node index ---
+# layer_id -> {role: [node names]} for every node update_psd_nodes may touch,
+# stored on the group as bpsd_node_index and rebuilt whenever the network is
+# created or patched. A property change then goes straight to the one or two
+# nodes involved instead of scanning the whole group. The decoded index is
+# cached in runtime_state against bpsd_node_index_stamp, so slider drags don't
+# re-read ID properties either.
+
+def _node_roles(node):
+    label = node.label
+    if node.type == 'TEX_IMAGE' and label == "Layer Color": return ("layer_color",)
+    if node.type == 'TEX_IMAGE' and label == "Atlas Color": return ("atlas_color",)
+    if node.type == 'GROUP' and label == "Atlas UV": return ("atlas_uv",)
+    if node.type == 'FRAME': return ("frame",)
+    if node.type == 'RGB' and label == "Adj Color": return ("adj_color",)
+    if node.type == 'VALUE' and label == "Adj Alpha": return ("adj_alpha",)
+    if node.type == 'MATH' and label == "* Opacity": return ("opacity",)
+    if node.type == 'VALUE' and label == "Group Opacity": return ("group_opacity",)
+    if node.type in ('MIX', 'MIX_RGB') and label.startswith("Mix "): return ("mix",)
+    if node.type == 'GROUP' and "bpsd_blend_label" in node:
+        # A compact blend node carries both the opacity and the mix.
+        roles = []
+        if node["bpsd_blend_label"] == "* Opacity": roles.append("blend_opacity")
+        if node.get("bpsd_has_bottom"): roles.append("blend_mode")
+        return tuple(roles)
+    return ()
+
+def rebuild_node_index(ng):
+    index = {}
+    for node in ng.nodes:
+        lid = node.get("bpsd_layer_id", 0)
+        if lid <= 0:
+            continue
+        for role in _node_roles(node):
+            index.setdefault(str(lid), {}).setdefault(role, []).append(node.name)
+
+    ng["bpsd_node_index"] = index
+    ng["bpsd_node_index_stamp"] = ng.get("bpsd_node_index_stamp", 0) + 1
+    ui_ops.runtime_state.node_indexes.pop(ng.name, None)
+
+def get_node_index(ng):
+    stamp = ng.get("bpsd_node_index_stamp")
+    if stamp is None or "bpsd_node_index" not in ng:
+        rebuild_node_index(ng)
+        stamp = ng["bpsd_node_index_stamp"]
+
+    cached = ui_ops.runtime_state.node_indexes.get(ng.name)
+    if cached is None or cached[0] != stamp:
+        index = {int(lid): {role: list(names) for role, names in roles.items()}
+                 for lid, roles in ng["bpsd_node_index"].items()}
+        cached = (stamp, index)
+        ui_ops.runtime_state.node_indexes[ng.name] = cached
+    return cached[1]
+
+def _indexed_nodes(ng, index, layer_id):
+    """{role: [nodes]} for a layer, or None if the index has gone stale."""
+    found = {}
+    for role, names in index.get(layer_id, {}).items():
+        nodes = []
+        for name in names:
+            node = ng.nodes.get(name)
+            if node is None or node.get("bpsd_layer_id", 0) != layer_id:
+                return None
+            nodes.append(node)
+        found[role] = nodes
+    return found
+
+def _update_layer_nodes(props, item, roles):
+    count = 0
+    eff_opacity = item.opacity * (1.0 if get_effective_visibility(item) else 0.0)
+
+    for node in roles.get("layer_color", ()):
+        if item.temp_channel_active:
+            target_image = bpy.data.images.get(f"Temp_LayerID_{item.layer_id}")
+        else:
+            target_image = ui_ops.find_loaded_image(props.active_psd_path, -1, False, item.layer_id)
+
+        if target_image and node.image != target_image:
+            node.image = target_image
+            count += 1
+
+    mapping = None
+    if roles.get("atlas_color") or roles.get("atlas_uv"):
+        mapping = atlas.layer_mapping(props, item.layer_id)
+
+    if mapping:
+        atlas_image, values = mapping
+        for node in roles.get("atlas_color", ()):
+            if node.image != atlas_image:
+                node.image = atlas_image
+                count += 1
+
+        for node in roles.get("atlas_uv", ()):
+            for name, value in values.items():
+                if tuple(node.inputs[name].default_value) != value:
+                    node.inputs[name].default_value = value
+                    count += 1
+
+    for node in roles.get("frame", ()):
+        if node.label != item.name:
+            node.label = item.name
+
+    # Update Adjustment Visuals
+    if item.layer_type == 'ADJUSTMENT':
+        col = (item.adj_vis_color[0], item.adj_vis_color[1], item.adj_vis_color[2], 1.0)
+        for node in roles.get("adj_color", ()):
+            if node.outputs[0].default_value[:] != col:
+                node.outputs[0].default_value = col
+                count += 1
+
+        for node in roles.get("adj_alpha", ()):
+            if node.outputs[0].default_value != item.adj_vis_alpha:
+                node.outputs[0].default_value = item.adj_vis_alpha
+                count += 1
+
+    for node in roles.get("opacity", ()):
+        if node.inputs[1].default_value != eff_opacity:
+            node.inputs[1].default_value = eff_opacity
+            count += 1
+
+    for node in roles.get("blend_opacity", ()):
+        if node.inputs["Opacity"].default_value != eff_opacity:
+            node.inputs["Opacity"].default_value = eff_opacity
+            count += 1
+
+    for node in roles.get("group_opacity", ()):
+        if node.outputs[0].default_value != eff_opacity:
+            node.outputs[0].default_value = eff_opacity
+            count += 1
+
+    target_mode = item.adj_vis_blend_mode if item.layer_type == 'ADJUSTMENT' else item.blend_mode
+    blender_mode = get_blender_blend_mode(target_mode)
+    for node in roles.get("mix", ()):
+        if hasattr(node, "blend_type") and node.blend_type != blender_mode:
+            node.blend_type = blender_mode
+            node.label = f"Mix {blender_mode}"
+            count += 1
+
+    for node in roles.get("blend_mode", ()):
+        if node.node_tree is None or node.node_tree.get("bpsd_blend_mode") != blender_mode:
+            node.node_tree = get_layer_blend_group(blender_mode)
+            node.label = f"Blend {blender_mode}"
+            count += 1
+
+    return count
+
+def update_layer_nodes(context, layer_ids=None):
+    """Push layer values into the node group; None updates every layer.
+
+    Returns the number of node values changed, or -1 without a group.
+    """
+    props = context.scene.bpsd_props
+    ng = bpy.data.node_groups.get(ui_ops.get_psd_group_name(props.active_psd_path))
+    if not ng:
+        return -1
+
+    id_map, _ = ui_ops.get_layer_maps(props)
+    if layer_ids is None:
+        layer_ids = list(id_map.keys())
+
+    count = 0
+    index = get_node_index(ng)
+    for lid in layer_ids:
+        if lid not in id_map:
+            continue
+
+        roles = _indexed_nodes(ng, index, lid)
+        if roles is None:
+            rebuild_node_index(ng)
+            index = get_node_index(ng)
+            roles = _indexed_nodes(ng, index, lid) or {}
+
+        count += _update_layer_nodes(props, props.layer_list[id_map[lid]], roles)
+
+    # Values changed but no pixels did: re-composite with what is cached.
+    preview_bake.request(context.scene, set())
+    return count
+
+# --- Update dispatcher ---
+# Property callbacks fire on every step of a slider drag. They only queue the
+# layer here; one timer tick later the whole batch is pushed into the nodes in
+# a single pass. UV override changes rebuild nodes, so they wait until the
+# value has stopped changing for UV_REBUILD_DELAY.
+
+NODE_UPDATE_DELAY = 0.02
+UV_REBUILD_DELAY = 0.5
+
+_pending_updates = set()
+_pending_full_update = False
+
+def queue_node_update(layer_id=0):
+    """Schedule update_layer_nodes for a layer (0: every layer)."""
+    global _pending_full_update
+    if layer_id > 0:
+        _pending_updates.add(layer_id)
+    else:
+        _pending_full_update = True
+
+    if not bpy.app.timers.is_registered(_flush_node_updates):
+        bpy.app.timers.register(_flush_node_updates, first_interval=NODE_UPDATE_DELAY)
+
+def _flush_node_updates():
+    global _pending_full_update
+    layer_ids = None if _pending_full_update else set(_pending_updates)
+    _pending_updates.clear()
+    _pending_full_update = False
+
+    try:
+        update_layer_nodes(bpy.context, layer_ids)
+    except Exception as e:
+        print(f"BPSD Node Update Error: {e}")
+    return None
+
+def queue_uv_rebuild():
+    # Re-arm on every change so a scrub through the UV list rebuilds once.
+    if bpy.app.timers.is_registered(_flush_uv_rebuild):
+        bpy.app.timers.unregister(_flush_uv_rebuild)
+    bpy.app.timers.register(_flush_uv_rebuild, first_interval=UV_REBUILD_DELAY)
+
+def _flush_uv_rebuild():
+    context = bpy.context
+    try:
+        if not patch_psd_nodes(context):
+            bpy.ops.bpsd.create_psd_nodes('EXEC_DEFAULT')
+    except Exception as e:
+        print(f"BPSD UV Rebuild Error: {e}")
+    return None
+
 class BPSD_OT_update_psd_nodes(bpy.types.Operator):
     bl_idname = "bpsd.update_psd_nodes"
     bl_label = "Update Node Values"
     bl_description = "Update opacity, visibility and blend modes without regenerating the graph"
 
+    # 0 updates every layer and re-applies interpolation.
+    layer_id: bpy.props.IntProperty(default=0, options={'SKIP_SAVE', 'HIDDEN'}) # type: ignore
+
     def execute(self, context):
         props = context.scene.bpsd_props
 
@@ -818,70 +1739,16 @@ class BPSD_OT_update_psd_nodes(bpy.types.Operator):
         if stored_sig != props.structure_signature:
             self.report({'WARNING'}, "Structure signature mismatch. Changes to hierarchy/masking require full regeneration.")
 
-        layer_map = {item.layer_id: item for item in props.layer_list if item.layer_id > 0}
+        if self.layer_id > 0:
+            update_layer_nodes(context, [self.layer_id])
+            return {'FINISHED'}
 
         target_interp = get_interpolation_mode(props)
-
-        count = 0
         for node in ng.nodes:
-            if node.type == 'TEX_IMAGE':
-                 if node.interpolation != target_interp:
-                     node.interpolation = target_interp
-                     count += 1
-
-            lid = node.get("bpsd_layer_id", 0)
-            if lid > 0 and lid in layer_map:
-                item = layer_map[lid]
-
-                if node.type == 'TEX_IMAGE' and node.label == "Layer Color":
-                     target_image = None
-                     if item.temp_channel_active:
-                         target_image = bpy.data.images.get(f"Temp_LayerID_{item.layer_id}")
-                     else:
-                         target_image = ui_ops.find_loaded_image(props.active_psd_path, -1, False, item.layer_id)
-                     
-                     if target_image and node.image != target_image:
-                         node.image = target_image
-                         count += 1
-
-                if node.type == 'FRAME':
-                    if node.label != item.name:
-                        node.label = item.name
-                
-                # Update Adjustment Visuals
-                if item.layer_type == 'ADJUSTMENT':
-                    if node.type == 'RGB' and node.label == "Adj Color":
-                        col = (item.adj_vis_color[0], item.adj_vis_color[1], item.adj_vis_color[2], 1.0)
-                        if node.outputs[0].default_value[:] != col:
-                            node.outputs[0].default_value = col
-                            count += 1
-                    
-                    if node.type == 'VALUE' and node.label == "Adj Alpha":
-                         if node.outputs[0].default_value != item.adj_vis_alpha:
-                             node.outputs[0].default_value = item.adj_vis_alpha
-                             count += 1
-
-                if node.type == 'MATH' and node.label == "* Opacity":
-                     eff_opacity = item.opacity * (1.0 if get_effective_visibility(item) else 0.0)
-                     if node.inputs[1].default_value != eff_opacity:
-                        node.inputs[1].default_value = eff_opacity
-                        count += 1
-
-                if node.type == 'VALUE' and node.label == "Group Opacity":
-                     eff_opacity = item.opacity * (1.0 if get_effective_visibility(item) else 0.0)
-                     if node.outputs[0].default_value != eff_opacity:
-                        node.outputs[0].default_value = eff_opacity
-                        count += 1
-
-                if node.type == 'MIX_RGB' or node.type == 'MIX':
-                    if node.label.startswith("Mix "):
-                         target_mode = item.adj_vis_blend_mode if item.layer_type == 'ADJUSTMENT' else item.blend_mode
-                         blender_mode = get_blender_blend_mode(target_mode)
-
-                         if hasattr(node, "blend_type") and node.blend_type != blender_mode:
-                             node.blend_type = blender_mode
-                             node.label = f"Mix {blender_mode}"
-                             count += 1
+            if node.type == 'TEX_IMAGE' and node.interpolation != target_interp:
+                node.interpolation = target_interp
+
+        update_layer_nodes(context)
 
         # self.report({'INFO'}, f"Updated {count} nodes.")
         return {'FINISHED'}
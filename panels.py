@@ -230,6 +230,17 @@ class BPSD_PT_main_panel(bpy.types.Panel):
                  icon='LINKED' if props.use_ps_direct_sync else 'UNLINKED')
         row.enabled = is_valid and ps_bridge.is_available()
 
+        row = sync_col.row(align=True)
+        row.prop(props, "regenerate_composite", text="Regenerate Composite", icon='IMAGE_RGB_ALPHA')
+        row.enabled = is_valid
+
+        row = sync_col.row(align=True)
+        row.prop(props, "use_direct_composite", text="Direct Preview", icon='IMAGE_DATA')
+        sub = row.row(align=True)
+        sub.prop(props, "composite_preview_scale", text="")
+        sub.enabled = props.use_direct_composite
+        row.enabled = is_valid
+
         if props.ps_sync_status:
             sync_col.label(text=props.ps_sync_status)
 
@@ -302,6 +313,9 @@ class BPSD_PT_main_panel(bpy.types.Panel):
 
         icon_interp = 'ALIASED' if props.use_closest_interpolation else 'ANTIALIASED'
         row.prop(props, "use_closest_interpolation", text="", icon=icon_interp, toggle=True)
+        row.prop(props, "use_compact_nodes", text="", icon='NODETREE', toggle=True)
+        row.prop(props, "use_atlas", text="", icon='UV', toggle=True)
+        row.prop(props, "use_baked_preview", text="", icon='IMAGE_DATA', toggle=True)
 
         row = layout.row(align=True)
 
@@ -360,6 +374,12 @@ class BPSD_PT_layer_context(bpy.types.Panel):
         col.operator("bpsd.reload_all", text="Reload All Synced", icon='FILE_REFRESH')
         col.operator("bpsd.clean_orphans", text="Purge Old Layers", icon='TRASH')
 
+        row = col.row(align=True)
+        row.prop(props, "proxy_factor", text="Load")
+        op = row.operator("bpsd.load_full_res", text="", icon='FULLSCREEN_ENTER')
+        op.all_layers = True
+        col.prop(props, "lazy_loading")
+
         if has_active_layer:
             item = props.layer_list[props.active_layer_index]
             layout.label(text=f"Selected: {item.name}", icon='PREFERENCES')
@@ -378,6 +398,13 @@ class BPSD_PT_layer_context(bpy.types.Panel):
         row = box.row()
         op = row.operator("bpsd.save_layer", text="Force Save", icon='FILE_TICK')
 
+        if has_active_layer:
+            img = ui_ops.find_loaded_image(props.active_psd_path, props.active_layer_index,
+                                           props.active_is_mask, item.layer_id)
+            if ui_ops.image_proxy_factor(img) > 1:
+                row = layout.row()
+                row.operator("bpsd.load_full_res", text="Load Full Res", icon='FULLSCREEN_ENTER')
+
         layout.separator()
         layout.label(text="Node Operations")
 
@@ -388,6 +415,8 @@ class BPSD_PT_layer_context(bpy.types.Panel):
 
         col = layout.column()
         col.operator("bpsd.create_group_nodes", icon='FILE_FOLDER')
+        col.operator("bpsd.benchmark_nodes", icon='TIME')
 
         layout.separator()
-        layout.operator("bpsd.debug_rw_test", icon='FILE_REFRESH', text="Debug RW Test")
\ No newline at end of file
+        layout.operator("bpsd.debug_rw_test", icon='FILE_REFRESH', text="Debug RW Test")
+        layout.operator("bpsd.debug_packbits", icon='TIME')
\ No newline at end of file
@@ -0,0 +1,393 @@
+"""Background reading of placeholder layers (lazy loading).
+
+With lazy loading on, building the node network reads no pixels at all:
+every layer texture starts out as a 1x1 placeholder (see
+ui_ops.new_placeholder_image) and this module fills them in afterwards, so
+the file is usable as soon as the layer list is. A layer the user selects is
+read right away by load_layer; the rest are queued for a worker thread in
+the order they are likely to be looked at: visible layers first, each group
+top of the stack down. Showing a hidden layer moves it to the front.
+
+The worker only decodes, through the layer cache when that is enabled and
+otherwise from one LayeredFile opened for the whole run. Blender data is
+only touched on the main thread, by a timer that writes finished layers for
+at most APPLY_BUDGET seconds per tick so the UI stays responsive while the
+textures fill in.
+
+Starting a new run (connect, a node build that added placeholders) cancels
+the previous one, and results of a cancelled run are dropped.
+
+Separately, selecting a layer warms the layer cache with its neighbours in
+the stack (see the Neighbours section below).
+"""
+
+import queue
+import threading
+import time
+
+import bpy
+
+from . import psd_engine
+from . import psd_scan
+from . import ui_ops
+from . import node_ops
+from . import preview_bake
+from . import atlas
+
+APPLY_INTERVAL = 0.05
+
+# Seconds of image writes per timer tick. At least one layer is always
+# written, however long it takes.
+APPLY_BUDGET = 0.03
+
+
+class PrefetchRun:
+    def __init__(self, psd_path, requests):
+        self.psd_path = psd_path
+        self.pending = list(requests)
+        self.total = len(self.pending)
+        self.results = queue.Queue()
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    def next_request(self):
+        with self.lock:
+            return self.pending.pop(0) if self.pending else None
+
+    def prioritize(self, layer_ids):
+        with self.lock:
+            front = [req for req in self.pending if req['layer_id'] in layer_ids]
+            if front:
+                self.pending = front + [req for req in self.pending if req['layer_id'] not in layer_ids]
+
+    def discard(self, layer_id, is_mask):
+        with self.lock:
+            self.pending = [req for req in self.pending
+                            if (req['layer_id'], req['is_mask']) != (layer_id, is_mask)]
+
+
+_run = None
+
+
+def _placeholder_requests(props):
+    """Read requests for every placeholder of the active PSD, in fetch order."""
+    psd_path = props.active_psd_path
+    factor = int(props.proxy_factor)
+
+    order = []
+    for img in ui_ops.managed_images(psd_path):
+        if not ui_ops.is_placeholder(img):
+            continue
+        index, item = ui_ops.find_layer_item(props, img.get("psd_layer_id", 0), img.get("psd_layer_path"))
+        if item is None:
+            continue
+
+        visible = node_ops.get_effective_visibility(item) and not item.hidden_by_parent
+        order.append(((not visible, index), {
+            'layer_path': item.path,
+            'layer_index': index,
+            'width': props.psd_width,
+            'height': props.psd_height,
+            'is_mask': img.get("psd_is_mask", False),
+            'layer_id': item.layer_id,
+            'factor': factor
+        }))
+
+    order.sort(key=lambda entry: entry[0])
+    return [req for _, req in order]
+
+
+def _work(run, cache):
+    content = None
+    if cache is not None:
+        fp = psd_scan.cached_fingerprint(run.psd_path)
+        content = fp["content"] if fp else None
+
+    layered_file = None
+    try:
+        while not run.cancelled.is_set():
+            req = run.next_request()
+            if req is None:
+                break
+
+            pixels = cache.load(run.psd_path, req, content) if content is not None else None
+            if pixels is None:
+                if layered_file is None:
+                    layered_file = psd_engine.open_file(run.psd_path)
+                    if layered_file is None:
+                        break
+                    # Cache entries must match what was just opened; a save
+                    # in between turns the cache off for this run.
+                    if content is not None:
+                        fp = psd_scan.cached_fingerprint(run.psd_path)
+                        if fp is None or fp["content"] != content:
+                            content = None
+
+                pixels = psd_engine.read_request(layered_file, req)
+                if content is not None:
+                    cache.store(run.psd_path, [(req, pixels)], content)
+
+            run.results.put((req, pixels))
+    except Exception as e:
+        print(f"BPSD Prefetch Error: {e}")
+    finally:
+        run.finished.set()
+
+
+def start(scene):
+    """(Re)start filling the active PSD's placeholders in the background."""
+    cancel()
+
+    props = scene.bpsd_props
+    requests = _placeholder_requests(props)
+    if not requests:
+        return
+
+    global _run
+    _run = PrefetchRun(props.active_psd_path, requests)
+    threading.Thread(target=_work, args=(_run, ui_ops.get_layer_cache()),
+                     name="bpsd-prefetch", daemon=True).start()
+
+    if not bpy.app.timers.is_registered(_apply):
+        bpy.app.timers.register(_apply, first_interval=APPLY_INTERVAL)
+    print(f"BPSD: Prefetching {len(requests)} deferred layer(s)")
+
+
+def cancel():
+    """Stop the placeholder run and drop queued neighbour reads."""
+    global _run
+    if _run is not None:
+        _run.cancelled.set()
+        _run = None
+    _neighbours.clear()
+
+
+def shutdown():
+    cancel()
+    _neighbours.stop()
+
+
+def _finish(run):
+    global _run
+    if _run is run:
+        _run = None
+
+
+def is_running(psd_path=None):
+    return _run is not None and (psd_path is None or _run.psd_path == psd_path)
+
+
+def prioritize(psd_path, layer_ids):
+    """Fetch these layers next (e.g. because they just became visible)."""
+    if is_running(psd_path):
+        _run.prioritize(set(layer_ids))
+
+
+def discard(psd_path, layer_id, is_mask):
+    """Drop a layer from the queue; it is being loaded some other way."""
+    if is_running(psd_path):
+        _run.discard(layer_id, is_mask)
+
+
+def _apply():
+    run = _run
+    if run is None:
+        return None
+
+    scene = bpy.context.scene
+    props = scene.bpsd_props if scene else None
+    if props is None or props.active_psd_path != run.psd_path:
+        cancel()
+        return None
+
+    started = time.perf_counter()
+    filled = set()
+    float_buf = None
+    while not filled or time.perf_counter() - started < APPLY_BUDGET:
+        try:
+            req, pixels = run.results.get_nowait()
+        except queue.Empty:
+            break
+        if pixels is None:
+            continue
+
+        # Selected (and so loaded) in the meantime, or removed by a sync.
+        img = ui_ops.find_loaded_image(run.psd_path, req['layer_index'], req['is_mask'], req['layer_id'])
+        if not ui_ops.is_placeholder(img):
+            continue
+
+        try:
+            w, h = psd_engine.proxy_size(req['width'], req['height'], req['factor'])
+            float_buf = ui_ops.fill_layer_image(img, pixels, w, h, req['is_mask'], req['factor'], float_buf)
+            img.update()
+            ui_ops.persist_image(img)
+            filled.add(req['layer_id'])
+        except Exception as e:
+            print(f"BPSD Prefetch: failed to fill {img.name}: {e}")
+
+    if filled:
+        ui_ops.redraw_image_views(bpy.context)
+        preview_bake.request(scene, filled)
+        atlas.request(scene, filled)
+
+    if run.finished.is_set() and run.results.empty():
+        _finish(run)
+        print(f"BPSD: Prefetch of {run.total} layer(s) done")
+        return None
+    return APPLY_INTERVAL
+
+
+# --- Neighbours ---
+# With auto-load on, selecting a layer reads it synchronously, and the layers
+# next to it are the ones most likely to be selected next. Those (and the
+# selected layer's mask or colour) are decoded on a long-lived worker straight
+# into the layer cache, so the next load_layer is a memory-mapped hit. The
+# queue holds one selection's worth of requests, at most NEIGHBOUR_QUEUE, and
+# every selection replaces it: browsing quickly never leaves a backlog of
+# layers already scrolled past, only the read in flight finishes.
+#
+# The worker keeps its LayeredFile open across selections while the PSD's
+# fingerprint is unchanged, and lets go of it after NEIGHBOUR_IDLE seconds
+# without work. Fingerprints come from psd_scan.cached_fingerprint, so a
+# request costs an os.stat and the file is only rescanned after a save.
+# Nothing here touches Blender data.
+
+NEIGHBOUR_QUEUE = 8
+NEIGHBOUR_IDLE = 30.0
+
+
+class NeighbourPrefetcher:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.psd_path = None
+        self.pending = []
+        self.cache = None
+        self.thread = None
+        self.stopped = False
+        self.file = None
+        self.file_key = None
+
+    def submit(self, psd_path, requests, cache):
+        with self.cond:
+            self.psd_path = psd_path
+            self.pending = list(requests[:NEIGHBOUR_QUEUE])
+            self.cache = cache
+            if self.pending and (self.thread is None or not self.thread.is_alive()):
+                self.stopped = False
+                self.thread = threading.Thread(target=self._loop, name="bpsd-neighbours", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def clear(self):
+        with self.cond:
+            self.pending = []
+
+    def stop(self):
+        with self.cond:
+            self.pending = []
+            self.stopped = True
+            self.cond.notify()
+
+    def _next(self):
+        """(psd_path, request, cache), or None; idle is set after a wait
+        that ran out without any work arriving."""
+        with self.cond:
+            idle = False
+            if not self.pending and not self.stopped:
+                idle = not self.cond.wait(NEIGHBOUR_IDLE)
+            if self.stopped or not self.pending:
+                return None, idle
+            return (self.psd_path, self.pending.pop(0), self.cache), False
+
+    def _loop(self):
+        while not self.stopped:
+            job, idle = self._next()
+            if job is None:
+                if idle:
+                    self.file = None
+                    self.file_key = None
+                continue
+            try:
+                self._warm(*job)
+            except Exception as e:
+                print(f"BPSD Neighbour Prefetch Error: {e}")
+        self.file = None
+        self.file_key = None
+
+    def _warm(self, psd_path, req, cache):
+        fp = psd_scan.cached_fingerprint(psd_path)
+        if fp is None:
+            return
+        content = fp["content"]
+        if cache.contains(psd_path, req, content):
+            return
+
+        if self.file_key != (psd_path, content):
+            self.file = None
+            self.file_key = None
+            layered_file = psd_engine.open_file(psd_path)
+            after = psd_scan.cached_fingerprint(psd_path)
+            if layered_file is None or after is None or after["content"] != content:
+                return
+            self.file = layered_file
+            self.file_key = (psd_path, content)
+
+        cache.store(psd_path, [(req, psd_engine.read_request(self.file, req))], content)
+
+
+_neighbours = NeighbourPrefetcher()
+
+
+def prefetch_neighbours(scene, index):
+    """Queue the layers around index for decoding into the layer cache,
+    replacing whatever an earlier selection queued."""
+    props = scene.bpsd_props
+    prefs = ui_ops.get_addon_prefs()
+    radius = prefs.prefetch_neighbours if prefs else 0
+    cache = ui_ops.get_layer_cache()
+    if radius <= 0 or cache is None or not 0 <= index < len(props.layer_list):
+        _neighbours.clear()
+        return
+
+    psd_path = props.active_psd_path
+    factor = int(props.proxy_factor)
+
+    wanted = [(index, not props.active_is_mask)]
+    for distance in range(1, radius + 1):
+        for i in (index - distance, index + distance):
+            if 0 <= i < len(props.layer_list):
+                wanted += [(i, False), (i, True)]
+
+    requests = []
+    placeholders = set()
+    for i, is_mask in wanted:
+        item = props.layer_list[i]
+        if item.layer_type == "UNKNOWN":
+            continue
+        if is_mask and not item.has_mask:
+            continue
+        if not is_mask and item.layer_type in {"GROUP", "ADJUSTMENT"}:
+            continue
+
+        img = ui_ops.find_loaded_image(psd_path, i, is_mask, item.layer_id)
+        if img and not ui_ops.is_placeholder(img):
+            continue
+        # The placeholder run reads it anyway; just move it up.
+        if img and is_running(psd_path):
+            placeholders.add(item.layer_id)
+            continue
+
+        requests.append({
+            'layer_path': item.path,
+            'layer_index': i,
+            'width': props.psd_width,
+            'height': props.psd_height,
+            'is_mask': is_mask,
+            'layer_id': item.layer_id,
+            'factor': factor
+        })
+
+    if placeholders:
+        prioritize(psd_path, placeholders)
+    _neighbours.submit(psd_path, requests, cache)
@@ -0,0 +1,222 @@
+"""Baked composite preview.
+
+The live preview builds a shader network with a handful of math and mix
+nodes per layer, so Eevee compile time and material preview cost grow with
+the layer count. In baked mode the PSD node group instead samples a single
+image that the CPU compositor renders from the layer images already loaded
+in Blender, and the shader stays the same size however big the stack gets.
+
+Bakes are requested rather than run inline: saves, reloads from disk, value
+edits and paint activity all call request(), and one short timer merges
+whatever piled up into a single incremental bake. Only layers named in a
+request are re-read from Blender, only the rect that actually changed is
+invalidated, and the tiled compositor recomposites just those tiles.
+"""
+
+import bpy
+import numpy as np
+
+from . import compositor
+from . import node_ops
+from . import psd_engine
+from . import ui_ops
+
+BAKE_DELAY = 0.25
+
+# Layer ids to refresh per PSD; None means every layer.
+_pending = {}
+
+
+def baked_image_name(psd_path):
+    return f"{ui_ops.get_psd_group_name(psd_path)} (Baked)"
+
+def get_baked_image(props, create=False):
+    name = baked_image_name(props.active_psd_path)
+    img = bpy.data.images.get(name)
+
+    if img and tuple(img.size) != (props.psd_width, props.psd_height):
+        img.scale(props.psd_width, props.psd_height)
+
+    if img is None and create and props.psd_width > 0 and props.psd_height > 0:
+        img = ui_ops.new_layer_image(props, name, props.psd_width, props.psd_height)
+        ui_ops.set_layer_colorspace(img, props)
+        img["bpsd_baked_preview"] = True
+        img["psd_path"] = props.active_psd_path
+    return img
+
+
+def build_structure(props):
+    """layer_list as the nested, top-to-bottom structure compositor expects."""
+    root = []
+    stack = [(-1, root)]
+
+    for i, item in enumerate(props.layer_list):
+        while stack[-1][0] >= item.indent:
+            stack.pop()
+
+        node = {
+            "index": i,
+            "layer_id": item.layer_id,
+            "path": item.path,
+            "layer_type": item.layer_type,
+            "blend_mode": item.blend_mode,
+            "opacity": item.opacity,
+            "is_visible": node_ops.get_effective_visibility(item),
+            "is_clipping_mask": item.is_clipping_mask,
+            "has_mask": item.has_mask,
+            "children": [],
+        }
+        stack[-1][1].append(node)
+
+        if item.layer_type == 'GROUP':
+            stack.append((item.indent, node["children"]))
+
+    return root
+
+
+def _image_pixels(img):
+    w, h = img.size
+    buf = np.empty(w * h * 4, dtype=np.float32)
+    img.pixels.foreach_get(buf)
+    return buf.reshape((h, w, 4))
+
+
+class BlenderLayerSource:
+    """compositor source reading the layer images loaded in Blender.
+
+    Everything stays in Blender's bottom-up row order; the layer images are
+    canvas-sized (proxies are blown back up), so every layer sits at (0, 0)
+    and the result can be written straight back into an image.
+    """
+
+    def __init__(self, psd_path, width, height):
+        self.psd_path = psd_path
+        self.width = width
+        self.height = height
+
+    def _pixels(self, img):
+        factor = ui_ops.image_proxy_factor(img)
+        if factor <= 1:
+            return _image_pixels(img)
+        w, h = img.size
+        buf = np.empty(w * h * 4, dtype=np.float32)
+        img.pixels.foreach_get(buf)
+        return psd_engine.upsample_proxy(buf, factor, self.width, self.height).reshape(self.height, self.width, 4)
+
+    def _image(self, node, is_mask):
+        if not is_mask and node["layer_id"] > 0:
+            temp = bpy.data.images.get(f"Temp_LayerID_{node['layer_id']}")
+            if temp:
+                return temp
+        img = ui_ops.find_loaded_image(self.psd_path, node["index"], is_mask, node["layer_id"])
+        return None if ui_ops.is_placeholder(img) else img
+
+    def color(self, node):
+        img = self._image(node, False)
+        if img is None:
+            return None
+        return self._pixels(img), 0, 0
+
+    def mask(self, node):
+        img = self._image(node, True)
+        if img is None:
+            return None
+        return np.ascontiguousarray(self._pixels(img)[..., 0]), 0, 0, 1.0
+
+    def bounds(self, node):
+        img = self._image(node, False)
+        if img is None:
+            return None
+        if ui_ops.image_proxy_factor(img) > 1:
+            return (0, 0, self.width, self.height)
+        return (0, 0, img.size[0], img.size[1])
+
+
+class PreviewBaker:
+    def __init__(self, psd_path, width, height):
+        self.psd_path = psd_path
+        self.source = BlenderLayerSource(psd_path, width, height)
+        self.tiled = compositor.TiledCompositor(self.source, width, height)
+        self.out = None
+
+    def _leaves(self, nodes):
+        for node in nodes:
+            yield node
+            yield from self._leaves(node["children"])
+
+    def bake(self, props, layer_ids=None):
+        structure = build_structure(props)
+        self.tiled.set_structure(structure)
+
+        for node in self._leaves(structure):
+            if layer_ids is not None and node["layer_id"] not in layer_ids:
+                continue
+            ident = node["layer_id"] or node["path"]
+            if node["layer_type"] != 'GROUP':
+                self.tiled.update_layer(ident, "color", self.source.color(node))
+            if node["has_mask"]:
+                self.tiled.update_layer(ident, "mask", self.source.mask(node))
+
+        self.out = self.tiled.render(out=self.out, workers=compositor.default_workers())
+        return self.out
+
+
+def _get_baker(props):
+    bakers = ui_ops.runtime_state.baked_previews
+    baker = bakers.get(props.active_psd_path)
+    size = (props.psd_width, props.psd_height)
+
+    if baker is None or (baker.tiled.width, baker.tiled.height) != size:
+        baker = PreviewBaker(props.active_psd_path, *size)
+        bakers[props.active_psd_path] = baker
+    return baker
+
+
+def bake_now(scene, layer_ids=None):
+    """Bake synchronously. layer_ids limits which layers are re-read."""
+    props = scene.bpsd_props
+    if not props.active_psd_path or props.psd_width <= 0 or props.psd_height <= 0:
+        return False
+
+    img = get_baked_image(props, create=True)
+    if img is None:
+        return False
+
+    try:
+        out = _get_baker(props).bake(props, layer_ids)
+    except Exception as e:
+        print(f"BPSD Bake Error: {e}")
+        return False
+
+    img.pixels.foreach_set(out.ravel())
+    img.update()
+    return True
+
+
+def request(scene, layer_ids=None):
+    """Queue a bake of the given layers (None: all) if baked preview is on."""
+    props = scene.bpsd_props
+    if not props.use_baked_preview or not props.active_psd_path:
+        return
+
+    psd_path = props.active_psd_path
+    if layer_ids is None or _pending.get(psd_path, set()) is None:
+        _pending[psd_path] = None
+    else:
+        _pending.setdefault(psd_path, set()).update(layer_ids)
+
+    if not bpy.app.timers.is_registered(_flush):
+        bpy.app.timers.register(_flush, first_interval=BAKE_DELAY)
+
+def _flush():
+    scene = bpy.context.scene
+    if scene is None:
+        _pending.clear()
+        return None
+
+    layer_ids = _pending.pop(scene.bpsd_props.active_psd_path, set())
+    _pending.clear()
+
+    if scene.bpsd_props.use_baked_preview:
+        bake_now(scene, layer_ids)
+    return None
@@ -68,22 +68,29 @@ def _png_chunk(tag, data):
             + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
 
 
-def _write_rgba_png(path, arr):
-    """arr: (H, W, 4) uint8, top-left origin.
+def _write_png(path, arr):
+    """arr: (H, W, 4) RGBA or (H, W) greyscale, uint8 or uint16, top-left origin.
 
     Written by hand because the addon only bundles photoshopapi - there is no
     pillow to lean on. The sRGB chunk matters: without it Photoshop can raise a
     missing-profile dialog on open and stall the whole silent workflow.
     """
     h, w = arr.shape[:2]
+    channels = arr.shape[2] if arr.ndim == 3 else 1
+    color_type = 6 if channels == 4 else 0
+    depth = 16 if arr.dtype == np.uint16 else 8
 
-    raw = np.empty((h, w * 4 + 1), dtype=np.uint8)
+    # PNG samples are big-endian; viewing them as bytes gives 2 per sample.
+    samples = arr.astype(">u2") if depth == 16 else arr
+    row = np.ascontiguousarray(samples).reshape(h, w * channels).view(np.uint8)
+
+    raw = np.empty((h, row.shape[1] + 1), dtype=np.uint8)
     raw[:, 0] = 0                      # filter type 0 (None) per scanline
-    raw[:, 1:] = arr.reshape(h, w * 4)
+    raw[:, 1:] = row
 
     with open(path, "wb") as f:
         f.write(b"\x89PNG\r\n\x1a\n")
-        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0)))
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, depth, color_type, 0, 0, 0)))
         f.write(_png_chunk(b"sRGB", bytes([0])))
         f.write(_png_chunk(b"gAMA", struct.pack(">I", 45455)))
         f.write(_png_chunk(b"IDAT", zlib.compress(raw.tobytes(), PNG_COMPRESS_LEVEL)))
@@ -92,19 +99,39 @@ def _write_rgba_png(path, arr):
 
 # ------------------------------------------------------------------ job build
 
+def _linear_to_srgb(pixels):
+    """sRGB transfer on the colour channels of linear (H, W, 4) floats;
+    alpha stays linear."""
+    out = np.clip(pixels, 0.0, 1.0)
+    rgb = out[..., :3]
+    np.copyto(rgb, np.where(rgb <= 0.0031308, rgb * 12.92,
+                            1.055 * np.power(rgb, 1.0 / 2.4) - 0.055))
+    return out
+
 def _serialize_layer(job_dir, index, update):
     """Write one layer's pixels as a PNG for Photoshop to open.
 
-    Masks reuse the same RGBA PNG: the addon already stores a mask as grey in
-    all three colour channels with full alpha, so filling the mask channel with
-    it picks up the right luminance.
+    Masks are written as a greyscale PNG, a quarter of the data; filling the
+    mask channel with it picks up the grey level directly. 16-bit documents
+    get a 16-bit PNG.
+
+    32-bit documents don't come through here (see perform_save_images): their
+    linear, possibly > 1.0 values have no faithful PNG form. Float pixels
+    that do arrive are sRGB-encoded, which is what the PNG's sRGB chunk tells
+    Photoshop, rather than written as linear values it would darken.
     """
-    pixels = psd_engine._prepare_blender_pixels(
-        update["pixels"], update["width"], update["height"]
-    )
+    if update["is_mask"]:
+        prepare = psd_engine._prepare_mask_pixels
+    else:
+        prepare = psd_engine._prepare_blender_pixels
+    pixels = prepare(update["pixels"], update["width"], update["height"])
+    if pixels.dtype == np.float32:
+        if not update["is_mask"]:
+            pixels = _linear_to_srgb(pixels)
+        pixels = psd_engine.convert_depth(pixels, np.uint16)
 
     filename = f"{index}.png"
-    _write_rgba_png(os.path.join(job_dir, filename), pixels)
+    _write_png(os.path.join(job_dir, filename), pixels)
 
     return {
         "file": filename,
@@ -1,72 +1,123 @@
+import mmap
+import struct
+
 import numpy as np
 import photoshopapi as psapi
 
-def read_file(path):
-    try:
-        layered_file = psapi.LayeredFile.read(path)
-
-        def parse_layer_structure(layer, current_index_path="", child_index=0, parent_visible=True):
-            layer_name = layer.name
-            index_path = f"{current_index_path}/{child_index}" if current_index_path else str(child_index)
-
-            is_group = False
-
-            match layer:
-                case psapi.GroupLayer_8bit():
-                    layer_type = "GROUP"
-                    is_group = True
-                case psapi.AdjustmentLayer_8bit():
-                    layer_type = "ADJUSTMENT"
-                case psapi.SmartObjectLayer_8bit():
-                    layer_type = "SMART"
-                case psapi.Layer_8bit():
-                    layer_type = "LAYER"
-                case _:
-                    layer_type = "UNKNOWN"
-
-            has_mask = layer.has_mask()
-
-            if layer_name == "":
-                layer_type = "UNKNOWN"
-                layer_name = "UNKNOWN"
-
-            print(layer.blend_mode)
+try:
+    from . import compositor
+    from . import packbits
+    from . import psd_scan
+except ImportError:
+    # Loaded outside the add-on package, e.g. headless with the add-on
+    # directory on sys.path.
+    import compositor
+    import packbits
+    import psd_scan
+
+# --- BIT DEPTH ---
+# photoshopapi has one class per bit depth for documents and every layer type.
+# Layer data comes back as uint8, uint16 or float32 planes to match; the
+# engine keeps that native precision until it reaches Blender's floats.
+
+DEPTH_DTYPES = {8: np.uint8, 16: np.uint16, 32: np.float32}
+
+def _depth_classes(name):
+    return tuple(getattr(psapi, f"{name}_{depth}bit") for depth in DEPTH_DTYPES
+                 if hasattr(psapi, f"{name}_{depth}bit"))
+
+GROUP_LAYER_TYPES = _depth_classes("GroupLayer")
+ADJUSTMENT_LAYER_TYPES = _depth_classes("AdjustmentLayer")
+SMART_LAYER_TYPES = _depth_classes("SmartObjectLayer")
+LAYER_TYPES = _depth_classes("Layer")
+
+def bit_depth(layered_file):
+    for depth in (16, 32):
+        cls = getattr(psapi, f"LayeredFile_{depth}bit", None)
+        if cls is not None and isinstance(layered_file, cls):
+            return depth
+    return 8
+
+def _unit_scale(dtype):
+    return float(np.iinfo(dtype).max) if np.issubdtype(dtype, np.integer) else 1.0
+
+def convert_depth(arr, dtype):
+    """arr rescaled into dtype (uint8 / uint16 / float32)."""
+    dtype = np.dtype(dtype)
+    if arr.dtype == dtype:
+        return arr
+    unit = arr.astype(np.float32) / np.float32(_unit_scale(arr.dtype))
+    if dtype.kind == 'f':
+        return unit.astype(dtype)
+    scale = _unit_scale(dtype)
+    return np.rint(np.clip(unit, 0.0, 1.0) * scale).astype(dtype)
+
+def _parse_structure(layered_file):
+    def parse_layer_structure(layer, current_index_path="", child_index=0, parent_visible=True):
+        layer_name = layer.name
+        index_path = f"{current_index_path}/{child_index}" if current_index_path else str(child_index)
+
+        is_group = False
+
+        if isinstance(layer, GROUP_LAYER_TYPES):
+            layer_type = "GROUP"
+            is_group = True
+        elif isinstance(layer, ADJUSTMENT_LAYER_TYPES):
+            layer_type = "ADJUSTMENT"
+        elif isinstance(layer, SMART_LAYER_TYPES):
+            layer_type = "SMART"
+        elif isinstance(layer, LAYER_TYPES):
+            layer_type = "LAYER"
+        else:
+            layer_type = "UNKNOWN"
+
+        has_mask = layer.has_mask()
+
+        if layer_name == "":
+            layer_type = "UNKNOWN"
+            layer_name = "UNKNOWN"
+
+        node = {
+            "name": layer_name,
+            "path": index_path,
+            "layer_type": layer_type,
+            "has_mask": has_mask,
+            "is_clipping_mask": layer.clipping_mask,
+            "is_visible": layer.is_visible,
+            "hidden_by_parent": not parent_visible,
+            "layer_id" : layer.layer_id,
+            "blend_mode": str(layer.blend_mode).replace("BlendMode.", "").strip(),
+            "opacity": layer.opacity,
+            "children": []
+        }
 
-            node = {
-                "name": layer_name,
-                "path": index_path,
-                "layer_type": layer_type,
-                "has_mask": has_mask,
-                "is_clipping_mask": layer.clipping_mask,
-                "is_visible": layer.is_visible,
-                "hidden_by_parent": not parent_visible,
-                "layer_id" : layer.layer_id,
-                "blend_mode": str(layer.blend_mode).replace("BlendMode.", "").strip(),
-                "opacity": layer.opacity,
-                "children": []
-            }
+        # if layer_type == "LAYER":
+            # print(f"Layer {layer_name} has compression {str(layer.compression)}")
 
-            # if layer_type == "LAYER":
-                # print(f"Layer {layer_name} has compression {str(layer.compression)}")
+        if is_group:
+            is_effectively_visible = parent_visible and layer.is_visible
 
-            if is_group:
-                is_effectively_visible = parent_visible and layer.is_visible
+            for i, child in enumerate(layer.layers):
+                node["children"].append(parse_layer_structure(child, index_path, i, is_effectively_visible))
 
-                for i, child in enumerate(layer.layers):
-                    node["children"].append(parse_layer_structure(child, index_path, i, is_effectively_visible))
+        return node
 
-            return node
+    structure = []
 
-        structure = []
+    for i, layer in enumerate(layered_file.layers):
+        structure.append(parse_layer_structure(layer, "", i, True))
 
-        for i, layer in enumerate(layered_file.layers):
-            structure.append(parse_layer_structure(layer, "", i, True))
+    return structure
 
-        return structure, layered_file.width, layered_file.height
+def read_file(path):
+    """(structure, width, height, bit_depth) of a PSD; ([], 0, 0, 8) on failure."""
+    try:
+        layered_file = psapi.LayeredFile.read(path)
+        return _parse_structure(layered_file), layered_file.width, layered_file.height, bit_depth(layered_file)
 
     except Exception as e:
         print(f"BPSD Engine Error (Read Structure): {e}")
-        return [], 0, 0
+        return [], 0, 0, 8
 
 
 def get_layer_by_index_path(layered_file, index_path):
@@ -142,40 +193,163 @@ def paste_to_canvas(canvas, source_arr, canvas_w, canvas_h, offset_x, offset_y):
     if dst_x2 > dst_x1 and dst_y2 > dst_y1:
         canvas[dst_y1:dst_y2, dst_x1:dst_x2] = source_arr[src_y1:src_y2, src_x1:src_x2]
 
-def _read_layer_internal(layered_file, layer_path, target_w, target_h, fetch_mask, layer_id=0):
+# --- PROXIES ---
+# A proxy read box-filters a layer down by an integer factor while it is
+# pasted, so the canvas-sized full-resolution planes never exist. Each layer
+# is cut into strips of whole blocks on the proxy grid and every strip is
+# summed block by block with one reshape. Colour is averaged premultiplied, so
+# transparent pixels don't bleed their (meaningless) colour into the edges.
+
+PROXY_STRIP_BLOCKS = 64
+
+def proxy_size(width, height, factor):
+    return -(-width // factor), -(-height // factor)
+
+def _paste_box(accum, source, offset_x, offset_y, factor, canvas_w, canvas_h, weight=None):
+    """Add the factor x factor block sums of source (times weight) into accum,
+    a float32 canvas on the proxy grid."""
+    src_h, src_w = source.shape
+
+    dst_x1 = max(0, offset_x)
+    dst_y1 = max(0, offset_y)
+    dst_x2 = min(canvas_w, offset_x + src_w)
+    dst_y2 = min(canvas_h, offset_y + src_h)
+    if dst_x2 <= dst_x1 or dst_y2 <= dst_y1:
+        return
+
+    src_x1, src_y1 = dst_x1 - offset_x, dst_y1 - offset_y
+    width, height = dst_x2 - dst_x1, dst_y2 - dst_y1
+
+    pad_x, pad_y = dst_x1 % factor, dst_y1 % factor
+    block_x, block_y = dst_x1 // factor, dst_y1 // factor
+    cols = -(-(pad_x + width) // factor)
+
+    strip = PROXY_STRIP_BLOCKS * factor
+    buf = np.empty((strip, cols * factor), dtype=np.float32)
+
+    for top in range(-pad_y, height, strip):
+        y0, y1 = max(top, 0), min(top + strip, height)
+        buf.fill(0.0)
+        dst = buf[y0 - top:y1 - top, pad_x:pad_x + width]
+        dst[...] = source[src_y1 + y0:src_y1 + y1, src_x1:src_x1 + width]
+        if weight is not None:
+            dst *= weight[src_y1 + y0:src_y1 + y1, src_x1:src_x1 + width]
+
+        blocks = -(-(y1 - top) // factor)
+        sums = buf[:blocks * factor].reshape(blocks, factor, cols, factor).sum(axis=(1, 3))
+        row = block_y + (top + pad_y) // factor
+        accum[row:row + blocks, block_x:block_x + cols] += sums
+
+def _from_unit(arr, dtype):
+    if dtype.kind == 'f':
+        return arr.astype(dtype, copy=False)
+    scale = _unit_scale(dtype)
+    return np.rint(np.clip(arr, 0.0, 1.0) * scale).astype(dtype)
+
+def _read_layer_proxy(layer, dtype, target_w, target_h, fetch_mask, factor):
+    proxy_w, proxy_h = proxy_size(target_w, target_h, factor)
+    area = float(factor * factor)
+
+    if fetch_mask:
+        try:
+            mask_arr = layer.mask
+        except:
+            mask_arr = None
+        if mask_arr is not None and mask_arr.size > 0:
+            dtype = mask_arr.dtype
+
+        unit = _unit_scale(dtype)
+        default = getattr(layer, 'mask_default_color', 255) / 255.0
+        accum = np.full((proxy_h, proxy_w), default * area, dtype=np.float32)
+        if mask_arr is not None and mask_arr.size > 0:
+            mask_left, mask_top = _mask_origin(layer, mask_arr)
+            # Inside the mask's rect the default is replaced, not added to.
+            delta = mask_arr.astype(np.float32) / np.float32(unit) - np.float32(default)
+            _paste_box(accum, delta, mask_left, mask_top, factor, target_w, target_h)
+
+        return np.ascontiguousarray(_from_unit(np.flipud(accum / area), dtype)).ravel()
+
+    planar_data = layer.get_image_data()
+    if not planar_data:
+        return np.zeros(proxy_w * proxy_h * 4, dtype=dtype)
+    dtype = planar_data[next(iter(planar_data))].dtype
+    unit = np.float32(_unit_scale(dtype))
+
+    layer_left, layer_top = _layer_origin(layer)
+    if -1 in planar_data:
+        alpha = planar_data[-1].astype(np.float32) / unit
+    else:
+        alpha = np.ones((layer.height, layer.width), dtype=np.float32)
+
+    acc_a = np.zeros((proxy_h, proxy_w), dtype=np.float32)
+    _paste_box(acc_a, alpha, layer_left, layer_top, factor, target_w, target_h)
+    covered = acc_a > 0.0
+    safe_a = np.where(covered, acc_a, 1.0)
+
+    out = np.zeros((proxy_h, proxy_w, 4), dtype=dtype)
+    for i in (0, 1, 2):
+        if i not in planar_data:
+            continue
+        acc_c = np.zeros((proxy_h, proxy_w), dtype=np.float32)
+        _paste_box(acc_c, planar_data[i], layer_left, layer_top, factor, target_w, target_h, weight=alpha)
+        out[..., i] = _from_unit(np.where(covered, acc_c / safe_a / unit, 0.0), dtype)
+    out[..., 3] = _from_unit(acc_a / area, dtype)
+
+    return np.ascontiguousarray(np.flipud(out)).ravel()
+
+def upsample_proxy(pixels, factor, width, height):
+    """Nearest-neighbour blow-up of flat bottom-up proxy RGBA to width x height.
+
+    Proxy rows are counted from the top of the canvas, so the padding of a
+    canvas that doesn't divide evenly is cut from the bottom-up buffer's start.
+    """
+    proxy_w, proxy_h = proxy_size(width, height, factor)
+    arr = np.asarray(pixels).reshape(proxy_h, proxy_w, 4)
+    big = arr.repeat(factor, axis=0).repeat(factor, axis=1)
+    return np.ascontiguousarray(big[big.shape[0] - height:, :width]).ravel()
+
+def _layer_origin(layer):
+    return int(layer.center_x - (layer.width / 2)), int(layer.center_y - (layer.height / 2))
+
+def _mask_origin(layer, mask_arr):
+    mh, mw = mask_arr.shape
+    return int(layer.mask_position.x - (mw / 2)), int(layer.mask_position.y - (mh / 2))
+
+def _read_layer_internal(layered_file, layer_path, target_w, target_h, fetch_mask, layer_id=0, factor=1):
     layer = get_layer(layered_file, layer_id, layer_path)
     if not layer: return None
 
+    dtype = np.dtype(DEPTH_DTYPES[bit_depth(layered_file)])
+
+    if factor > 1:
+        return _read_layer_proxy(layer, dtype, target_w, target_h, fetch_mask, factor)
+
     # --- MASK PATH ---
     if fetch_mask:
-        mask_bg = getattr(layer, 'mask_default_color', 255)
-        canvas = np.full((target_h, target_w), mask_bg, dtype=np.uint8)
-
         try:
             mask_arr = layer.mask
         except:
             mask_arr = None
 
         if mask_arr is not None and mask_arr.size > 0:
-            mh, mw = mask_arr.shape
-            center_x = layer.mask_position.x
-            center_y = layer.mask_position.y
-            mask_left = int(center_x - (mw / 2))
-            mask_top = int(center_y - (mh / 2))
+            dtype = mask_arr.dtype
 
+        # The default colour is stored as a byte at every depth.
+        mask_bg = getattr(layer, 'mask_default_color', 255) / 255.0 * _unit_scale(dtype)
+        canvas = np.full((target_h, target_w), mask_bg, dtype=dtype)
+
+        if mask_arr is not None and mask_arr.size > 0:
+            mask_left, mask_top = _mask_origin(layer, mask_arr)
             paste_to_canvas(canvas, mask_arr, target_w, target_h, mask_left, mask_top)
 
-        canvas = np.flipud(canvas)
-        ones = np.full_like(canvas, 255)
-        img_stack = np.stack([canvas, canvas, canvas, ones], axis=-1)
-        return (img_stack.astype(np.float32) / 255.0).flatten()
+        return np.ascontiguousarray(np.flipud(canvas)).ravel()
 
     # --- COLOR PATH ---
     else:
         planar_data = layer.get_image_data()
 
         if not planar_data:
-            return np.zeros(target_w * target_h * 4, dtype=np.float32)
+            return np.zeros(target_w * target_h * 4, dtype=dtype)
 
         first_key = next(iter(planar_data))
         dtype = planar_data[first_key].dtype
@@ -187,8 +361,7 @@ def _read_layer_internal(layered_file, layer_path, target_w, target_h, fetch_mas
 
         l_w = layer.width
         l_h = layer.height
-        layer_left = int(layer.center_x - (l_w / 2))
-        layer_top = int(layer.center_y - (l_h / 2))
+        layer_left, layer_top = _layer_origin(layer)
 
         if 0 in planar_data: paste_to_canvas(c_r, planar_data[0], target_w, target_h, layer_left, layer_top)
         if 1 in planar_data: paste_to_canvas(c_g, planar_data[1], target_w, target_h, layer_left, layer_top)
@@ -197,46 +370,101 @@ def _read_layer_internal(layered_file, layer_path, target_w, target_h, fetch_mas
         if -1 in planar_data:
             paste_to_canvas(c_a, planar_data[-1], target_w, target_h, layer_left, layer_top)
         else:
-            fill_val = 1.0
-            if np.issubdtype(dtype, np.integer):
-                fill_val = np.iinfo(dtype).max
-
-            opaque_block = np.full((l_h, l_w), fill_val, dtype=dtype)
+            opaque_block = np.full((l_h, l_w), _unit_scale(dtype), dtype=dtype)
             paste_to_canvas(c_a, opaque_block, target_w, target_h, layer_left, layer_top)
 
         img_stack = np.stack([c_r, c_g, c_b, c_a], axis=-1)
         img_stack = np.flipud(img_stack)
 
-        return (img_stack.astype(np.float32) / 255.0).flatten()
-
-
-def read_layer(psd_path, layer_path, target_w, target_h, fetch_mask=False, layer_id=0):
+        return np.ascontiguousarray(img_stack).ravel()
+
+
+# Layer reads hand back flat, bottom-up RGBA in the document's own precision
+# (uint8 for 8-bit files, uint16 / float32 for deeper ones); for 8-bit that is
+# a quarter of the size of Blender's float pixels. Masks come back as a single
+# grey plane, a quarter of that again, and are only spread to grey RGBA when
+# they go into an image. Callers convert one layer at a time with
+# to_blender_pixels right before foreach_set, so a batch read never holds
+# every layer as float at once.
+
+def to_blender_pixels(pixels, out=None, is_mask=False):
+    """Flat float32 for Image.pixels from a layer read. out is reused if it fits.
+
+    Float colour comes back as pixels itself, with no copy. Callers keeping a
+    scratch buffer must not hold on to that: it is a decoded layer (or a
+    read-only cache mmap), not something to write the next layer into.
+    """
+    size = pixels.size * 4 if is_mask else pixels.size
+    if pixels.dtype == np.float32 and not is_mask:
+        return pixels
+    if out is None or out is pixels or out.size != size or not out.flags.writeable:
+        out = np.empty(size, dtype=np.float32)
+
+    if not is_mask:
+        np.divide(pixels, np.float32(_unit_scale(pixels.dtype)), out=out)
+        return out
+
+    rgba = out.reshape(-1, 4)
+    np.divide(pixels, np.float32(_unit_scale(pixels.dtype)), out=rgba[:, 0])
+    rgba[:, 1] = rgba[:, 0]
+    rgba[:, 2] = rgba[:, 0]
+    rgba[:, 3] = 1.0
+    return out
+
+def from_blender_pixels(blender_pixels, depth=8):
+    """Flat pixels in the document's precision from Image.pixels floats.
+
+    Integer depths are rounded to the nearest step; 32-bit keeps the floats
+    as they are, including values outside 0..1. Overwrites blender_pixels
+    when it is a float32 array, so a foreach_get buffer can be reused for the
+    next image.
+    """
+    buf = np.asarray(blender_pixels, dtype=np.float32)
+    dtype = np.dtype(DEPTH_DTYPES.get(depth, np.uint8))
+    if dtype.kind == 'f':
+        return buf.copy()
+
+    scale = np.float32(_unit_scale(dtype))
+    np.multiply(buf, scale, out=buf)
+    np.clip(buf, 0.0, scale, out=buf)
+    np.rint(buf, out=buf)
+    return buf.astype(dtype)
+
+def read_layer(psd_path, layer_path, target_w, target_h, fetch_mask=False, layer_id=0, factor=1):
+    """One layer on a target_w x target_h canvas. factor > 1 reads a box
+    filtered proxy; the returned size is then the proxy's."""
     try:
         layered_file = psapi.LayeredFile.read(psd_path)
-        flat_data = _read_layer_internal(layered_file, layer_path, target_w, target_h, fetch_mask, layer_id)
+        flat_data = _read_layer_internal(layered_file, layer_path, target_w, target_h, fetch_mask, layer_id, factor)
         if flat_data is None: return None, 0, 0
-        return flat_data, target_w, target_h
+        return (flat_data, *proxy_size(target_w, target_h, max(1, factor)))
     except Exception as e:
         print(f"BPSD Read Error: {e}")
         return None, 0, 0
 
+def open_file(psd_path):
+    """The PSD as an open LayeredFile, or None on failure."""
+    try:
+        return psapi.LayeredFile.read(psd_path)
+    except Exception as e:
+        print(f"BPSD Engine Error (Open): {e}")
+        return None
+
+def read_request(layered_file, req):
+    """Pixels for one read_all_layers request from an open LayeredFile."""
+    return _read_layer_internal(layered_file, req['layer_path'], req['width'], req['height'],
+                                req['is_mask'], req.get('layer_id', 0), req.get('factor', 1))
+
 def read_all_layers(psd_path, requests):
     results = {}
     try:
         layered_file = psapi.LayeredFile.read(psd_path)
 
         for req in requests:
-            path = req['layer_path']
-            layer_index = req.get('layer_index')
-            w = req['width']
-            h = req['height']
-            mask = req['is_mask']
-            layer_id = req.get('layer_id', 0)
-
-            pixels = _read_layer_internal(layered_file, path, w, h, mask, layer_id)
+            pixels = read_request(layered_file, req)
 
             if pixels is not None:
-                results[(layer_index, mask)] = pixels
+                results[(req.get('layer_index'), req['is_mask'])] = pixels
 
         return results
     except Exception as e:
@@ -244,17 +472,353 @@ def read_all_layers(psd_path, requests):
         return {}
 
 
-# --- WRITE LOGIC ---
+# --- COMPOSITE ---
+
+def _to_unit_float(arr):
+    if np.issubdtype(arr.dtype, np.integer):
+        return arr.astype(np.float32) / np.iinfo(arr.dtype).max
+    return arr.astype(np.float32, copy=False)
 
-def _prepare_blender_pixels(blender_pixels, width, height):
-    # asarray so an already-float32 buffer from foreach_get isn't copied again
-    pixels = np.asarray(blender_pixels, dtype=np.float32).reshape((height, width, 4))
-    pixels = np.flipud(pixels)
-    return (pixels * 255).astype(np.uint8)
+class _LayeredFileSource:
+    """compositor pixel source backed by an open LayeredFile."""
 
-def _write_mask(layer, pixels, canvas_w, canvas_h):
+    def __init__(self, layered_file):
+        self.layered_file = layered_file
+        self._by_id = {}
+
+        def index(layers):
+            for layer in layers:
+                layer_id = getattr(layer, 'layer_id', 0)
+                if layer_id:
+                    self._by_id.setdefault(layer_id, layer)
+                if hasattr(layer, 'layers'):
+                    index(layer.layers)
+
+        index(layered_file.layers)
+
+    def _layer(self, node):
+        layer = self._by_id.get(node.get("layer_id", 0))
+        if layer is None:
+            layer = get_layer_by_index_path(self.layered_file, node.get("path", ""))
+        return layer
+
+    def color(self, node):
+        layer = self._layer(node)
+        if layer is None:
+            return None
+
+        planar_data = layer.get_image_data()
+        if not planar_data:
+            return None
+
+        rgba = np.zeros((layer.height, layer.width, 4), dtype=np.float32)
+        for i, ch in enumerate((0, 1, 2)):
+            if ch in planar_data:
+                rgba[..., i] = _to_unit_float(planar_data[ch])
+        if -1 in planar_data:
+            rgba[..., 3] = _to_unit_float(planar_data[-1])
+        else:
+            rgba[..., 3] = 1.0
+
+        left, top = _layer_origin(layer)
+        return rgba, left, top
+
+    def bounds(self, node):
+        layer = self._layer(node)
+        if layer is None:
+            return None
+        left, top = _layer_origin(layer)
+        return (left, top, left + layer.width, top + layer.height)
+
+    def mask(self, node):
+        layer = self._layer(node)
+        if layer is None:
+            return None
+
+        default = getattr(layer, 'mask_default_color', 255) / 255.0
+        try:
+            mask_arr = layer.mask
+        except:
+            mask_arr = None
+
+        if mask_arr is None or mask_arr.size == 0:
+            return None, 0, 0, default
+
+        left, top = _mask_origin(layer, mask_arr)
+        return _to_unit_float(mask_arr), left, top, default
+
+def render_composite(layered_file, workers=None):
+    """Flatten an open LayeredFile with the CPU compositor.
+
+    Tiles are spread over workers threads (default: one per core). Returns
+    float32 (h, w, 4) straight alpha, rows top-down like the PSD.
+    """
+    structure = _parse_structure(layered_file)
+    source = _LayeredFileSource(layered_file)
+    tiled = compositor.TiledCompositor(source, layered_file.width, layered_file.height, structure)
+    return tiled.render(workers=workers)
+
+# Merged image sample types by bit depth; Image Data is big-endian.
+_MERGED_DTYPES = {8: np.dtype(np.uint8), 16: np.dtype('>u2'), 32: np.dtype('>f4')}
+
+def _decode_image_data(mm, info, scale):
+    """Merged planes as (channels, rows, cols) in the file's sample type,
+    keeping every scale-th row and column. Only the kept rows are decoded."""
+    depth = info["depth"]
+    dtype = _MERGED_DTYPES.get(depth)
+    if dtype is None:
+        raise psd_scan.ScanError(f"unsupported depth {depth}")
+
+    channels, height, width = info["channels"], info["height"], info["width"]
+    row_size = width * dtype.itemsize
+    rows = np.arange(0, height, scale)
+    # Row index into the planar layout for each kept row of each channel.
+    plane_rows = (np.arange(channels)[:, None] * height + rows[None, :]).ravel()
+
+    pos = info["image_data_offset"]
+    compression, = struct.unpack_from(">H", mm, pos)
+    pos += 2
+
+    buf = np.frombuffer(mm, dtype=np.uint8)
+    try:
+        if compression == 0:
+            end = pos + channels * height * row_size
+            if end > buf.size:
+                raise psd_scan.ScanError("truncated image data")
+            planar = buf[pos:end].reshape(channels * height, row_size)[plane_rows]
+        elif compression == 1:
+            count_dtype = '>u2' if info["version"] == 1 else '>u4'
+            n_rows = channels * height
+            counts = np.frombuffer(mm, dtype=count_dtype, count=n_rows, offset=pos).astype(np.int64)
+            starts = pos + n_rows * np.dtype(count_dtype).itemsize + np.cumsum(counts) - counts
+            planar = packbits.decode_rows(buf, starts[plane_rows], counts[plane_rows], row_size, workers=None)
+        else:
+            raise psd_scan.ScanError(f"unsupported image data compression {compression}")
+    finally:
+        # The mmap can't close while a view of it is alive.
+        del buf
+
+    planar = planar.view(dtype).reshape(channels, rows.size, width)
+    return planar[:, :, ::scale]
+
+def read_composite(psd_path, scale=1):
+    """Decode the merged image of a PSD straight from its Image Data section.
+
+    Nothing but the header and section lengths is parsed; the (usually RLE)
+    channel rows are decoded from an mmap of the file. scale > 1 keeps every
+    scale-th pixel in each direction, and skipped rows are never decoded.
+
+    Returns (pixels, width, height) with pixels a flat float32 RGBA buffer
+    bottom-up, ready for Image.pixels, or (None, 0, 0) when the file can't be
+    read this way (odd colour modes, ZIP-compressed data, partial writes).
+    """
+    scale = max(1, int(scale))
+    try:
+        with open(psd_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            info = psd_scan.read_layout(mm)
+            planar = _decode_image_data(mm, info, scale)
+        finally:
+            try:
+                mm.close()
+            except BufferError:
+                # A traceback still holds a view; the mmap goes with it.
+                pass
+    except (OSError, ValueError, IndexError, struct.error, psd_scan.ScanError) as e:
+        print(f"BPSD Composite Read Error: {e}")
+        return None, 0, 0
+
+    color_mode, channels = info["color_mode"], info["channels"]
+    if color_mode == 3 and channels >= 3:
+        color, alpha_index = (0, 1, 2), 3
+    elif color_mode in (1, 8) and channels >= 1:
+        color, alpha_index = (0, 0, 0), 1
+    else:
+        print(f"BPSD: composite not readable directly (mode {color_mode}, {channels} channels)")
+        return None, 0, 0
+
+    height, width = planar.shape[1:]
+    rgba = np.empty((height, width, 4), dtype=np.float32)
+    for i, ch in enumerate(color):
+        rgba[..., i] = _to_unit_float(planar[ch].astype(planar.dtype.newbyteorder('=')))
+
+    if channels > alpha_index:
+        alpha = _to_unit_float(planar[alpha_index].astype(planar.dtype.newbyteorder('=')))
+        rgba[..., 3] = alpha
+        # Undo the white matte (see compositor.flatten_onto).
+        covered = alpha > 0.0
+        safe = np.where(covered, alpha, 1.0)[..., None]
+        rgba[..., :3] = np.where(covered[..., None], (rgba[..., :3] - (1.0 - alpha[..., None])) / safe, 0.0)
+        np.clip(rgba[..., :3], 0.0, None, out=rgba[..., :3])
+    else:
+        rgba[..., 3] = 1.0
+
+    return np.ascontiguousarray(rgba[::-1]).ravel(), width, height
+
+def write_merged_image(psd_path, rgba):
+    """Replace the merged (flattened) image of a PSD on disk with rgba.
+
+    Image Data is the last section of the file, so it is simply rewritten in
+    place, RLE-compressed at 8 and 16 bits like Photoshop writes it. Colour is
+    stored matted against white, also like Photoshop.
+    Only RGB documents with 3 or 4 merged channels are handled; anything else
+    keeps whatever photoshopapi wrote.
+    """
+    scan = psd_scan.scan_file(psd_path)
+    if scan is None:
+        return False
+
+    if scan["color_mode"] != 3 or scan["channels"] not in (3, 4):
+        print(f"BPSD: merged image not regenerated (mode {scan['color_mode']}, {scan['channels']} channels)")
+        return False
+
+    height, width = rgba.shape[:2]
+    if (width, height) != (scan["width"], scan["height"]):
+        print("BPSD: merged image size does not match the document")
+        return False
+
+    planes = [compositor.flatten_onto(rgba)[..., i] for i in range(3)]
+    if scan["channels"] == 4:
+        planes.append(rgba[..., 3])
+    planar = np.clip(np.stack(planes), 0.0, 1.0)
+
+    depth = scan["depth"]
+    if depth == 8:
+        data = np.rint(planar * 255.0).astype(np.uint8)
+    elif depth == 16:
+        data = np.rint(planar * 65535.0).astype('>u2')
+    elif depth == 32:
+        data = planar.astype('>f4')
+    else:
+        print(f"BPSD: merged image not regenerated ({depth}-bit)")
+        return False
+
+    # Float data barely compresses; 32-bit stays raw.
+    if depth == 32:
+        compression, chunks = 0, [data.tobytes()]
+    else:
+        rows = data.reshape(scan["channels"] * height, -1).view(np.uint8)
+        encoded, row_lengths = packbits.encode_rows(rows, workers=None)
+        count_dtype = '>u2' if scan["version"] == 1 else '>u4'
+        compression, chunks = 1, [row_lengths.astype(count_dtype).tobytes(), encoded.tobytes()]
+
+    try:
+        with open(psd_path, "r+b") as f:
+            f.seek(scan["image_data_offset"])
+            f.write(struct.pack(">H", compression))
+            for chunk in chunks:
+                f.write(chunk)
+            f.truncate()
+        return True
+    except OSError as e:
+        print(f"BPSD Merged Image Write Error: {e}")
+        return False
+
+def verify_packbits(psd_path):
+    """Check the NumPy PackBits codec against photoshopapi on a real file.
+
+    Every RLE-compressed colour and alpha channel in the layer section is
+    decoded with packbits and compared with what photoshopapi decodes for the
+    same layer, then re-encoded and decoded again. Returns (checked, failed)
+    channel counts, or None if the file can't be scanned or opened.
+    """
+    scan = psd_scan.scan_file(psd_path)
+    if scan is None:
+        return None
+    try:
+        layered_file = psapi.LayeredFile.read(psd_path)
+    except Exception as e:
+        print(f"BPSD PackBits Check Error: {e}")
+        return None
+
+    dtype = _MERGED_DTYPES.get(scan["depth"])
+    if dtype is None:
+        return 0, 0
+    count_dtype = '>u2' if scan["version"] == 1 else '>u4'
+    checked = failed = 0
+
+    with open(psd_path, "rb") as f:
+        raw = np.frombuffer(f.read(), dtype=np.uint8)
+
+    for record in scan["layers"]:
+        top, left, bottom, right = record["bounds"]
+        width, height = right - left, bottom - top
+        if width <= 0 or height <= 0 or not record["layer_id"]:
+            continue
+        layer = get_layer(layered_file, record["layer_id"])
+        if layer is None:
+            continue
+        try:
+            planar = layer.get_image_data()
+        except Exception:
+            continue
+
+        for ch_id, pos, length in record["channel_spans"]:
+            if ch_id not in planar or ch_id < -1 or length < 2:
+                continue
+            if np.shape(planar[ch_id]) != (height, width):
+                continue
+            compression, = struct.unpack_from(">H", raw, pos)
+            if compression != 1:
+                continue
+
+            counts = np.frombuffer(raw, dtype=count_dtype, count=height, offset=pos + 2).astype(np.int64)
+            starts = pos + 2 + height * np.dtype(count_dtype).itemsize + np.cumsum(counts) - counts
+            expected = np.ascontiguousarray(planar[ch_id], dtype=dtype).view(np.uint8).reshape(height, -1)
+
+            checked += 1
+            try:
+                decoded = packbits.decode_rows(raw, starts, counts, expected.shape[1], workers=None)
+                data, lengths = packbits.encode_rows(expected, workers=None)
+                again = packbits.decode_rows(data, np.cumsum(lengths) - lengths, lengths, expected.shape[1])
+                ok = np.array_equal(decoded, expected) and np.array_equal(again, expected)
+            except ValueError:
+                ok = False
+            if not ok:
+                failed += 1
+                print(f"BPSD PackBits mismatch: layer {record['layer_id']} channel {ch_id}")
+
+    return checked, failed
+
+# --- WRITE LOGIC ---
+
+def _write_file(layered_file, psd_path, regenerate_composite=False):
+    layered_file.write(psd_path)
+    if regenerate_composite:
+        try:
+            write_merged_image(psd_path, render_composite(layered_file))
+        except Exception as e:
+            print(f"BPSD Composite Error: {e}")
+
+def _prepare_blender_pixels(blender_pixels, width, height, dtype=None):
+    """Top-down (h, w, 4) pixels, converted to dtype if given.
+
+    Save buffers arrive in the document's precision already
+    (from_blender_pixels); a plain sequence is taken as 8-bit Blender floats.
+    """
+    if not isinstance(blender_pixels, np.ndarray):
+        blender_pixels = from_blender_pixels(np.array(blender_pixels, dtype=np.float32))
+    if dtype is not None:
+        blender_pixels = convert_depth(blender_pixels, dtype)
+    return np.ascontiguousarray(np.flipud(blender_pixels.reshape((height, width, 4))))
+
+def _prepare_mask_pixels(mask_pixels, width, height, dtype=None):
+    """Top-down (h, w) mask, converted to dtype if given.
+
+    Takes the single plane the save path sends; a full RGBA buffer (or a plain
+    sequence of Blender floats) is reduced to its red channel first.
+    """
+    if not isinstance(mask_pixels, np.ndarray):
+        mask_pixels = from_blender_pixels(np.array(mask_pixels, dtype=np.float32))
+    if mask_pixels.size == width * height * 4:
+        mask_pixels = mask_pixels[0::4]
+    if dtype is not None:
+        mask_pixels = convert_depth(mask_pixels, dtype)
+    return np.ascontiguousarray(np.flipud(mask_pixels.reshape((height, width))))
+
+def _write_mask(layer, mask_data, canvas_w, canvas_h):
     try:
-        mask_data = pixels[:, :, 0] # Red Channel as Mask
         layer.mask = mask_data
         layer.mask_position = psapi.geometry.Point2D(canvas_w / 2, canvas_h / 2)
         return True
@@ -365,16 +929,22 @@ def write_to_layered_file(layered_file, layer_path, blender_pixels, canvas_w, ca
         # layer.opacity = int(opacity * 255)
 
     if blender_pixels is not None:
-        pixels = _prepare_blender_pixels(blender_pixels, canvas_w, canvas_h)
+        dtype = DEPTH_DTYPES[bit_depth(layered_file)]
 
         if is_mask:
-            return _write_mask(layer, pixels, canvas_w, canvas_h)
+            return _write_mask(layer, _prepare_mask_pixels(blender_pixels, canvas_w, canvas_h, dtype), canvas_w, canvas_h)
         else:
+            pixels = _prepare_blender_pixels(blender_pixels, canvas_w, canvas_h, dtype)
             return _write_color_channels(layer, pixels, canvas_w, canvas_h)
             
     return True
 
-def write_all_layers(psd_path, updates, canvas_w, canvas_h):
+def write_all_layers(psd_path, updates, canvas_w, canvas_h, regenerate_composite=False):
+    """Apply updates and rewrite the PSD.
+
+    photoshopapi does not produce a merged image, so with regenerate_composite
+    the CPU compositor renders one and patches it into the written file.
+    """
     try:
         layered_file = psapi.LayeredFile.read(psd_path)
         count = 0
@@ -390,7 +960,7 @@ def write_all_layers(psd_path, updates, canvas_w, canvas_h):
                 count += 1
 
         if count > 0:
-            layered_file.write(psd_path)
+            _write_file(layered_file, psd_path, regenerate_composite)
             return True
         return False
 
@@ -409,17 +979,15 @@ def write_layer(psd_path, layer_path, blender_pixels, width, height, is_mask=Fal
     }
     return write_all_layers(psd_path, [update], width, height)
 
-def create_psd(path, width, height):
+def create_psd(path, width, height, depth=8):
     try:
         color_mode = psapi.enum.ColorMode.rgb
-        document = psapi.LayeredFile_8bit(color_mode, width, height)
+        document = getattr(psapi, f"LayeredFile_{depth}bit")(color_mode, width, height)
 
-        img_data = np.zeros((3, height, width), np.uint8)
-        img_data[0] = 255
-        img_data[1] = 255
-        img_data[2] = 255
+        dtype = DEPTH_DTYPES[depth]
+        img_data = np.full((3, height, width), _unit_scale(dtype), dtype)
 
-        img_layer = psapi.ImageLayer_8bit(img_data, "Layer 1", width=width, height=height)
+        img_layer = getattr(psapi, f"ImageLayer_{depth}bit")(img_data, "Layer 1", width=width, height=height)
         document.add_layer(img_layer)
 
         document.write(path)
@@ -428,7 +996,41 @@ def create_psd(path, width, height):
         print(f"BPSD Create PSD Error: {e}")
         return False
 
-def rename_layer(psd_path, layer_id, new_name):
+def create_benchmark_psd(path, width, height, layer_count, seed=0):
+    """Flat stack of coloured rectangles cycling through the blend modes.
+
+    Every fourth layer is clipped to the one below so clipping units get
+    exercised too. Used by the node benchmark.
+    """
+    try:
+        rng = np.random.default_rng(seed)
+        BM = psapi.enum.BlendMode
+        modes = [BM.normal, BM.multiply, BM.screen, BM.overlay, BM.softlight,
+                 BM.lineardodge, BM.difference, BM.color]
+
+        document = psapi.LayeredFile_8bit(psapi.enum.ColorMode.rgb, width, height)
+        for i in range(layer_count):
+            planes = np.zeros((4, height, width), np.uint8)
+            x0, y0 = rng.integers(0, max(1, width // 2)), rng.integers(0, max(1, height // 2))
+            x1, y1 = x0 + rng.integers(1, max(2, width // 2)), y0 + rng.integers(1, max(2, height // 2))
+            planes[:3, y0:y1, x0:x1] = rng.integers(0, 256, size=(3, 1, 1), dtype=np.uint8)
+            planes[3, y0:y1, x0:x1] = 255
+            img_data = {0: planes[0], 1: planes[1], 2: planes[2], -1: planes[3]}
+
+            layer = psapi.ImageLayer_8bit(img_data, f"Layer {i + 1}", width=width, height=height)
+            layer.blend_mode = modes[i % len(modes)]
+            layer.opacity = float(rng.uniform(0.5, 1.0))
+            if i % 4 == 3:
+                layer.clipping_mask = True
+            document.add_layer(layer)
+
+        document.write(path)
+        return True
+    except Exception as e:
+        print(f"BPSD Create Benchmark PSD Error: {e}")
+        return False
+
+def rename_layer(psd_path, layer_id, new_name, regenerate_composite=False):
     try:
         layered_file = psapi.LayeredFile.read(psd_path)
 
@@ -445,7 +1047,7 @@ def rename_layer(psd_path, layer_id, new_name):
 
         for layer in layered_file.layers:
             if find_and_rename(layer, layer_id, new_name):
-                layered_file.write(psd_path)
+                _write_file(layered_file, psd_path, regenerate_composite)
                 return True
 
         return False
@@ -453,7 +1055,7 @@ def rename_layer(psd_path, layer_id, new_name):
         print(f"BPSD Rename Layer Error: {e}")
         return False
 
-def set_layer_visibility(psd_path, layer_id, is_visible):
+def set_layer_visibility(psd_path, layer_id, is_visible, regenerate_composite=False):
     try:
         layered_file = psapi.LayeredFile.read(psd_path)
 
@@ -470,7 +1072,7 @@ def set_layer_visibility(psd_path, layer_id, is_visible):
 
         for layer in layered_file.layers:
             if find_and_set_visibility(layer, layer_id, is_visible):
-                layered_file.write(psd_path)
+                _write_file(layered_file, psd_path, regenerate_composite)
                 return True
 
         return False
@@ -478,7 +1080,7 @@ def set_layer_visibility(psd_path, layer_id, is_visible):
         print(f"BPSD Set Visibility Error: {e}")
         return False
 
-def set_clipping_mask(psd_path, layer_id, is_clipping):
+def set_clipping_mask(psd_path, layer_id, is_clipping, regenerate_composite=False):
     try:
         layered_file = psapi.LayeredFile.read(psd_path)
 
@@ -495,7 +1097,7 @@ def set_clipping_mask(psd_path, layer_id, is_clipping):
 
         for layer in layered_file.layers:
             if find_and_set_clipping(layer, layer_id, is_clipping):
-                layered_file.write(psd_path)
+                _write_file(layered_file, psd_path, regenerate_composite)
                 return True
 
         return False
@@ -0,0 +1,360 @@
+"""Header-level PSD reader.
+
+photoshopapi always decodes every channel of every layer, which is the right
+thing when pixels are actually needed but far too much work just to find out
+*what* changed on disk. This module walks the raw section layout instead: the
+layer records and the still-compressed channel data are fingerprinted straight
+out of an mmap, so answering "which layers did that Photoshop save touch?"
+costs one sequential read of the file and no decoding at all.
+
+Three kinds of fingerprint come out of a scan:
+
+- structure: layer ids, group open/close records and clipping flags in stack
+  order, plus the canvas. If this differs the layer list itself has to change.
+- records: name, blend mode, opacity, visibility and fill per layer. Cheap to
+  apply, never needs pixels.
+- content: bounds, mask data and the raw channel bytes per layer. Only layers
+  whose content fingerprint moved need their textures reloaded.
+
+The raw bytes are hashed as written, so the same pixels encoded by a different
+writer count as a change. That only ever costs a spurious reload, never a
+missed one.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+SIGNATURE = b"8BPS"
+
+# Tagged blocks whose length field is 8 bytes wide in PSB files.
+_PSB_LONG_KEYS = {
+    b"LMsk", b"Lr16", b"Lr32", b"Layr", b"Mt16", b"Mt32", b"Mtrn",
+    b"Alph", b"FMsk", b"lnk2", b"FEid", b"FXid", b"PxSD",
+}
+
+# Record-level blocks that describe how a layer looks rather than what it
+# contains. Anything else (metadata, effects caches, timestamps) is ignored so
+# a save that merely touches bookkeeping does not read as a property change.
+_RECORD_KEYS = (b"luni", b"lsct", b"lsdk", b"iOpa")
+
+SECTION_OTHER = 0
+SECTION_OPEN = 1
+SECTION_CLOSED = 2
+SECTION_DIVIDER = 3
+
+
+class ScanError(Exception):
+    pass
+
+
+def _crc(data, value=0):
+    return zlib.crc32(data, value) & 0xFFFFFFFF
+
+
+def _read_header(mm):
+    if len(mm) < 26 or mm[:4] != SIGNATURE:
+        raise ScanError("not a PSD file")
+
+    version, = struct.unpack_from(">H", mm, 4)
+    if version not in (1, 2):
+        raise ScanError(f"unsupported PSD version {version}")
+
+    channels, height, width, depth, color_mode = struct.unpack_from(">HIIHH", mm, 12)
+    return {
+        "version": version,
+        "channels": channels,
+        "width": width,
+        "height": height,
+        "depth": depth,
+        "color_mode": color_mode,
+    }
+
+
+def _read_length(mm, pos, wide):
+    if wide:
+        return struct.unpack_from(">Q", mm, pos)[0], pos + 8
+    return struct.unpack_from(">I", mm, pos)[0], pos + 4
+
+
+def _iter_tagged_blocks(mm, pos, end, version, pad):
+    """Yield (key, data_start, data_end) for each additional-info block."""
+    while pos + 12 <= end:
+        sig = bytes(mm[pos:pos + 4])
+        if sig not in (b"8BIM", b"8B64"):
+            return
+        key = bytes(mm[pos + 4:pos + 8])
+        length, pos = _read_length(mm, pos + 8, version == 2 and key in _PSB_LONG_KEYS)
+
+        data_start = pos
+        data_end = min(pos + length, end)
+        yield key, data_start, data_end
+
+        pos = data_start + length
+        if pad > 1:
+            pos += (-length) % pad
+
+
+def _parse_record(mm, pos, version):
+    top, left, bottom, right, n_channels = struct.unpack_from(">iiiiH", mm, pos)
+    pos += 18
+
+    channels = []
+    for _ in range(n_channels):
+        ch_id, = struct.unpack_from(">h", mm, pos)
+        length, pos = _read_length(mm, pos + 2, version == 2)
+        channels.append((ch_id, length))
+
+    if bytes(mm[pos:pos + 4]) != b"8BIM":
+        raise ScanError("bad blend mode signature in layer record")
+
+    blend_key = bytes(mm[pos + 4:pos + 8])
+    opacity, clipping, flags = struct.unpack_from(">BBB", mm, pos + 8)
+    extra_len, = struct.unpack_from(">I", mm, pos + 12)
+    pos += 16
+    extra_end = pos + extra_len
+
+    mask_len, = struct.unpack_from(">I", mm, pos)
+    mask_data = bytes(mm[pos + 4:pos + 4 + mask_len])
+    pos += 4 + mask_len
+
+    ranges_len, = struct.unpack_from(">I", mm, pos)
+    pos += 4 + ranges_len
+
+    name_len = mm[pos]
+    name_bytes = bytes(mm[pos + 1:pos + 1 + name_len])
+    name = name_bytes.decode("latin-1")
+    pos += ((name_len + 1 + 3) // 4) * 4
+
+    layer_id = 0
+    section = SECTION_OTHER
+    section_blend = b""
+    # The Pascal name counts too: writers without luni rename through it alone.
+    record_crc = _crc(blend_key + bytes((opacity, clipping, flags)) + name_bytes)
+
+    for key, d0, d1 in _iter_tagged_blocks(mm, pos, extra_end, version, pad=1):
+        if key == b"lyid" and d1 - d0 >= 4:
+            layer_id, = struct.unpack_from(">I", mm, d0)
+        elif key == b"luni" and d1 - d0 >= 4:
+            count, = struct.unpack_from(">I", mm, d0)
+            raw = bytes(mm[d0 + 4:min(d0 + 4 + count * 2, d1)])
+            name = raw.decode("utf-16-be", errors="replace").rstrip("\x00")
+        elif key in (b"lsct", b"lsdk") and d1 - d0 >= 4:
+            section, = struct.unpack_from(">I", mm, d0)
+            if d1 - d0 >= 12:
+                section_blend = bytes(mm[d0 + 8:d0 + 12])
+
+        if key in _RECORD_KEYS:
+            record_crc = _crc(key, record_crc)
+            record_crc = _crc(memoryview(mm)[d0:d1], record_crc)
+
+    return {
+        "layer_id": layer_id,
+        "name": name,
+        "bounds": (top, left, bottom, right),
+        "blend_mode": (section_blend or blend_key).decode("latin-1"),
+        "opacity": opacity / 255.0,
+        "is_clipping_mask": clipping != 0,
+        "is_visible": not (flags & 0x02),
+        "section": section,
+        "channels": channels,
+        "mask_data": mask_data,
+        "record_hash": record_crc,
+    }, extra_end
+
+
+def _parse_layer_info(mm, pos, end, version):
+    """Parse a layer-info block (record list followed by channel data)."""
+    if pos + 2 > end:
+        return []
+
+    count, = struct.unpack_from(">h", mm, pos)
+    count = abs(count)
+    pos += 2
+
+    records = []
+    for _ in range(count):
+        record, pos = _parse_record(mm, pos, version)
+        records.append(record)
+
+    # Channel image data follows the records in the same order. Each channel's
+    # length already includes its 2-byte compression marker.
+    for record in records:
+        top, left, bottom, right = record["bounds"]
+        content = _crc(struct.pack(">iiii", top, left, bottom, right))
+        content = _crc(record["mask_data"], content)
+
+        spans = []
+        for ch_id, length in record["channels"]:
+            if pos + length > end:
+                raise ScanError("channel data runs past the end of the section")
+            content = _crc(struct.pack(">hQ", ch_id, length), content)
+            content = _crc(memoryview(mm)[pos:pos + length], content)
+            spans.append((ch_id, pos, length))
+            pos += length
+
+        record["content_hash"] = content
+        record["channel_spans"] = spans
+
+    return records
+
+
+def read_layout(mm):
+    """Header fields plus where the layer section and Image Data start.
+
+    Only section lengths are followed, nothing inside them is parsed.
+    """
+    info = _read_header(mm)
+    version = info["version"]
+
+    pos = 26
+    color_len, = struct.unpack_from(">I", mm, pos)
+    pos += 4 + color_len
+
+    resources_len, = struct.unpack_from(">I", mm, pos)
+    pos += 4 + resources_len
+
+    section_len, pos = _read_length(mm, pos, version == 2)
+    info["layer_section_offset"] = pos
+    info["image_data_offset"] = pos + section_len
+    if info["image_data_offset"] + 2 > len(mm):
+        raise ScanError("file ends before the image data section")
+    return info
+
+
+def _scan(mm):
+    info = read_layout(mm)
+    version = info["version"]
+    pos = info.pop("layer_section_offset")
+    section_end = info["image_data_offset"]
+    section_len = section_end - pos
+
+    layers = []
+    if section_len:
+        info_len, info_pos = _read_length(mm, pos, version == 2)
+        info_end = info_pos + info_len
+        if info_len:
+            layers = _parse_layer_info(mm, info_pos, info_end, version)
+
+        # Global layer mask info, then additional info. 16 and 32-bit files
+        # keep their real layer records in an Lr16 / Lr32 block down here.
+        pos = info_end
+        if pos + 4 <= section_end:
+            global_mask_len, = struct.unpack_from(">I", mm, pos)
+            pos += 4 + global_mask_len
+
+        if not layers:
+            for key, d0, d1 in _iter_tagged_blocks(mm, pos, section_end, version, pad=4):
+                if key in (b"Lr16", b"Lr32", b"Layr"):
+                    layers = _parse_layer_info(mm, d0, d1, version)
+                    break
+
+    info["layers"] = layers
+    return info
+
+
+def scan_file(path):
+    """Scan a PSD without decoding any pixels.
+
+    Returns the header fields, the offset of the merged Image Data section and
+    a bottom-to-top list of layer records, or None if the file cannot be read
+    (a partial write in progress looks exactly like that).
+    """
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return _scan(mm)
+    except (OSError, ValueError, struct.error, ScanError) as e:
+        print(f"BPSD Scan Error: {e}")
+        return None
+
+
+def fingerprint(scan):
+    """Reduce a scan to what change detection compares between saves.
+
+    Layers without an id (very old files) are keyed by their stack position,
+    which makes any reorder read as a structure change - the safe answer.
+    """
+    structure = [scan["width"], scan["height"], scan["depth"]]
+    records = {}
+    content = {}
+
+    for i, layer in enumerate(scan["layers"]):
+        key = layer["layer_id"] or -(i + 1)
+        structure.append((key, layer["section"], layer["is_clipping_mask"]))
+        records[key] = layer["record_hash"]
+        content[key] = layer["content_hash"]
+
+    return {
+        "structure": tuple(structure),
+        "records": records,
+        "content": content,
+    }
+
+
+def scan_fingerprint(path):
+    scan = scan_file(path)
+    if scan is None:
+        return None
+    return fingerprint(scan)
+
+
+# Last fingerprint per path, with the stat it was taken under.
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def cached_fingerprint(path):
+    """scan_fingerprint, rescanning only when the file's mtime, size or inode
+    moved since the last call.
+
+    For the cache and prefetch paths that ask on every layer read; change
+    detection itself keeps calling scan_fingerprint.
+    """
+    key = _stat_key(path)
+    if key is None:
+        return None
+    with _memo_lock:
+        memo = _memo.get(path)
+    if memo is not None and memo[0] == key:
+        return memo[1]
+
+    fp = scan_fingerprint(path)
+    if fp is not None:
+        # Stat taken before the scan: a save during it leaves a stale key
+        # that the next call sees moved, never a stale fingerprint.
+        with _memo_lock:
+            _memo[path] = (key, fp)
+    return fp
+
+
+def diff(old, new):
+    """Compare two fingerprints.
+
+    Returns (structure_changed, records_changed, changed_content_ids). When the
+    structure differs the id set is still filled in as far as it can be, so a
+    caller applying the structure change knows which surviving layers also
+    need their pixels refreshed.
+    """
+    if old is None:
+        return True, True, set(new["content"].keys())
+
+    structure_changed = old["structure"] != new["structure"]
+    records_changed = old["records"] != new["records"]
+
+    changed = set()
+    for key, value in new["content"].items():
+        if old["content"].get(key) != value:
+            changed.add(key)
+
+    return structure_changed, records_changed, changed
@@ -3,10 +3,18 @@ import bpy
 import os
 import numpy as np
 import photoshopapi as psapi
+from . import layer_cache
+from . import packbits
 from . import psd_engine
+from . import psd_scan
 from . import ps_bridge
+from . import preview_bake
+from . import prefetch
+from . import atlas
+from . import node_ops
 import subprocess
 import time
+import zlib
 
 class BPSD_RuntimeState:
     _instance = None
@@ -15,54 +23,234 @@ class BPSD_RuntimeState:
         if cls._instance is None:
             cls._instance = super(BPSD_RuntimeState, cls).__new__(cls)
             cls._instance.dirty_cache = {}
+            cls._instance.fingerprints = {}
+            cls._instance.image_index = {}
+            cls._instance.images_by_psd = {}
+            cls._instance.image_index_count = -1
+            cls._instance.layer_maps = {}
+            cls._instance.touched_images = set()
+            cls._instance.baked_previews = {}
+            cls._instance.atlases = {}
+            cls._instance.composite_previews = {}
+            cls._instance.node_indexes = {}
+            cls._instance.last_dirty_sweep = 0.0
         return cls._instance
 
     def clear(self):
         self.dirty_cache.clear()
+        self.fingerprints.clear()
+        self.layer_maps.clear()
+        self.touched_images.clear()
+        self.baked_previews.clear()
+        self.atlases.clear()
+        self.composite_previews.clear()
+        self.node_indexes.clear()
+        self.last_dirty_sweep = 0.0
+        self.invalidate_image_index()
+
+    def invalidate_image_index(self):
+        self.image_index.clear()
+        self.images_by_psd.clear()
+        self.image_index_count = -1
 
     def get_dirty(self, image_name):
         return self.dirty_cache.get(image_name, False)
 
+    # Only dirty images are kept, so the cache doubles as the set the watcher
+    # has to keep an eye on for the dirty -> clean (Alt+S) transition.
     def set_dirty(self, image_name, is_dirty):
-        self.dirty_cache[image_name] = is_dirty
+        if is_dirty:
+            self.dirty_cache[image_name] = True
+        else:
+            self.dirty_cache.pop(image_name, None)
+
+    def touch_image(self, image_name):
+        self.touched_images.add(image_name)
+
+    # Last psd_scan fingerprint seen per PSD, i.e. the disk state Blender's
+    # layer list and textures currently reflect.
+    def get_fingerprint(self, psd_path):
+        return self.fingerprints.get(psd_path)
+
+    def set_fingerprint(self, psd_path, fingerprint):
+        if fingerprint is None:
+            self.fingerprints.pop(psd_path, None)
+        else:
+            self.fingerprints[psd_path] = fingerprint
 
 runtime_state = BPSD_RuntimeState()
 
 def init_dirty_cache():
     runtime_state.clear()
 
+def remember_disk_state(psd_path):
+    """Record the PSD's current fingerprint as the one Blender is in sync with."""
+    if psd_path and os.path.exists(psd_path):
+        runtime_state.set_fingerprint(psd_path, psd_scan.scan_fingerprint(psd_path))
+
+def _build_layer_maps(props):
+    by_id = {}
+    by_path = {}
+    for i, item in enumerate(props.layer_list):
+        if item.layer_id > 0:
+            by_id.setdefault(item.layer_id, i)
+        by_path.setdefault(item.path, i)
+    return by_id, by_path
+
+def get_layer_maps(props):
+    """(layer_id -> index, path -> index) for props.layer_list.
+
+    Cached per scene and rebuilt only when connect_psd changes the structure
+    signature (which already encodes every layer id in stack order).
+    """
+    owner = props.as_pointer()
+    key = (props.structure_signature, len(props.layer_list))
+
+    cached = runtime_state.layer_maps.get(owner)
+    if cached is None or cached[0] != key:
+        cached = (key,) + _build_layer_maps(props)
+        runtime_state.layer_maps[owner] = cached
+    return cached[1], cached[2]
+
+def find_layer_item(props, layer_id=0, layer_path=None):
+    """Return (index, item) for a layer by id, falling back to its path."""
+    for attempt in range(2):
+        by_id, by_path = get_layer_maps(props)
+
+        if layer_id and layer_id > 0:
+            i = by_id.get(layer_id)
+        elif layer_path:
+            i = by_path.get(layer_path)
+        else:
+            return -1, None
+
+        if i is None:
+            return -1, None
+
+        if i < len(props.layer_list):
+            item = props.layer_list[i]
+            if (item.layer_id == layer_id) if layer_id and layer_id > 0 else (item.path == layer_path):
+                return i, item
+
+        # The list changed without a signature change; rebuild and retry.
+        runtime_state.layer_maps.pop(props.as_pointer(), None)
+
+    return -1, None
+
+# --- Dirty tracking ---
+# Painting is picked up from events rather than by sweeping bpy.data.images:
+# the depsgraph handler records images it sees updated, and every tick the
+# watcher looks at whatever is currently being painted on (canvas, image
+# editors, the active paint slot). Images already known to be dirty are
+# watched until they come clean so Alt+S can trigger an auto-save. A full pass
+# over the managed images only runs every DIRTY_SWEEP_INTERVAL seconds to
+# catch anything the events missed (scripts writing pixels, etc.).
+
+DIRTY_WATCH_INTERVAL = 1.0
+DIRTY_SWEEP_INTERVAL = 10.0
+
+def note_depsgraph_images(depsgraph):
+    """depsgraph_update_post hook: remember BPSD images that were updated.
+
+    Only records names; the watcher does the actual work outside the
+    depsgraph callback.
+    """
+    if not depsgraph.id_type_updated('IMAGE'):
+        return
+
+    for update in depsgraph.updates:
+        id_data = getattr(update.id, "original", update.id)
+        if isinstance(id_data, bpy.types.Image) and id_data.get("bpsd_managed"):
+            runtime_state.touch_image(id_data.name)
+
+def _paint_target_images(context):
+    """Images the user can be painting on right now."""
+    images = set()
+
+    ts = context.tool_settings.image_paint if context.tool_settings else None
+    if ts and ts.canvas:
+        images.add(ts.canvas)
+
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'IMAGE_EDITOR':
+                image = area.spaces.active.image
+                if image:
+                    images.add(image)
+
+    obj = context.active_object
+    mat = obj.active_material if obj else None
+    if mat and mat.use_nodes:
+        slots = mat.texture_paint_images
+        if 0 <= mat.paint_active_slot < len(slots):
+            images.add(slots[mat.paint_active_slot])
+
+        node = mat.node_tree.nodes.active
+        if node and node.type == 'GROUP' and node.node_tree:
+            node = node.node_tree.nodes.active
+        if node and node.type == 'TEX_IMAGE' and node.image:
+            images.add(node.image)
+
+    return [img for img in images if img.get("bpsd_managed")]
+
+def _dirty_candidates(context):
+    candidates = {}
+
+    def add(img):
+        if img is not None:
+            candidates[img.name] = img
+
+    touched = set(runtime_state.touched_images)
+    runtime_state.touched_images.clear()
+    for name in touched:
+        add(bpy.data.images.get(name))
+
+    for name in list(runtime_state.dirty_cache):
+        img = bpy.data.images.get(name)
+        if img is None:
+            runtime_state.set_dirty(name, False)
+        add(img)
+
+    try:
+        for img in _paint_target_images(context):
+            add(img)
+    except AttributeError:
+        pass
+
+    now = time.monotonic()
+    if now - runtime_state.last_dirty_sweep >= DIRTY_SWEEP_INTERVAL:
+        runtime_state.last_dirty_sweep = now
+        _ensure_image_index()
+        for psd_path in list(runtime_state.images_by_psd):
+            for img in managed_images(psd_path):
+                add(img)
+
+    return candidates.values(), touched
+
 def image_dirty_watcher():
     context = bpy.context
     if not hasattr(context, "scene") or not context.scene:
-        return 1
+        return DIRTY_WATCH_INTERVAL
 
     props = context.scene.bpsd_props
 
     images_to_save = []
-    for img in bpy.data.images:
-        if not img.get("bpsd_managed"):
-            continue
-
+    painted_ids = set()
+    candidates, touched = _dirty_candidates(context)
+    for img in candidates:
         # Latch dirty state to layer item
-        if img.is_dirty:
-             l_id = img.get("psd_layer_id", 0)
-             l_path = img.get("psd_layer_path")
-             
-             if l_id > 0:
-                 for item in props.layer_list:
-                     if item.layer_id == l_id:
-                         item.is_bpsd_dirty = True
-                         break
-             elif l_path:
-                 for item in props.layer_list:
-                     if item.path == l_path:
-                         item.is_bpsd_dirty = True
-                         break
-
         current_dirty = img.is_dirty
+        if current_dirty:
+             _, item = find_layer_item(props, img.get("psd_layer_id", 0), img.get("psd_layer_path"))
+             if item and not item.is_bpsd_dirty:
+                 item.is_bpsd_dirty = True
+
         was_dirty = runtime_state.get_dirty(img.name)
         runtime_state.set_dirty(img.name, current_dirty)
 
+        if img.name in touched or (current_dirty and not was_dirty):
+            painted_ids.add(img.get("psd_layer_id", 0))
+
         if was_dirty and not current_dirty:
             if props.auto_save_on_image_save:
                 images_to_save.append(img.name)
@@ -77,7 +265,11 @@ def image_dirty_watcher():
             return None
         bpy.app.timers.register(trigger_saves, first_interval=0.01)
 
-    return 1
+    if painted_ids:
+        preview_bake.request(context.scene, painted_ids)
+        atlas.request(context.scene, painted_ids)
+
+    return DIRTY_WATCH_INTERVAL
 
 def tag_image(image, psd_path, layer_path, layer_index, is_mask=False, layer_id=0):
     image["psd_path"] = psd_path
@@ -86,6 +278,296 @@ def tag_image(image, psd_path, layer_path, layer_index, is_mask=False, layer_id=
     image["psd_is_mask"] = is_mask
     image["psd_layer_id"] = layer_id
     image["bpsd_managed"] = True
+    index_image(image)
+
+# Proxy images hold a layer box-filtered down by an integer factor. They are
+# previews only: saving one would write a blurry, wrongly sized layer, so the
+# save path skips them until BPSD_OT_load_full_res swaps in the real data.
+def image_proxy_factor(img):
+    return int(img.get("bpsd_proxy", 1)) if img else 1
+
+def set_proxy_factor(img, factor):
+    if factor > 1:
+        img["bpsd_proxy"] = factor
+    elif "bpsd_proxy" in img:
+        del img["bpsd_proxy"]
+
+# Placeholder images stand in for layers that haven't been read yet in lazy
+# mode (see prefetch.py). They are real, tagged layer images so the node
+# network and the image index bind to them as usual, just 1x1 and blank;
+# filling one in place swaps the pixels under every node that uses it. The
+# reload, save, restore and compositing paths skip them.
+def is_placeholder(img):
+    return bool(img.get("bpsd_placeholder", False)) if img else False
+
+def new_placeholder_image(props, name):
+    img = new_layer_image(props, name, 1, 1)
+    img.generated_color = (0.0, 0.0, 0.0, 0.0)
+    img["bpsd_placeholder"] = True
+    return img
+
+def fill_layer_image(img, pixels, width, height, is_mask, factor=1, float_buf=None):
+    """Write decoded layer pixels into img at width x height, replacing a
+    placeholder if it is one. is_mask is passed in rather than read off img,
+    which may not be tagged yet. Returns the float buffer for reuse."""
+    if tuple(img.size) != (width, height):
+        img.scale(width, height)
+    if len(pixels) > 0:
+        converted = psd_engine.to_blender_pixels(pixels, float_buf, is_mask)
+        img.pixels.foreach_set(converted)
+        img["bpsd_pixels_tag"] = pixels_tag(pixels)
+        if converted is not pixels:
+            float_buf = converted
+    img.pop("bpsd_placeholder", None)
+    set_proxy_factor(img, factor)
+    return float_buf
+
+# --- Image index ---
+# (psd_path, layer_id, is_mask) and (psd_path, "index", layer_index, is_mask)
+# -> image name, so per-layer lookups from panel draws and node builds don't
+# walk bpy.data.images reading ID properties off every image in the file.
+#
+# Kept current by tag_image and the operators that rename or remove layer
+# images. Anything else that adds or removes images changes the image count,
+# which triggers a rebuild on the next lookup; load_post and undo drop it
+# outright. A hit is always checked against the image's own tags, and a
+# mismatch (renamed or retagged behind our back) rebuilds once and retries.
+
+def _image_index_keys(image):
+    psd_path = image.get("psd_path")
+    is_mask = bool(image.get("psd_is_mask", False))
+    keys = [(psd_path, image.get("psd_layer_id", 0), is_mask)]
+
+    layer_index = image.get("psd_layer_index")
+    if layer_index is not None:
+        keys.append((psd_path, "index", layer_index, is_mask))
+    return keys
+
+def index_image(image):
+    if image.get("bpsd_is_temp") or not image.get("psd_path"):
+        return
+
+    # Stale entries pointing at this name (e.g. after a remap) are harmless:
+    # lookups validate against the image's tags.
+    for key in _image_index_keys(image):
+        runtime_state.image_index[key] = image.name
+    runtime_state.images_by_psd.setdefault(image.get("psd_path"), set()).add(image.name)
+
+def rebuild_image_index():
+    runtime_state.invalidate_image_index()
+
+    for img in bpy.data.images:
+        if img.get("bpsd_is_temp"): continue
+        psd_path = img.get("psd_path")
+        if not psd_path: continue
+
+        # First image wins, matching the order the old linear scan used.
+        for key in _image_index_keys(img):
+            runtime_state.image_index.setdefault(key, img.name)
+        runtime_state.images_by_psd.setdefault(psd_path, set()).add(img.name)
+
+    runtime_state.image_index_count = len(bpy.data.images)
+
+def _ensure_image_index():
+    if runtime_state.image_index_count != len(bpy.data.images):
+        rebuild_image_index()
+
+def _lookup_indexed(key):
+    name = runtime_state.image_index.get(key)
+    if name is None:
+        return None, True
+
+    img = bpy.data.images.get(name)
+    if img is None or img.get("bpsd_is_temp"):
+        return None, False
+    if key not in _image_index_keys(img):
+        return None, False
+    return img, True
+
+def managed_images(psd_path):
+    """Layer images (not channel-edit temps) belonging to psd_path."""
+    _ensure_image_index()
+
+    images = []
+    stale = False
+    for name in runtime_state.images_by_psd.get(psd_path, ()):
+        img = bpy.data.images.get(name)
+        if img is None or img.get("psd_path") != psd_path or img.get("bpsd_is_temp"):
+            stale = True
+            continue
+        images.append(img)
+
+    if stale:
+        rebuild_image_index()
+        return [bpy.data.images[n] for n in runtime_state.images_by_psd.get(psd_path, ())]
+    return images
+
+def get_addon_prefs():
+    addon = bpy.context.preferences.addons.get(__package__)
+    return addon.preferences if addon else None
+
+def layer_cache_root(prefs):
+    if prefs.layer_cache_dir:
+        return bpy.path.abspath(prefs.layer_cache_dir)
+    return bpy.utils.user_resource('DATAFILES', path="bpsd_layer_cache")
+
+def get_layer_cache():
+    """The decoded-layer cache as configured in the preferences, or None."""
+    prefs = get_addon_prefs()
+    if prefs is None or not prefs.use_layer_cache:
+        return None
+    return layer_cache.LayerCache(layer_cache_root(prefs), prefs.layer_cache_size * 1024 * 1024,
+                                  prefs.layer_cache_compress)
+
+def read_layers(psd_path, requests):
+    """psd_engine.read_all_layers through the decoded-layer cache, if enabled."""
+    cache = get_layer_cache()
+    if cache is None:
+        return psd_engine.read_all_layers(psd_path, requests)
+    return cache.read_layers(psd_path, requests)
+
+def use_float_storage(props):
+    """Whether new layer images get a float buffer (see the layer_storage pref)."""
+    prefs = get_addon_prefs()
+    storage = prefs.layer_storage if prefs else 'AUTO'
+    if storage == 'AUTO':
+        # A byte buffer holds 8-bit documents exactly; deeper ones would band,
+        # masks included: they are saved back at the document's depth.
+        return props.psd_bit_depth > 8
+    return storage == 'FLOAT'
+
+def new_layer_image(props, name, width, height):
+    return bpy.data.images.new(name, width=width, height=height, alpha=True,
+                               float_buffer=use_float_storage(props))
+
+# --- Persistence ---
+# How a layer image's pixels outlive the session (the layer_persistence pref).
+# PACK embeds a PNG of every layer in the .blend, which is what Blender does
+# by default but costs an encode on every load and save. SIDECAR saves each
+# layer next to the layer cache as uncompressed TGA (EXR for float buffers),
+# which is little more than a memory copy; Blender loads it back itself.
+# REGENERATE writes the same files into the session's temp dir and refills
+# the images from the PSD (through the layer cache) when the .blend is opened.
+#
+# All three leave the image clean, which the dirty tracking relies on: a
+# freshly loaded layer must not look painted.
+
+def layer_persistence():
+    prefs = get_addon_prefs()
+    return prefs.layer_persistence if prefs else 'PACK'
+
+def sidecar_path(img, mode):
+    if mode == 'SIDECAR':
+        prefs = get_addon_prefs()
+        root = os.path.join(layer_cache_root(prefs), "sidecars")
+    else:
+        root = os.path.join(bpy.app.tempdir or os.path.join(os.path.expanduser("~"), ".bpsd"), "bpsd_layers")
+
+    psd_path = img.get("psd_path") or img.get("bpsd_atlas") or ""
+    folder = layer_cache.LayerCache(root, 0).psd_dir(psd_path) if psd_path else root
+    name = "".join(c if c.isalnum() or c in "-_." else "_" for c in img.name)
+    return os.path.join(folder, name + (".exr" if img.is_float else ".tga"))
+
+def _save_sidecar(img, mode):
+    path = sidecar_path(img, mode)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if img.packed_file:
+        # Saving a packed image only repacks it; drop the pack but keep the
+        # pixels, which live only in the buffer from here on.
+        w, h = img.size
+        buf = np.empty(w * h * 4, dtype=np.float32)
+        img.pixels.foreach_get(buf)
+        img.unpack(method='REMOVE')
+        img.source = 'GENERATED'
+        img.generated_width, img.generated_height = w, h
+        img.pixels.foreach_set(buf)
+
+    img.filepath_raw = path
+    if img.is_float:
+        img.file_format = 'OPEN_EXR'
+    else:
+        img.file_format = 'TARGA_RAW'
+    img.save()
+
+def persist_image(img):
+    """Store img's current pixels per the layer_persistence pref and leave it clean."""
+    mode = layer_persistence()
+    if mode != 'PACK':
+        try:
+            _save_sidecar(img, mode)
+            return
+        except Exception as e:
+            print(f"BPSD: could not write sidecar for {img.name}, packing instead: {e}")
+    img.pack()
+
+def _needs_restore(img):
+    if not img.get("bpsd_managed") or img.get("bpsd_is_temp") or img.packed_file or is_placeholder(img):
+        return False
+    if img.source != 'FILE':
+        return True
+    return not os.path.exists(bpy.path.abspath(img.filepath_raw))
+
+def restore_layer_images():
+    """Refill layer images whose pixels lived outside the .blend and are gone
+    (REGENERATE, or SIDECAR files that went missing) from their PSDs."""
+    by_psd = {}
+    for img in bpy.data.images:
+        if _needs_restore(img):
+            psd_path = img.get("psd_path")
+            if psd_path and os.path.exists(psd_path):
+                by_psd.setdefault(psd_path, []).append(img)
+
+    for psd_path, images in by_psd.items():
+        scan = psd_scan.scan_file(psd_path)
+        if scan is None:
+            continue
+        width, height = scan["width"], scan["height"]
+
+        requests = [{
+            'layer_path': img.get("psd_layer_path", ""),
+            'layer_index': img.get("psd_layer_index"),
+            'width': width,
+            'height': height,
+            'is_mask': img.get("psd_is_mask", False),
+            'layer_id': img.get("psd_layer_id", 0),
+            'factor': image_proxy_factor(img)
+        } for img in images]
+        results = read_layers(psd_path, requests)
+
+        restored = 0
+        for img, req in zip(images, requests):
+            pixels = results.get((req['layer_index'], req['is_mask']))
+            if pixels is None:
+                continue
+            size = psd_engine.proxy_size(width, height, req['factor'])
+            if img.source != 'GENERATED':
+                img.source = 'GENERATED'
+            img.generated_width, img.generated_height = size
+            if tuple(img.size) != size:
+                img.scale(*size)
+            img.pixels.foreach_set(psd_engine.to_blender_pixels(pixels, is_mask=req['is_mask']))
+            img["bpsd_pixels_tag"] = pixels_tag(pixels)
+            persist_image(img)
+            restored += 1
+
+        print(f"BPSD: Restored {restored}/{len(images)} layer images from {os.path.basename(psd_path)}")
+    return None
+
+def set_layer_colorspace(img, props, is_mask=False):
+    if is_mask:
+        img.colorspace_settings.name = 'Non-Color'
+        return
+
+    # 32-bit documents hold linear values.
+    if props.psd_bit_depth == 32:
+        for name in ('Linear Rec.709', 'Linear'):
+            try:
+                img.colorspace_settings.name = name
+                return
+            except TypeError:
+                continue
+    img.colorspace_settings.name = 'sRGB'
 
 def get_psd_group_name(psd_path):
     if not psd_path: return "BPSD_PSD_Output"
@@ -93,16 +575,24 @@ def get_psd_group_name(psd_path):
     return f"PSD: {name}"
 
 def find_loaded_image(psd_path, layer_index, is_mask, layer_id=0):
-    for img in bpy.data.images:
-        if img.get("bpsd_is_temp"): continue
-        if img.get("psd_path") != psd_path: continue
-        if img.get("psd_is_mask", False) != is_mask: continue
+    _ensure_image_index()
 
-        if img.get("psd_layer_id") == layer_id:
-            return img
+    keys = (
+        (psd_path, layer_id, bool(is_mask)),
+        (psd_path, "index", layer_index, bool(is_mask)),
+    )
 
-        elif img.get("psd_layer_index") == layer_index:
-            return img
+    for attempt in range(2):
+        all_valid = True
+        for key in keys:
+            img, valid = _lookup_indexed(key)
+            if img:
+                return img
+            all_valid = all_valid and valid
+
+        if all_valid:
+            return None
+        rebuild_image_index()
 
     return None
 
@@ -237,9 +727,14 @@ class BPSD_OT_select_layer(bpy.types.Operator):
         if not existing_img:
             existing_img = find_loaded_image(props.active_psd_path, self.index, self.is_mask, self.layer_id)
 
-        if existing_img:
+        if existing_img and not is_placeholder(existing_img):
             focus_image_editor(context, existing_img)
 
+        elif existing_img:
+            # Not read yet (lazy mode): selecting it is what fetches it.
+            prefetch.discard(props.active_psd_path, self.layer_id, self.is_mask)
+            bpy.ops.bpsd.load_layer('EXEC_DEFAULT', layer_path=self.path, layer_id=self.layer_id)
+
         elif props.auto_load_on_select:
             # Skip auto-load for Groups/Adjustment layers unless it's a mask
             should_load = True
@@ -253,6 +748,9 @@ class BPSD_OT_select_layer(bpy.types.Operator):
                     layer_id=self.layer_id
                 )
 
+        if props.auto_load_on_select or props.lazy_loading:
+            prefetch.prefetch_neighbours(context.scene, self.index)
+
         return {'FINISHED'}
 
 # make it so reloading something other than a normal layer just changes properties or whatever
@@ -276,13 +774,24 @@ class BPSD_OT_load_layer(bpy.types.Operator):
             self.report({'ERROR'}, "No layer selected.")
             return {'CANCELLED'}
 
-        pixels, w, h = psd_engine.read_layer(psd_path, target_layer, props.psd_width, props.psd_height, fetch_mask=is_mask, layer_id=self.layer_id)
+        factor = int(props.proxy_factor)
+        layer_idx = props.active_layer_index
+        results = read_layers(psd_path, [{
+            'layer_path': target_layer,
+            'layer_index': layer_idx,
+            'width': props.psd_width,
+            'height': props.psd_height,
+            'is_mask': is_mask,
+            'layer_id': self.layer_id,
+            'factor': factor
+        }])
+        pixels = results.get((layer_idx, is_mask))
+        w, h = psd_engine.proxy_size(props.psd_width, props.psd_height, factor)
 
         if pixels is None:
             self.report({'ERROR'}, "Failed to read layer.")
             return {'CANCELLED'}
 
-        layer_idx = props.active_layer_index
         img = find_loaded_image(psd_path, layer_idx, is_mask, self.layer_id)
 
         if not img:
@@ -293,19 +802,20 @@ class BPSD_OT_load_layer(bpy.types.Operator):
             layer_name = f"{psd_name}/{layer_idx:03d}_{display_name}"
             img_name = f"{layer_name}_MASK" if is_mask else layer_name
 
-            img = bpy.data.images.new(img_name, width=w, height=h, alpha=True)
+            img = new_layer_image(props, img_name, w, h)
         else: img_name = target_layer
 
-        if img.size[0] != w or img.size[1] != h:
-            img.scale(w, h)
-
-        if len(pixels) > 0:
-            img.pixels.foreach_set(pixels)
+        was_placeholder = is_placeholder(img)
+        fill_layer_image(img, pixels, w, h, is_mask, factor)
 
         tag_image(img, psd_path, target_layer, layer_idx, is_mask, self.layer_id)
-        img.pack()
+        persist_image(img)
+        if was_placeholder:
+            img.update()
+            preview_bake.request(context.scene, {self.layer_id})
+            atlas.request(context.scene, {self.layer_id})
 
-        img.colorspace_settings.name = 'Non-Color' if is_mask else 'sRGB'
+        set_layer_colorspace(img, props, is_mask)
 
         focus_image_editor(context, img)
         self.report({'INFO'}, f"Loaded: {img_name}")
@@ -319,7 +829,7 @@ def _set_sync_status(scene, msg):
         pass
 
 
-def finalize_save(scene, psd_path, image_names, prop_keys, reload_composite=False):
+def finalize_save(scene, psd_path, image_names, prop_keys, reload_composite=False, saved_tags=None):
     """Post-save bookkeeping shared by the direct-push and legacy paths.
 
     Images are looked up by name rather than held as references, because the
@@ -330,25 +840,29 @@ def finalize_save(scene, psd_path, image_names, prop_keys, reload_composite=Fals
     save Photoshop just made looks like an incoming change and triggers a full
     connect_psd re-parse plus a reload of every loaded layer.
 
-    reload_composite is set only on the push path. There Photoshop has already
-    written a fresh flattened composite, and since we skip the re-parse nothing
-    else would refresh Blender's preview of it. On the legacy path this runs
-    *before* Photoshop re-saves, so reloading would pull in the black composite
-    photoshopapi just wrote.
+    reload_composite is set on the push path, where Photoshop has already
+    written a fresh flattened composite and, since we skip the re-parse,
+    nothing else would refresh Blender's preview of it. On the legacy path it
+    is only set when the CPU compositor regenerated the merged image; otherwise
+    this runs *before* Photoshop re-saves, and reloading would pull in the
+    black composite photoshopapi just wrote.
+
+    saved_tags maps image names to the pixels_tag of the bytes that were
+    written, so the tag keeps describing what the image holds; a later reload
+    that decodes anything else (a Photoshop undo, say) rewrites the image.
     """
     props = scene.bpsd_props
 
     if os.path.exists(psd_path):
         props.last_known_mtime_str = str(os.path.getmtime(psd_path))
         props.ps_disk_conflict = False
+        remember_disk_state(psd_path)
 
     if reload_composite and props.active_psd_image and props.active_psd_image != 'NONE':
-        composite = bpy.data.images.get(props.active_psd_image)
-        if composite:
-            try:
-                composite.reload()
-            except Exception as e:
-                print(f"BPSD: could not reload composite preview: {e}")
+        try:
+            reload_composite_preview(props)
+        except Exception as e:
+            print(f"BPSD: could not reload composite preview: {e}")
 
     saved_ids = set()
     for name in image_names:
@@ -356,11 +870,17 @@ def finalize_save(scene, psd_path, image_names, prop_keys, reload_composite=Fals
         if not img:
             continue
 
+        tag = (saved_tags or {}).get(name)
+        if tag:
+            img["bpsd_pixels_tag"] = tag
+        else:
+            img.pop("bpsd_pixels_tag", None)
+
         try:
-            img.pack()
+            persist_image(img)
             runtime_state.set_dirty(img.name, False)
         except Exception as e:
-            print(f"Error packing {name}: {e}")
+            print(f"Error storing {name}: {e}")
 
         l_id = img.get("psd_layer_id", 0)
         if l_id > 0:
@@ -379,6 +899,10 @@ def perform_save_images(context, psd_path, images, property_items=None):
 
     updates = []
     valid_images = []
+    saved_tags = {}
+    float_buf = None
+
+    proxies = 0
 
     # Process Dirty Images
     for img in images:
@@ -389,12 +913,17 @@ def perform_save_images(context, psd_path, images, property_items=None):
         if not layer_path:
             continue
 
+        if image_proxy_factor(img) > 1:
+            print(f"BPSD: Not saving proxy image {img.name}; load it at full resolution first")
+            proxies += 1
+            continue
+
+        if is_placeholder(img):
+            continue
+
         item = None
         if layer_id > 0:
-            for it in props.layer_list:
-                if it.layer_id == layer_id:
-                    item = it
-                    break
+            _, item = find_layer_item(props, layer_id)
 
         if item and item.layer_type == 'SMART' and not is_mask:
             print(f"Skipping save for Smart Object content: {item.name}")
@@ -407,13 +936,17 @@ def perform_save_images(context, psd_path, images, property_items=None):
             b_mode = item.blend_mode
             opac = item.opacity
 
+        # One float buffer for every image; each update only keeps its bytes.
         width, height = img.size[0], img.size[1]
-        pixel_buf = np.empty(width * height * 4, dtype=np.float32)
-        img.pixels.foreach_get(pixel_buf)
+        if float_buf is None or float_buf.size != width * height * 4:
+            float_buf = np.empty(width * height * 4, dtype=np.float32)
+        img.pixels.foreach_get(float_buf)
+        # A mask is its grey level; only that plane goes to the writers.
+        source = float_buf[0::4] if is_mask else float_buf
 
         updates.append({
             'layer_path': layer_path,
-            'pixels': pixel_buf,
+            'pixels': psd_engine.from_blender_pixels(source, props.psd_bit_depth),
             'width': width,
             'height': height,
             'is_mask': is_mask,
@@ -422,6 +955,7 @@ def perform_save_images(context, psd_path, images, property_items=None):
             'opacity': opac,
             'name': item.name if item else layer_path
         })
+        saved_tags[img.name] = pixels_tag(updates[-1]['pixels'])
         valid_images.append(img)
     
     # Process Property-Only Updates (for items not in the images list)
@@ -447,6 +981,8 @@ def perform_save_images(context, psd_path, images, property_items=None):
             valid_prop_items.append(item)
 
     if not updates:
+        if proxies:
+            return {'CANCELLED'}, "Proxy layers can't be saved. Load them at full resolution first."
         return {'CANCELLED'}, "No changes to save."
 
     # Use first available width/height if generic
@@ -459,10 +995,12 @@ def perform_save_images(context, psd_path, images, property_items=None):
 
     def run_legacy(skip_refresh=False):
         """Rebuild the whole PSD with photoshopapi, then poke Photoshop."""
-        if not psd_engine.write_all_layers(psd_path, updates, canvas_w, canvas_h):
+        if not psd_engine.write_all_layers(psd_path, updates, canvas_w, canvas_h,
+                                          regenerate_composite=scene.bpsd_props.regenerate_composite):
             return {'CANCELLED'}, "Write failed."
 
-        finalize_save(scene, psd_path, image_names, prop_keys)
+        finalize_save(scene, psd_path, image_names, prop_keys,
+                      reload_composite=scene.bpsd_props.regenerate_composite, saved_tags=saved_tags)
 
         if skip_refresh:
             return {'WARNING'}, "Saved to disk, but Photoshop refresh skipped (Unsaved changes in PS)."
@@ -485,6 +1023,9 @@ def perform_save_images(context, psd_path, images, property_items=None):
         props.use_ps_direct_sync
         and props.auto_refresh_ps
         and not valid_prop_items
+        # PNG can't carry 32-bit linear / HDR values; photoshopapi writes
+        # them exactly.
+        and props.psd_bit_depth != 32
         and all(u['pixels'] is not None for u in updates)
         and ps_bridge.is_available()
     )
@@ -496,7 +1037,7 @@ def perform_save_images(context, psd_path, images, property_items=None):
             def on_done(result, reason):
                 if reason is None:
                     finalize_save(scene, psd_path, image_names, prop_keys,
-                                  reload_composite=True)
+                                  reload_composite=True, saved_tags=saved_tags)
 
                     count = len(result.get('layers', []))
                     msg = f"Synced {count} layer(s) to Photoshop."
@@ -560,21 +1101,8 @@ class BPSD_OT_save_layer(bpy.types.Operator):
             return {'CANCELLED'}
             
         # Find corresponding item to force save its properties too
-        target_item = None
-        l_id = img.get("psd_layer_id", 0)
-        l_path = img.get("psd_layer_path")
-        
         props = context.scene.bpsd_props
-        if l_id > 0:
-            for item in props.layer_list:
-                if item.layer_id == l_id:
-                    target_item = item
-                    break
-        elif l_path:
-             for item in props.layer_list:
-                if item.path == l_path:
-                    target_item = item
-                    break
+        _, target_item = find_layer_item(props, img.get("psd_layer_id", 0), img.get("psd_layer_path"))
 
         prop_list = [target_item] if target_item else None
 
@@ -607,30 +1135,15 @@ class BPSD_OT_save_all_layers(bpy.types.Operator):
 
         images_to_save = []
 
-        for img in bpy.data.images:
-            if img.get("psd_path") != active_psd:
-                continue
-
+        for img in managed_images(active_psd):
             if not img.get("bpsd_managed"):
                 continue
 
             if not self.force and not img.is_dirty:
                 # Check if the associated item is marked dirty (e.g. from channel edit or latched paint)
-                l_id = img.get("psd_layer_id", 0)
-                l_path = img.get("psd_layer_path")
-                item_is_dirty = False
-                
-                if l_id > 0:
-                     for item in props.layer_list:
-                         if item.layer_id == l_id:
-                             if item.is_property_dirty or item.is_bpsd_dirty: item_is_dirty = True
-                             break
-                elif l_path:
-                     for item in props.layer_list:
-                         if item.path == l_path:
-                             if item.is_property_dirty or item.is_bpsd_dirty: item_is_dirty = True
-                             break
-                
+                _, item = find_layer_item(props, img.get("psd_layer_id", 0), img.get("psd_layer_path"))
+                item_is_dirty = bool(item and (item.is_property_dirty or item.is_bpsd_dirty))
+
                 if not item_is_dirty:
                     continue
 
@@ -714,96 +1227,250 @@ class BPSD_OT_clean_orphans(bpy.types.Operator):
 
         for img in images_to_remove:
             bpy.data.images.remove(img)
+        runtime_state.invalidate_image_index()
 
         self.report({'INFO'}, f"Removed {count} orphaned images.")
         return {'FINISHED'}
 
+def pixels_tag(pixels):
+    """Content tag of a layer read, stored on the image as bpsd_pixels_tag so a
+    reload that decodes the same pixels can leave the image alone."""
+    return f"{zlib.crc32(memoryview(np.ascontiguousarray(pixels)).cast('B')):08x}"
+
+def redraw_image_views(context):
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type in ('IMAGE_EDITOR', 'VIEW_3D'):
+                area.tag_redraw()
+
+def reload_layers(context, layer_ids=None, force=False):
+    """Re-read loaded layer textures from the active PSD.
+
+    layer_ids limits the read to those layers (psd_scan fingerprint keys);
+    None reloads everything. Images without a layer id cannot be matched to a
+    fingerprint, so they are always included. Returns (requested, reloaded).
+
+    An image that isn't dirty and whose decoded pixels match its
+    bpsd_pixels_tag is left untouched unless force is set: no buffer write,
+    no GPU re-upload, no repack. The rest get their buffers written first and
+    are then updated and persisted in one pass.
+    """
+    props = context.scene.bpsd_props
+    active_psd = props.active_psd_path
+
+    images_to_reload = []
+    requests = []
+
+    for img in managed_images(active_psd):
+        if not img.get("bpsd_managed"): continue
+
+        # Placeholders are read by the prefetcher, which sees the new data.
+        placeholder = is_placeholder(img)
+
+        l_path = img.get("psd_layer_path")
+        l_index = img.get("psd_layer_index")
+        l_id = img.get("psd_layer_id", 0)
+        is_mask = img.get("psd_is_mask", False)
+
+        found_item = None
+        if l_id > 0:
+            new_index, found_item = find_layer_item(props, l_id)
+
+        if found_item:
+            if found_item.path != l_path or new_index != l_index:
+                print(f"BPSD: Remapping layer {l_path} -> {found_item.path}")
+
+                img["psd_layer_path"] = found_item.path
+                img["psd_layer_index"] = new_index
+
+                l_path = found_item.path
+                l_index = new_index
+
+                psd_name = os.path.basename(active_psd)
+                new_name = f"{psd_name}/{l_index:03d}_{found_item.name}"
+                if is_mask: new_name += "_MASK"
+
+                if img.name != new_name:
+                    try:
+                        img.name = new_name
+                    except:
+                        pass
+
+                index_image(img)
+
+        if placeholder or (layer_ids is not None and l_id > 0 and l_id not in layer_ids):
+            continue
+
+        # Proxies are re-read as proxies, off the full canvas.
+        factor = image_proxy_factor(img)
+        width, height = (props.psd_width, props.psd_height) if factor > 1 else tuple(img.size)
+
+        images_to_reload.append(img)
+        requests.append({
+            'layer_path': l_path,
+            'layer_index': l_index,
+            'width': width,
+            'height': height,
+            'is_mask': is_mask,
+            'layer_id': l_id,
+            'factor': factor
+        })
+
+    if not requests:
+        return 0, 0
+
+    results = read_layers(active_psd, requests)
+
+    if os.path.exists(props.active_psd_path):
+        props.last_known_mtime_str = str(os.path.getmtime(props.active_psd_path))
+
+    success_count = 0
+    float_buf = None
+    written = []
+    for img in images_to_reload:
+        key = (img.get("psd_layer_index"), img.get("psd_is_mask", False))
+        if key not in results:
+            continue
+
+        try:
+            pixels = results[key]
+            factor = image_proxy_factor(img)
+            size = psd_engine.proxy_size(props.psd_width, props.psd_height, factor) if factor > 1 else tuple(img.size)
+            tag = pixels_tag(pixels)
+
+            if not force and not img.is_dirty and tuple(img.size) == size and img.get("bpsd_pixels_tag") == tag:
+                success_count += 1
+                continue
+
+            converted = psd_engine.to_blender_pixels(pixels, float_buf, img.get("psd_is_mask", False))
+            if converted is not pixels:
+                float_buf = converted
+            if tuple(img.size) != size:
+                img.scale(*size)
+            img.pixels.foreach_set(converted)
+            img["bpsd_pixels_tag"] = tag
+            written.append(img)
+            success_count += 1
+        except Exception as e:
+            print(f"Failed to update image {img.name}: {e}")
+
+    changed_ids = set()
+    for img in written:
+        try:
+            img.update()
+            persist_image(img)
+        except Exception as e:
+            print(f"Failed to update image {img.name}: {e}")
+        changed_ids.add(img.get("psd_layer_id", 0))
+
+    if written:
+        redraw_image_views(context)
+        preview_bake.request(context.scene, changed_ids)
+        atlas.request(context.scene, changed_ids)
+
+    if success_count > len(written):
+        print(f"BPSD: {success_count - len(written)} reloaded layer(s) unchanged")
+
+    return len(requests), success_count
+
+def composite_preview_name(psd_path):
+    return f"{get_psd_group_name(psd_path)} (Composite)"
+
+def composite_preview_image(props):
+    """The image showing the PSD's merged composite: the directly decoded
+    preview once it has been pushed this session, else the PSD image itself."""
+    if props.use_direct_composite:
+        name = runtime_state.composite_previews.get(props.active_psd_path)
+        img = bpy.data.images.get(name) if name else None
+        if img:
+            return img
+    if props.active_psd_image != 'NONE':
+        return bpy.data.images.get(props.active_psd_image)
+    return None
+
+def push_composite_preview(props):
+    """Decode the merged image section into the composite preview image.
+
+    Writing pixels into the PSD image itself would leave a dirty .psd
+    datablock behind, so the preview is its own generated image. Returns
+    False when the file can't be decoded directly.
+    """
+    psd_path = props.active_psd_path
+    if not psd_path or not os.path.exists(psd_path):
+        return False
+
+    pixels, width, height = psd_engine.read_composite(psd_path, int(props.composite_preview_scale))
+    if pixels is None:
+        return False
+
+    name = composite_preview_name(psd_path)
+    img = bpy.data.images.get(name)
+    if img is None:
+        img = new_layer_image(props, name, width, height)
+        # Deliberately not psd_path: the preview is not a layer image.
+        img["bpsd_composite"] = psd_path
+    elif tuple(img.size) != (width, height):
+        img.scale(width, height)
+
+    set_layer_colorspace(img, props)
+    img.pixels.foreach_set(pixels)
+    img.update()
+
+    previous = runtime_state.composite_previews.get(psd_path)
+    runtime_state.composite_previews[psd_path] = img.name
+    if previous != img.name:
+        _point_preview_nodes(psd_path, img)
+    return True
+
+def _point_preview_nodes(psd_path, img):
+    ng = bpy.data.node_groups.get(get_psd_group_name(psd_path))
+    if ng and img:
+        for node in ng.nodes:
+            if node.get("bpsd_psd_preview"):
+                node.image = img
+
+def reload_composite_preview(props):
+    if props.use_direct_composite and push_composite_preview(props):
+        return
+
+    if props.active_psd_image != 'NONE':
+        main_img = bpy.data.images.get(props.active_psd_image)
+        if main_img:
+            main_img.reload()
+
+def update_composite_preview_callback(self, context):
+    if not self.active_psd_path:
+        return
+
+    reload_composite_preview(self)
+    if not self.use_direct_composite:
+        runtime_state.composite_previews.pop(self.active_psd_path, None)
+        _point_preview_nodes(self.active_psd_path, composite_preview_image(self))
+
 class BPSD_OT_reload_all(bpy.types.Operator):
     bl_idname = "bpsd.reload_all"
     bl_label = "Reload Loaded Layers"
-    bl_description = "Force re-read all currently loaded textures from the PSD"
+    bl_description = (
+        "Re-read all currently loaded textures from the PSD. Layers whose pixels are unchanged "
+        "are left as they are (Shift: rewrite every layer)"
+    )
 
-    def execute(self, context):
-        props = context.scene.bpsd_props
-        active_psd = props.active_psd_path
+    force: bpy.props.BoolProperty(default=False, options={'SKIP_SAVE', 'HIDDEN'}) # type: ignore
 
-        images_to_reload = []
-        requests = []
+    def invoke(self, context, event):
+        self.force = event.shift
+        return self.execute(context)
 
-        for img in bpy.data.images:
-            if img.get("psd_path") != active_psd: continue
-            if not img.get("bpsd_managed"): continue
-
-            l_path = img.get("psd_layer_path")
-            l_index = img.get("psd_layer_index")
-            l_id = img.get("psd_layer_id", 0)
-            is_mask = img.get("psd_is_mask", False)
-
-            found_item = None
-            if l_id > 0:
-                for i, item in enumerate(props.layer_list):
-                    if item.layer_id == l_id:
-                        found_item = item
-                        new_index = i
-                        break
-
-            if found_item:
-                if found_item.path != l_path or new_index != l_index:
-                    print(f"BPSD: Remapping layer {l_path} -> {found_item.path}")
-
-                    img["psd_layer_path"] = found_item.path
-                    img["psd_layer_index"] = new_index
-
-                    l_path = found_item.path
-                    l_index = new_index
-
-                    psd_name = os.path.basename(active_psd)
-                    new_name = f"{psd_name}/{l_index:03d}_{found_item.name}"
-                    if is_mask: new_name += "_MASK"
-
-                    if img.name != new_name:
-                        try:
-                            img.name = new_name
-                        except:
-                            pass
-
-            images_to_reload.append(img)
-            requests.append({
-                'layer_path': l_path,
-                'layer_index': l_index,
-                'width': img.size[0],
-                'height': img.size[1],
-                'is_mask': is_mask,
-                'layer_id': l_id
-            })
+    def execute(self, context):
+        props = context.scene.bpsd_props
 
-        if not requests:
+        requested, success_count = reload_layers(context, force=self.force)
+        if not requested:
             self.report({'INFO'}, "No layers to reload.")
             return {'CANCELLED'}
 
-        self.report({'INFO'}, f"Reloading {len(requests)} layers...")
-        results = psd_engine.read_all_layers(active_psd, requests)
-
-        if os.path.exists(props.active_psd_path):
-            props.last_known_mtime_str = str(os.path.getmtime(props.active_psd_path))
-
-        success_count = 0
-        for img in images_to_reload:
-            key = (img.get("psd_layer_index"), img.get("psd_is_mask", False))
-
-            if key in results:
-                try:
-                    img.pixels = results[key]
-                    img.update()
-                    img.pack()
-                    success_count += 1
-                except Exception as e:
-                    print(f"Failed to update image {img.name}: {e}")
-
-        if props.active_psd_image != 'NONE':
-            main_img = bpy.data.images.get(props.active_psd_image)
-            if main_img:
-                main_img.reload()
+        remember_disk_state(props.active_psd_path)
+        reload_composite_preview(props)
 
         self.report({'INFO'}, f"Reloaded {success_count} layers.")
         return {'FINISHED'}
@@ -834,10 +1501,9 @@ class BPSD_OT_toggle_visibility(bpy.types.Operator):
             elif item.visibility_override == 'SHOW':
                  item.visibility_override = 'HIDE'
 
-        try:
-            bpy.ops.bpsd.update_psd_nodes('EXEC_DEFAULT')
-        except Exception:
-            pass
+        node_ops.queue_node_update(item.layer_id)
+        if node_ops.get_effective_visibility(item):
+            prefetch.prioritize(props.active_psd_path, {item.layer_id})
 
         return {'FINISHED'}
 
@@ -848,45 +1514,66 @@ class BPSD_OT_load_all_layers(bpy.types.Operator):
     bl_description = "Load textures for all layers in the list"
     bl_options = {'REGISTER', 'UNDO'}
 
+    # Only load layers that have no texture yet. Loaded ones are kept current
+    # by the reload paths, and re-reading them would also throw away unsaved
+    # paint.
+    missing_only: bpy.props.BoolProperty(default=False, options={'SKIP_SAVE', 'HIDDEN'}) # type: ignore
+
     def execute(self, context):
         props = context.scene.bpsd_props
         active_psd = props.active_psd_path
 
         requests = []
+        factor = int(props.proxy_factor)
+        width, height = psd_engine.proxy_size(props.psd_width, props.psd_height, factor)
+
+        # Placeholders count as missing: with lazy loading off they are read
+        # here like any other missing layer.
+        def wanted(index, item, is_mask):
+            if not self.missing_only:
+                return True
+            img = find_loaded_image(active_psd, index, is_mask, item.layer_id)
+            return img is None or is_placeholder(img)
 
         for i, item in enumerate(props.layer_list):
             if item.layer_type == "UNKNOWN":
                 continue
 
-            if item.layer_type not in ["GROUP", "ADJUSTMENT"]:
+            if item.layer_type not in ["GROUP", "ADJUSTMENT"] and wanted(i, item, False):
                 requests.append({
                     'layer_path': item.path,
                     'layer_index': i,
                     'width': props.psd_width,
                     'height': props.psd_height,
                     'is_mask': False,
-                    'layer_id': item.layer_id
+                    'layer_id': item.layer_id,
+                    'factor': factor
                 })
 
-            if item.has_mask:
+            if item.has_mask and wanted(i, item, True):
                  requests.append({
                     'layer_path': item.path,
                     'layer_index': i,
                     'width': props.psd_width,
                     'height': props.psd_height,
                     'is_mask': True,
-                    'layer_id': item.layer_id
+                    'layer_id': item.layer_id,
+                    'factor': factor
                 })
 
         if not requests:
             self.report({'INFO'}, "No layers to load.")
             return {'CANCELLED'}
 
+        if self.missing_only and props.lazy_loading:
+            return self.add_placeholders(context, requests)
+
         self.report({'INFO'}, f"Loading {len(requests)} textures...")
-        results = psd_engine.read_all_layers(active_psd, requests)
+        results = read_layers(active_psd, requests)
 
         count = 0
         psd_name = os.path.basename(active_psd)
+        float_buf = None
 
         for (idx, is_mask), pixels in results.items():
             if idx >= len(props.layer_list): continue
@@ -899,24 +1586,137 @@ class BPSD_OT_load_all_layers(bpy.types.Operator):
                 layer_name = f"{psd_name}/{idx:03d}_{display_name}"
                 img_name = f"{layer_name}_MASK" if is_mask else layer_name
 
-                img = bpy.data.images.new(img_name, width=props.psd_width, height=props.psd_height, alpha=True)
-
-            if img.size[0] != props.psd_width or img.size[1] != props.psd_height:
-                img.scale(props.psd_width, props.psd_height)
+                img = new_layer_image(props, img_name, width, height)
 
-            if len(pixels) > 0:
-                img.pixels.foreach_set(pixels)
+            float_buf = fill_layer_image(img, pixels, width, height, is_mask, factor, float_buf)
 
             tag_image(img, active_psd, item.path, idx, is_mask, item.layer_id)
-            img.pack()
+            persist_image(img)
 
-            img.colorspace_settings.name = 'Non-Color' if is_mask else 'sRGB'
+            set_layer_colorspace(img, props, is_mask)
 
             count += 1
 
         self.report({'INFO'}, f"Loaded {count} images.")
         return {'FINISHED'}
 
+    def add_placeholders(self, context, requests):
+        """Lazy mode: bind placeholders now, let the prefetcher read pixels."""
+        props = context.scene.bpsd_props
+        active_psd = props.active_psd_path
+        psd_name = os.path.basename(active_psd)
+
+        for req in requests:
+            idx, is_mask = req['layer_index'], req['is_mask']
+            item = props.layer_list[idx]
+
+            # Already a placeholder; the run started below picks it up.
+            if find_loaded_image(active_psd, idx, is_mask, item.layer_id) is not None:
+                continue
+
+            layer_name = f"{psd_name}/{idx:03d}_{item.name}"
+            img = new_placeholder_image(props, f"{layer_name}_MASK" if is_mask else layer_name)
+            tag_image(img, active_psd, item.path, idx, is_mask, item.layer_id)
+            set_layer_colorspace(img, props, is_mask)
+
+        prefetch.start(context.scene)
+        self.report({'INFO'}, f"Deferred {len(requests)} textures.")
+        return {'FINISHED'}
+
+
+class BPSD_OT_load_full_res(bpy.types.Operator):
+    bl_idname = "bpsd.load_full_res"
+    bl_label = "Load Full Resolution"
+    bl_description = (
+        "Replace proxy images with full resolution layers so they can be saved. "
+        "Re-reads the PSD, or with Keep Paint upsamples what was painted on the proxy"
+    )
+    bl_options = {'REGISTER', 'UNDO'}
+
+    all_layers: bpy.props.BoolProperty(name="All Layers", default=False) # type: ignore
+    keep_paint: bpy.props.BoolProperty(name="Keep Paint", default=False) # type: ignore
+
+    def execute(self, context):
+        props = context.scene.bpsd_props
+        active_psd = props.active_psd_path
+        width, height = props.psd_width, props.psd_height
+
+        if self.all_layers:
+            images = [img for img in managed_images(active_psd) if image_proxy_factor(img) > 1]
+        else:
+            index = props.active_layer_index
+            if index < 0 or index >= len(props.layer_list):
+                self.report({'ERROR'}, "No layer selected.")
+                return {'CANCELLED'}
+            item = props.layer_list[index]
+            images = [find_loaded_image(active_psd, index, is_mask, item.layer_id) for is_mask in (False, True)]
+            images = [img for img in images if img and image_proxy_factor(img) > 1]
+
+        if not images:
+            self.report({'INFO'}, "No proxy layers to replace.")
+            return {'CANCELLED'}
+
+        if self.keep_paint:
+            results = {}
+            for img in images:
+                w, h = img.size
+                buf = np.empty(w * h * 4, dtype=np.float32)
+                img.pixels.foreach_get(buf)
+                results[img.name] = psd_engine.upsample_proxy(buf, image_proxy_factor(img), width, height)
+                img.pop("bpsd_pixels_tag", None)
+        else:
+            requests = [{
+                'layer_path': img.get("psd_layer_path"),
+                'layer_index': img.get("psd_layer_index"),
+                'width': width,
+                'height': height,
+                'is_mask': img.get("psd_is_mask", False),
+                'layer_id': img.get("psd_layer_id", 0)
+            } for img in images]
+            by_key = read_layers(active_psd, requests)
+            results = {}
+            for img in images:
+                key = (img.get("psd_layer_index"), img.get("psd_is_mask", False))
+                if key in by_key:
+                    img["bpsd_pixels_tag"] = pixels_tag(by_key[key])
+                    results[img.name] = psd_engine.to_blender_pixels(by_key[key], is_mask=img.get("psd_is_mask", False))
+
+        layer_ids = set()
+        for img in images:
+            pixels = results.get(img.name)
+            if pixels is None:
+                continue
+            img.scale(width, height)
+            img.pixels.foreach_set(pixels)
+            set_proxy_factor(img, 1)
+            img.update()
+            # Upsampled paint stays dirty so the next save writes it.
+            if not self.keep_paint:
+                persist_image(img)
+            layer_ids.add(img.get("psd_layer_id", 0))
+
+        if layer_ids:
+            preview_bake.request(context.scene, layer_ids)
+            atlas.request(context.scene, layer_ids)
+
+        self.report({'INFO'}, f"Loaded {len(layer_ids)} layer(s) at full resolution.")
+        return {'FINISHED'}
+
+class BPSD_OT_clear_layer_cache(bpy.types.Operator):
+    bl_idname = "bpsd.clear_layer_cache"
+    bl_label = "Clear Layer Cache"
+    bl_description = "Delete every decoded layer kept in the on-disk cache"
+
+    def execute(self, context):
+        prefs = get_addon_prefs()
+        if prefs is None:
+            return {'CANCELLED'}
+
+        cache = layer_cache.LayerCache(layer_cache_root(prefs), 0)
+        size = cache.size()
+        cache.clear()
+        self.report({'INFO'}, f"Cleared {size / (1024 * 1024):.0f} MB of cached layers.")
+        return {'FINISHED'}
 
 class BPSD_OT_debug_rw_test(bpy.types.Operator):
     bl_idname = "bpsd.debug_rw_test"
@@ -952,6 +1752,40 @@ class BPSD_OT_debug_rw_test(bpy.types.Operator):
             traceback.print_exc()
             return {'CANCELLED'}
 
+class BPSD_OT_debug_packbits(bpy.types.Operator):
+    bl_idname = "bpsd.debug_packbits"
+    bl_label = "PackBits Check (Debug)"
+    bl_description = "Debug: check the RLE codec against photoshopapi on the active PSD and measure its throughput"
+
+    size: bpy.props.IntProperty(name="Benchmark Size", default=4096, min=256, max=16384) # type: ignore
+
+    def execute(self, context):
+        props = context.scene.bpsd_props
+        lines = []
+        ok = True
+
+        if props.active_psd_path and os.path.exists(props.active_psd_path):
+            result = psd_engine.verify_packbits(props.active_psd_path)
+            if result is None:
+                lines.append("check failed to read the PSD")
+                ok = False
+            else:
+                checked, failed = result
+                lines.append(f"{checked - failed}/{checked} RLE channels match photoshopapi")
+                ok = not failed
+
+        stats = packbits.benchmark(self.size, self.size, workers=None)
+        lines.append(f"encode {stats['encode_mbs']:.0f} MB/s, decode {stats['decode_mbs']:.0f} MB/s, "
+                     f"ratio {stats['ratio']:.2f}{'' if stats['ok'] else ', ROUND TRIP FAILED'}")
+        ok = ok and stats["ok"]
+
+        print("BPSD PackBits Check")
+        for line in lines:
+            print(f"  {line}")
+
+        self.report({'INFO'} if ok else {'WARNING'}, " | ".join(lines))
+        return {'FINISHED'}
+
 class BPSD_OT_create_psd(bpy.types.Operator):
     bl_idname = "bpsd.create_psd"
     bl_label = "Create New PSD"
@@ -961,6 +1795,11 @@ class BPSD_OT_create_psd(bpy.types.Operator):
     filepath: bpy.props.StringProperty(subtype='FILE_PATH') # type: ignore
     width: bpy.props.IntProperty(name="Width", default=1024, min=1, max=30000) # type: ignore
     height: bpy.props.IntProperty(name="Height", default=1024, min=1, max=30000) # type: ignore
+    bit_depth: bpy.props.EnumProperty(
+        name="Bit Depth",
+        items=[('8', "8-bit", ""), ('16', "16-bit", ""), ('32', "32-bit", "")],
+        default='8'
+    ) # type: ignore
 
     def execute(self, context):
         if not self.filepath:
@@ -970,7 +1809,7 @@ class BPSD_OT_create_psd(bpy.types.Operator):
         if not self.filepath.endswith('.psd'):
             self.filepath += '.psd'
 
-        if psd_engine.create_psd(self.filepath, self.width, self.height):
+        if psd_engine.create_psd(self.filepath, self.width, self.height, int(self.bit_depth)):
             self.report({'INFO'}, f"Created PSD: {self.filepath}")
 
             img = bpy.data.images.load(self.filepath, check_existing=True)
@@ -1009,9 +1848,10 @@ class BPSD_OT_rename_layer(bpy.types.Operator):
             self.report({'ERROR'}, "Name cannot be empty")
             return {'CANCELLED'}
 
-        if psd_engine.rename_layer(props.active_psd_path, item.layer_id, self.new_name):
+        if psd_engine.rename_layer(props.active_psd_path, item.layer_id, self.new_name,
+                                   regenerate_composite=props.regenerate_composite):
             self.report({'INFO'}, f"Renamed layer to: {self.new_name}")
-            bpy.ops.bpsd.connect_psd('EXEC_DEFAULT')
+            bpy.ops.bpsd.connect_psd('EXEC_DEFAULT', incremental=True)
             return {'FINISHED'}
         else:
             self.report({'ERROR'}, "Failed to rename layer")
@@ -1034,19 +1874,16 @@ class BPSD_OT_toggle_layer_visibility_psd(bpy.types.Operator):
     def execute(self, context):
         props = context.scene.bpsd_props
 
-        item = None
-        for layer_item in props.layer_list:
-            if layer_item.layer_id == self.layer_id:
-                item = layer_item
-                break
+        _, item = find_layer_item(props, self.layer_id)
 
         if not item:
             return {'CANCELLED'}
 
         new_visibility = not item.is_visible
 
-        if psd_engine.set_layer_visibility(props.active_psd_path, self.layer_id, new_visibility):
-            bpy.ops.bpsd.connect_psd('EXEC_DEFAULT')
+        if psd_engine.set_layer_visibility(props.active_psd_path, self.layer_id, new_visibility,
+                                           regenerate_composite=props.regenerate_composite):
+            bpy.ops.bpsd.connect_psd('EXEC_DEFAULT', incremental=True)
             return {'FINISHED'}
         else:
             self.report({'ERROR'}, "Failed to toggle visibility")
@@ -1067,9 +1904,10 @@ class BPSD_OT_set_clipping_mask(bpy.types.Operator):
         item = props.layer_list[props.active_layer_index]
         new_clipping = not item.is_clipping_mask
 
-        if psd_engine.set_clipping_mask(props.active_psd_path, item.layer_id, new_clipping):
+        if psd_engine.set_clipping_mask(props.active_psd_path, item.layer_id, new_clipping,
+                                        regenerate_composite=props.regenerate_composite):
             self.report({'INFO'}, f"Clipping mask: {new_clipping}")
-            bpy.ops.bpsd.connect_psd('EXEC_DEFAULT')
+            bpy.ops.bpsd.connect_psd('EXEC_DEFAULT', incremental=True)
             return {'FINISHED'}
         else:
             self.report({'ERROR'}, "Failed to set clipping mask")